@@ -0,0 +1,291 @@
+"""
+Local stand-in for the Groq chat completions API, for benchmarks, CI and
+offline runs of the bot (LLM_OFFLINE=1).
+
+Serves POST /openai/v1/chat/completions (the path Groq/AsyncGroq call under
+their base_url), plain or streamed (SSE), and answers with a pluggable
+responder. Latency is simulated as a sampled base latency (see
+parse_latency) + per_token_latency * completion_tokens, and max_concurrency
+caps how many requests are "computed" at once, like a provider-side rate
+limit. error_rate / rate_limit_rate answer that share of requests with a
+500 / 429. Token usage is estimated as len(text) / 4.
+
+Usage:
+    python -m benchmarks.fake_llm_server
+    python -m benchmarks.fake_llm_server --port 8088 --latency lognormal:0.4,0.5 --error-rate 0.02
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_PATH = "/openai/v1/chat/completions"
+DEFAULT_PORT = 8088
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def parse_latency(spec, rng=None):
+    """
+    Base latency sampler (seconds) from a spec string:
+    "0.3" or "const:0.3", "uniform:LOW,HIGH", "normal:MEAN,STD",
+    "lognormal:MEDIAN,SIGMA" (long tail, like real providers).
+    """
+    rng = rng or random.Random()
+    kind, _, args = spec.partition(":") if ":" in spec else ("const", "", spec)
+    values = [float(v) for v in args.split(",")]
+    if kind == "const":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+def rule_based_parse(text, nlp=None):
+    """A plausible parse_transaction answer for one text, from the local NLP rules."""
+    from modules.nlp import NLPProcessor
+    nlp = nlp or NLPProcessor()
+    amount, category, type_ = nlp.process_text(text)
+    return {"amount": amount, "category": category, "description": text[:40],
+            "type": type_, "is_transaction": amount > 0}
+
+
+_ARRAY_LINE_RE = re.compile(r'^\s*(\[.*\])\s*$', re.MULTILINE)
+
+
+def parse_responder(nlp=None):
+    """
+    Responder for parse prompts: batch prompts (one JSON array line of texts)
+    get {"results": [...]}, single prompts get one object.
+    """
+    from modules.nlp import NLPProcessor
+    nlp = nlp or NLPProcessor()
+    nlp.groq_enabled = False
+    single_re = re.compile(r'Extract transaction details from this text: "(.*)"')
+
+    def respond(body):
+        prompt = body["messages"][-1]["content"]
+        array = _ARRAY_LINE_RE.search(prompt)
+        if array:
+            texts = json.loads(array.group(1))
+            return json.dumps({"results": [rule_based_parse(text, nlp) for text in texts]})
+        single = single_re.search(prompt)
+        return json.dumps(rule_based_parse(single.group(1) if single else prompt, nlp))
+    return respond
+
+
+def template_responder(templates, default="OK"):
+    """
+    Canned/templated answers: the first (pattern, template) whose regex
+    matches the prompt answers. A template is a str formatted with the
+    match's named groups, or a callable taking (body, match).
+    """
+    compiled = [(re.compile(pattern, re.DOTALL), template) for pattern, template in templates]
+
+    def respond(body):
+        prompt = body["messages"][-1]["content"]
+        for pattern, template in compiled:
+            match = pattern.search(prompt)
+            if match:
+                return template(body, match) if callable(template) else template.format(**match.groupdict())
+        return default
+    return respond
+
+
+def bot_responder(nlp=None):
+    """
+    Answers every prompt the bot sends (parse, batch parse, intent, insight,
+    chat) with something the bot can use, from the local rules and templates.
+    """
+    from modules.nlp import NLPProcessor
+    nlp = nlp or NLPProcessor()
+    nlp.groq_enabled = False
+    parse = parse_responder(nlp)
+
+    def intent(body, match):
+        return json.dumps(nlp.classify_intent(match.group("text")))
+
+    return template_responder([
+        (r'Extract transaction details from', lambda body, match: parse(body)),
+        (r'Classify the intent of this financial bot user message: "(?P<text>.*?)"', intent),
+        (r'insight singkat', "• Pengeluaran bulan ini masih terkendali.\n"
+                             "• Kurangi jajan malam biar tabungan naik.\n"
+                             "• Mantap, pertahankan catatan rutinmu!"),
+        (r'Nama user: (?P<name>[^\n]*)', "Halo {name}! Ada yang mau dicatat hari ini?"),
+    ])
+
+
+class FakeLLMServer:
+    def __init__(self, responder=None, base_latency=0.2, per_token_latency=0.002, max_concurrency=4, port=0,
+                 latency=None, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        self.responder = responder or (lambda body: "OK")
+        self.rng = random.Random(seed)
+        # latency: a base latency sampler (see parse_latency); defaults to a constant base_latency
+        self.sample_latency = latency or (lambda: base_latency)
+        self.per_token_latency = per_token_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.slots = threading.Semaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if self.path != CHAT_PATH:
+                    self.send_error(404)
+                    return
+                try:
+                    if body.get("stream"):
+                        server.handle_stream(body, self)
+                        return
+                    status, payload = server.handle(body)
+                    data = json.dumps(payload).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                return
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _fault(self):
+        """(status, payload) for an injected failure, or None."""
+        with self.lock:
+            roll = self.rng.random()
+        if roll < self.error_rate:
+            status, message = 500, "fake server error"
+        elif roll < self.error_rate + self.rate_limit_rate:
+            status, message = 429, "fake rate limit"
+        else:
+            return None
+        with self.lock:
+            self.errors += 1
+        return status, {"error": {"message": message, "type": "fake_error"}}
+
+    def _answer(self, body):
+        """Content and token counts for one request, added to the server totals."""
+        prompt = "".join(message["content"] for message in body["messages"])
+        content = self.responder(body)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        return content, prompt_tokens, completion_tokens
+
+    def handle(self, body):
+        """Returns (status, payload) for one chat completion request."""
+        fault = self._fault()
+        if fault:
+            return fault
+        content, prompt_tokens, completion_tokens = self._answer(body)
+        with self.slots:
+            time.sleep(self.sample_latency() + self.per_token_latency * completion_tokens)
+        return 200, {
+            "id": f"chatcmpl-fake-{self.requests}", "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def handle_stream(self, body, handler):
+        """Streams the answer as SSE chunks: first byte after the base latency, then per_token_latency per token."""
+        fault = self._fault()
+        if fault:
+            data = json.dumps(fault[1]).encode()
+            handler.send_response(fault[0])
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Content-Length", str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+            return
+        content, _, _ = self._answer(body)
+        with self.slots:
+            time.sleep(self.sample_latency())
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+        for piece in re.findall(r'\S*\s*', content)[:-1] or [content]:
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": body.get("model", "fake"),
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            handler.wfile.flush()
+            time.sleep(self.per_token_latency * estimate_tokens(piece))
+        handler.wfile.write(b"data: [DONE]\n\n")
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.errors = self.prompt_tokens = self.completion_tokens = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="Base latency distribution (see parse_latency)")
+    parser.add_argument("--per-token-latency", type=float, default=0.002)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent request limit")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    server = FakeLLMServer(bot_responder(), per_token_latency=args.per_token_latency, max_concurrency=args.concurrency,
+                           port=args.port, latency=parse_latency(args.latency, rng), error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    print(f"Fake Groq server on {server.base_url} (run the bot with LLM_OFFLINE=1 GROQ_BASE_URL={server.base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput and cost of batched parse_transaction calls.
+
+Fires --messages parse requests at ParseBatcher (arrivals spread over
+--arrival-ms) for several batch sizes, against the local stand-in server
+in fake_llm_server.py, and reports wall time, msgs/sec, caller latency,
+LLM requests and tokens/cost per message.
+
+Usage:
+    python -m benchmarks.llm_batch_bench
+    python -m benchmarks.llm_batch_bench --batch-sizes 1 4 16 --messages 400
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from groq import AsyncGroq
+from benchmarks.fake_llm_server import FakeLLMServer, parse_responder
+from benchmarks.nlp_bench import load_corpus
+from modules.ai_engine import AIEngine
+from modules.llm_batch import ParseBatcher
+from modules.llm_cache import LLMCache
+
+# USD per million tokens (llama-3.3-70b-versatile on Groq at time of writing)
+INPUT_PRICE = 0.59
+OUTPUT_PRICE = 0.79
+
+
+async def run_once(server, texts, batch_size, max_wait_ms, arrival_ms):
+    ai = AIEngine(cache=LLMCache(path=None))
+    ai.async_client = AsyncGroq(api_key="bench", base_url=server.base_url, max_retries=0)
+    batcher = ParseBatcher(ai, max_batch=batch_size, max_wait_ms=max_wait_ms)
+    server.reset_counters()
+    rng = random.Random(7)
+    latencies = []
+
+    async def one(text):
+        await asyncio.sleep(rng.uniform(0, arrival_ms / 1000))
+        start = time.perf_counter()
+        result = await batcher.parse(text)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(text) for text in texts))
+    wall = time.perf_counter() - start
+    await ai.async_client.close()
+
+    latencies.sort()
+    n = len(texts)
+    cost = (server.prompt_tokens * INPUT_PRICE + server.completion_tokens * OUTPUT_PRICE) / 1e6
+    return {
+        "batch_size": batch_size,
+        "wall_s": wall,
+        "msgs_per_sec": n / wall,
+        "p50_ms": latencies[n // 2] * 1000,
+        "p95_ms": latencies[int(n * 0.95) - 1] * 1000,
+        "llm_requests": server.requests,
+        "tokens_per_msg": (server.prompt_tokens + server.completion_tokens) / n,
+        "usd_per_1k_msgs": cost / n * 1000,
+        "answered": sum(r is not None for r in results),
+        "fallbacks": batcher.stats["fallbacks"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--max-wait-ms", type=float, default=50)
+    parser.add_argument("--arrival-ms", type=float, default=2000, help="Spread of request arrivals")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="Stand-in server latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Stand-in server concurrent request limit")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # Unique texts so the response cache does not hide the LLM calls
+    texts = [f"{r['text']} #{i}" for i, r in enumerate(load_corpus(limit=args.messages))]
+    server = FakeLLMServer(parse_responder(), base_latency=args.base_latency,
+                           per_token_latency=0.001, max_concurrency=args.concurrency)
+
+    print(f"{args.messages} messages, arrivals over {args.arrival_ms:.0f} ms, "
+          f"server {args.base_latency*1000:.0f} ms/request, {args.concurrency} concurrent\n")
+    print(f"{'batch':>5s} {'wall s':>7s} {'msg/s':>7s} {'p50 ms':>7s} {'p95 ms':>7s} "
+          f"{'requests':>8s} {'tok/msg':>8s} {'$/1k msg':>9s} {'answered':>8s}")
+    with server:
+        for batch_size in args.batch_sizes:
+            r = asyncio.run(run_once(server, texts, batch_size, args.max_wait_ms, args.arrival_ms))
+            print(f"{r['batch_size']:>5d} {r['wall_s']:>7.2f} {r['msgs_per_sec']:>7.1f} {r['p50_ms']:>7.0f} "
+                  f"{r['p95_ms']:>7.0f} {r['llm_requests']:>8d} {r['tokens_per_msg']:>8.0f} "
+                  f"{r['usd_per_1k_msgs']:>9.4f} {r['answered']:>8d}")
+
+
+if __name__ == "__main__":
+    main()
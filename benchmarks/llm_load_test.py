@@ -0,0 +1,167 @@
+"""
+Open-loop load test of the bot's AI paths.
+
+Fires LLM-backed calls at --rps requests per second (Poisson arrivals) for
+--duration seconds, mixed like the bot makes them: parse_transaction,
+intent classification, streamed insights and chat. Runs against an
+in-process fake_llm_server.py by default (no network), or any
+OpenAI-compatible endpoint given with --base-url. Texts are made unique so
+the response cache does not hide the calls. Reports achieved RPS, latency
+percentiles per path (time to first piece for streamed insights) and call
+outcomes as recorded by LLMMetrics.
+
+Usage:
+    python -m benchmarks.llm_load_test
+    python -m benchmarks.llm_load_test --rps 50 --duration 30 --latency lognormal:0.5,0.6 --error-rate 0.05
+    python -m benchmarks.llm_load_test --base-url http://127.0.0.1:8088
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from groq import AsyncGroq
+from benchmarks.fake_llm_server import FakeLLMServer, bot_responder, parse_latency
+from benchmarks.nlp_bench import load_corpus
+from modules.ai_engine import AIEngine
+from modules.nlp import NLPProcessor
+from modules.llm import create_breaker
+from modules.llm_cache import LLMCache
+from modules.llm_metrics import LLMMetrics
+from modules.llm_admission import AdmissionController
+
+DEFAULT_MIX = {"parse": 5, "intent": 3, "insight": 1, "chat": 1}
+# LLMMetrics feature recorded for each path
+FEATURES = {"parse": "parse", "intent": "intent", "insight": "insight_stream", "chat": "chat"}
+
+
+def parse_mix(spec):
+    """"parse=5,intent=3" -> {"parse": 5.0, "intent": 3.0}"""
+    mix = {}
+    for part in spec.split(","):
+        path, _, weight = part.partition("=")
+        if path not in FEATURES:
+            raise ValueError(f"Unknown path {path!r}, expected one of {', '.join(FEATURES)}")
+        mix[path] = float(weight or 1)
+    return mix
+
+
+async def _call(ai, nlp, path, text, n):
+    """Runs one call; returns its latency (time to first piece for insights)."""
+    start = time.perf_counter()
+    if path == "parse":
+        await ai.parse_transaction_async(text)
+    elif path == "intent":
+        await nlp._llm_classify_intent_async(text)
+    elif path == "chat":
+        await ai.chat_response_async(text)
+    else:
+        first = None
+        summary = {"month": "2026-03", "day": 20, "spent": 1000 + n, "tx": 10,
+                   "cat": {"Makanan": 600, "Transportasi": 400 + n}, "week": [300, 250], "night_pct": 30}
+        async for _ in ai.stream_smart_insight_async(summary):
+            if first is None:
+                first = time.perf_counter() - start
+        return first
+    return time.perf_counter() - start
+
+
+async def run_load(base_url, rps=20, duration=10, mix=None, seed=7, texts=None):
+    mix = mix or DEFAULT_MIX
+    metrics = LLMMetrics(path=None)
+    cache = LLMCache(path=None)
+    breaker = create_breaker()
+    admission = AdmissionController()
+    nlp = NLPProcessor(cache=cache, breaker=breaker, metrics=metrics, admission=admission)
+    ai = AIEngine(cache=cache, breaker=breaker, nlp=nlp, metrics=metrics, admission=admission)
+    client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY") or "load-test", base_url=base_url, max_retries=0)
+    ai.async_client = nlp.async_client = client
+    texts = texts or [r["text"] for r in load_corpus(limit=500)]
+
+    rng = random.Random(seed)
+    paths, weights = list(mix), list(mix.values())
+    latencies = {path: [] for path in paths}
+
+    async def one(path, text, n):
+        latency = await _call(ai, nlp, path, text, n)
+        if latency is not None:
+            latencies[path].append(latency)
+
+    loop = asyncio.get_running_loop()
+    tasks = []
+    start = loop.time()
+    next_at = start
+    while next_at - start < duration:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        n = len(tasks)
+        path = rng.choices(paths, weights)[0]
+        tasks.append(asyncio.create_task(one(path, f"{texts[n % len(texts)]} #{n}", n)))
+        next_at += rng.expovariate(rps)
+    issued = loop.time() - start
+    await asyncio.gather(*tasks)
+    wall = loop.time() - start
+    await client.close()
+
+    usage = metrics.metrics()
+    results = {}
+    for path in paths:
+        values = np.array(latencies[path]) * 1000
+        stats = usage.get(f"{FEATURES[path]}/{ai.model}", {})
+        results[path] = {
+            "calls": stats.get("calls", 0),
+            "outcomes": stats.get("outcomes", {}),
+            "p50_ms": float(np.percentile(values, 50)) if len(values) else None,
+            "p95_ms": float(np.percentile(values, 95)) if len(values) else None,
+            "p99_ms": float(np.percentile(values, 99)) if len(values) else None,
+        }
+    return {"requests": len(tasks), "achieved_rps": len(tasks) / issued, "wall_s": wall,
+            "circuit": breaker.metrics()["state"], "paths": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of arrivals")
+    parser.add_argument("--mix", default="parse=5,intent=3,insight=1,chat=1")
+    parser.add_argument("--base-url", help="Endpoint to load (default: an in-process fake server)")
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="Fake server base latency distribution")
+    parser.add_argument("--per-token-latency", type=float, default=0.002)
+    parser.add_argument("--concurrency", type=int, default=16, help="Fake server concurrent request limit")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = FakeLLMServer(bot_responder(), per_token_latency=args.per_token_latency,
+                               max_concurrency=args.concurrency, latency=parse_latency(args.latency, random.Random(args.seed)),
+                               error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed).start()
+        base_url = server.base_url
+
+    try:
+        r = asyncio.run(run_load(base_url, args.rps, args.duration, parse_mix(args.mix), args.seed))
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"{r['requests']} requests at {r['achieved_rps']:.1f} rps (target {args.rps:.1f}), "
+          f"drained in {r['wall_s']:.1f}s, circuit {r['circuit']}\n")
+    print(f"{'path':>8s} {'calls':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}  outcomes")
+    for path, s in r["paths"].items():
+        fmt = lambda v: f"{v:>8.0f}" if v is not None else f"{'-':>8s}"
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(s["outcomes"].items()))
+        print(f"{path:>8s} {s['calls']:>6d} {fmt(s['p50_ms'])} {fmt(s['p95_ms'])} {fmt(s['p99_ms'])}  {outcomes}")
+    print("\n(insight latency is time to the first streamed piece)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Generates the NLP benchmark corpus: anonymised Indonesian finance chat
+messages with gold labels (amount, category, merchant).
+
+Merchant labels are written here by hand, independently of the bot's merchant
+dictionary (modules/merchants.py): the corpus also names local shops the
+dictionary does not know and misspells known names, so extract_merchant is
+graded on more than dictionary lookups.
+
+The output is deterministic for a given seed, so the committed corpus file can
+be regenerated exactly. Bump CORPUS_VERSION (and the output file name) when
+the templates change, so benchmark results stay comparable per version.
+
+Usage:
+    python -m benchmarks.make_nlp_corpus [--size 5000] [--seed 2026]
+"""
+import argparse
+import json
+import os
+import random
+
+CORPUS_VERSION = 2
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", f"nlp_corpus_v{CORPUS_VERSION}.jsonl")
+
+# (description template, gold category, merchants or None, (min, max) amount in thousands)
+# "{m}" is replaced by the merchant as users would type it, "{f}" by a food item.
+ITEMS = [
+    ("ngopi di {m}", "Makanan", ["Starbucks", "Kopi Kenangan", "Janji Jiwa", "Fore Coffee", "Warung Kopi Aceh"], (18, 75)),
+    ("beli {f} di {m}", "Makanan", ["Mixue", "McDonalds", "KFC", "Solaria", "Warteg Bahari", "Bakmi GM", "Warung Bu Sri"], (10, 120)),
+    ("{m} {f}", "Makanan", ["GoFood"], (20, 150)),
+    ("{m} {f}", "Makanan", ["GrabFood"], (20, 150)),
+    ("makan siang", "Makanan", None, (12, 60)),
+    ("nasi padang", "Makanan", None, (15, 45)),
+    ("sarapan bubur ayam", "Makanan", None, (8, 25)),
+    ("jajan cilok", "Makanan", None, (5, 15)),
+    ("martabak manis", "Makanan", None, (25, 80)),
+    ("{m} ke kantor", "Transportasi", ["Gojek"], (12, 60)),
+    ("{m} ke stasiun", "Transportasi", ["Grab"], (10, 55)),
+    ("naik {m}", "Transportasi", ["Bluebird", "Maxim"], (20, 150)),
+    ("isi bensin pertamax", "Transportasi", None, (20, 300)),
+    ("isi solar", "Transportasi", None, (100, 400)),
+    ("bensin di {m}", "Transportasi", ["Shell", "Pertamina"], (20, 300)),
+    ("parkir mall", "Transportasi", None, (2, 20)),
+    ("tiket krl", "Transportasi", None, (3, 20)),
+    ("bayar tol", "Transportasi", None, (10, 120)),
+    ("belanja bulanan di {m}", "Belanja", ["Indomaret", "Alfamart", "Superindo", "Toko Sinar Jaya"], (50, 900)),
+    ("checkout baju di {m}", "Belanja", ["Shopee", "Tokopedia"], (40, 500)),
+    ("beli sayur di pasar", "Belanja", None, (15, 150)),
+    ("bayar listrik {m}", "Tagihan", ["PLN"], (100, 900)),
+    ("tagihan internet {m}", "Tagihan", ["IndiHome", "Biznet"], (250, 600)),
+    ("langganan {m}", "Tagihan", ["Netflix", "Spotify"], (50, 190)),
+    ("bayar kost", "Tagihan", None, (700, 3000)),
+    ("pulsa {m}", "Tagihan", ["Telkomsel", "XL"], (10, 150)),
+    ("iuran bpjs", "Tagihan", None, (35, 150)),
+    ("tebus obat di {m}", "Kesehatan", ["Kimia Farma", "Guardian", "Apotek K24"], (20, 400)),
+    ("konsultasi dokter {m}", "Kesehatan", ["Halodoc"], (50, 300)),
+    ("beli vitamin", "Kesehatan", None, (30, 200)),
+    ("nonton di {m}", "Lifestyle", ["XXI", "CGV"], (35, 150)),
+    ("membership gym", "Lifestyle", None, (150, 700)),
+    ("topup game", "Lifestyle", None, (15, 300)),
+    ("potong rambut", "Lifestyle", None, (25, 120)),
+    ("kondangan teman kantor", "Sosial", None, (50, 500)),
+    ("sedekah jumat", "Sosial", None, (10, 200)),
+    ("kado ultah adik", "Sosial", None, (50, 400)),
+    ("kursus online {m}", "Pendidikan", ["Udemy", "Ruangguru"], (100, 900)),
+    ("buku di {m}", "Pendidikan", ["Gramedia", "Toko Buku Togamas"], (50, 300)),
+    ("bayar spp", "Pendidikan", None, (300, 2500)),
+    ("service motor di bengkel", "Maintenance", None, (80, 600)),
+    ("ganti oli motor", "Maintenance", None, (50, 150)),
+    ("cuci mobil", "Maintenance", None, (30, 100)),
+    ("nabung reksadana di {m}", "Investasi", ["Bibit"], (100, 5000)),
+    ("beli saham lewat {m}", "Investasi", ["Ajaib", "Stockbit"], (100, 5000)),
+    ("beli emas di {m}", "Investasi", ["Pluang", "Pegadaian"], (100, 3000)),
+    ("gaji bulan ini", "Gaji", None, (3000, 25000)),
+    ("bonus akhir tahun", "Gaji", None, (1000, 15000)),
+    ("transfer masuk dari klien", "Gaji", None, (500, 10000)),
+    ("refund tiket", "Gaji", None, (50, 1500)),
+    ("laundry kiloan", "Lain-lain", None, (15, 80)),
+    ("fotokopi dokumen", "Lain-lain", None, (2, 20)),
+]
+
+FOODS = ["burger", "es krim", "ayam goreng", "nasi goreng", "mie ayam", "boba"]
+
+MESSAGE_TEMPLATES = [
+    "{desc} {amt}",
+    "{desc} {amt}",
+    "{desc} {amt}",
+    "{amt} {desc}",
+    "tadi {desc} {amt}",
+    "barusan {desc} {amt}",
+    "{desc} habis {amt}",
+    "{desc} {amt} ya",
+]
+
+# Chat lines that are not transactions: gold amount is 0, no category/merchant
+NON_TRANSACTIONS = [
+    "halo", "hai bot", "pagi", "apa kabar", "makasih ya", "sisa budget makan berapa",
+    "laporan bulan ini dong", "rekap minggu ini", "help", "kamu bisa apa aja",
+    "budget transport masih aman?", "tips hemat dong", "oke sip", "siang bot",
+]
+
+
+def render_amount(rng, value):
+    """Renders an amount the way users type it. value is in rupiah."""
+    thousands = value // 1000
+    dotted = f"{value:,}".replace(",", ".")
+    if value >= 1000000 and value % 100000 == 0:
+        millions = value / 1000000
+        m_str = f"{millions:g}"
+        return rng.choice([
+            f"{m_str.replace('.', ',')}jt", f"{m_str}jt", f"{m_str.replace('.', ',')} juta",
+            f"Rp{dotted}", dotted
+        ])
+    return rng.choice([
+        f"{thousands}rb", f"{thousands}rb", f"{thousands} rb", f"{thousands}k", f"{thousands} ribu",
+        f"{thousands}rebu", dotted, f"Rp{dotted}", f"Rp {dotted}", f"rp{value}", str(value),
+        f"Rp {dotted},00"
+    ])
+
+
+def pick_value(rng, lo, hi):
+    value = rng.randint(lo, hi) * 1000
+    if value >= 1000000:
+        # Large amounts are usually round
+        value = round(value, -5)
+    elif value >= 100000 and rng.random() < 0.7:
+        value = round(value, -4)
+    elif rng.random() < 0.6:
+        value = round(value, -3) if value % 5000 == 0 else (value // 5000 + 1) * 5000
+    return max(value, 1000)
+
+
+def misspell(rng, name):
+    """The name with two neighbouring letters of one word swapped, as a typo."""
+    words = name.split()
+    i = rng.randrange(len(words))
+    word = words[i]
+    if len(word) < 6:
+        return name
+    j = rng.randrange(1, len(word) - 2)
+    words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+    return " ".join(words)
+
+
+def apply_noise(rng, text):
+    roll = rng.random()
+    if roll < 0.08:
+        return text.upper()
+    if roll < 0.18:
+        return text.capitalize()
+    if roll < 0.22:
+        return "  " + text.replace(" ", "  ", 1) + " "
+    return text
+
+
+def generate(size, seed):
+    rng = random.Random(seed)
+    records = []
+    for i in range(size):
+        if rng.random() < 0.06:
+            text = rng.choice(NON_TRANSACTIONS)
+            records.append({
+                "id": i, "text": apply_noise(rng, text),
+                "amount": 0, "category": None, "merchant": None, "type": None
+            })
+            continue
+
+        desc_tpl, category, merchants, (lo, hi) = rng.choice(ITEMS)
+        merchant = rng.choice(merchants) if merchants else None
+        typed_merchant = merchant
+        if merchant and rng.random() < 0.5:
+            typed_merchant = merchant.lower()
+        if merchant and rng.random() < 0.15:
+            typed_merchant = misspell(rng, typed_merchant)
+        desc = desc_tpl.replace("{m}", typed_merchant or "").replace("{f}", rng.choice(FOODS))
+        value = pick_value(rng, lo, hi)
+
+        if merchant and rng.random() < 0.1:
+            # Bank/e-wallet notification style
+            text = f"Pembayaran QRIS Rp{value:,} di {merchant.upper()}".replace(",", ".")
+        else:
+            text = rng.choice(MESSAGE_TEMPLATES).format(desc=desc, amt=render_amount(rng, value))
+
+        records.append({
+            "id": i,
+            "text": apply_noise(rng, text),
+            "amount": value,
+            "category": category,
+            "merchant": merchant,
+            "type": "income" if category == "Gaji" else "expense"
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--out", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    records = generate(args.size, args.seed)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"Wrote {len(records)} records to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Generates synthetic receipt photos with gold labels (merchant, date, total,
+line items) for the OCR benchmarks.
+
+Each receipt is rendered on white paper in one of the installed FONTS, with
+its money printed in one of the AMOUNT_FORMATS (1.250.000, 1.250.000,00,
+1,250,000.00, ...). Some are faded like old thermal paper. The paper is
+placed on a darker table, tilted a few degrees, blurred, noised and
+JPEG-encoded at Telegram photo sizes. Some are stored sideways with an EXIF
+orientation tag, like phone photos. The labels also record the font, amount
+format and fade of each receipt. Images are generated in memory and are
+deterministic for a given seed and set of installed fonts, so nothing needs
+to be committed, and nothing is downloaded.
+
+simulate_ocr() skips the pixels: it lays a receipt out as EasyOCR-style
+(box, text, confidence) results, with residual tilt, box jitter, character
+confusions and EasyOCR's top-to-bottom ordering, to benchmark parsers
+without a model.
+
+Usage:
+    python -m benchmarks.make_receipts --count 20 --out /tmp/receipts
+"""
+import argparse
+import io
+import json
+import os
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+RECEIPT_SET_VERSION = 3
+
+MERCHANTS = ["INDOMARET", "ALFAMART", "SUPERINDO", "KOPI KENANGAN", "WARUNG BAHARI", "SOLARIA",
+             "GRAMEDIA", "KIMIA FARMA", "HYPERMART", "MIXUE"]
+ITEMS = ["AQUA 600ML", "INDOMIE GRG", "ROTI TAWAR", "KOPI SUSU", "TELUR 1KG", "GULA PASIR", "SABUN MANDI",
+         "NASI AYAM", "ES TEH MANIS", "BUKU TULIS", "PARACETAMOL", "MINYAK 2L", "SUSU UHT", "KERIPIK"]
+# Long side of the photos Telegram delivers as photo[-1]
+PHOTO_SIDES = (1280, 1280, 1600)
+# EXIF orientation tags for photos stored sideways/upside down, and the rotation that stores them so
+_EXIF_ROTATIONS = {6: Image.Transpose.ROTATE_90, 8: Image.Transpose.ROTATE_270, 3: Image.Transpose.ROTATE_180}
+# Receipt fonts, (regular, bold) under /usr/share/fonts/truetype as the Debian fonts-dejavu, fonts-liberation
+# and fonts-freefont-ttf packages install them. Those not installed are skipped; with none, Pillow's own font
+FONTS = {
+    "dejavu-mono": ("dejavu/DejaVuSansMono.ttf", "dejavu/DejaVuSansMono-Bold.ttf"),
+    "liberation-mono": ("liberation/LiberationMono-Regular.ttf", "liberation/LiberationMono-Bold.ttf"),
+    "free-mono": ("freefont/FreeMono.ttf", "freefont/FreeMonoBold.ttf"),
+    "dejavu-sans": ("dejavu/DejaVuSans.ttf", "dejavu/DejaVuSans-Bold.ttf"),
+    "liberation-sans": ("liberation/LiberationSans-Regular.ttf", "liberation/LiberationSans-Bold.ttf"),
+}
+FONT_DIR = "/usr/share/fonts/truetype"
+# How receipts print money, and how often: Indonesian thousands, with sen, English, bare digits
+AMOUNT_FORMATS = {"dots": 5, "dots-sen": 2, "commas": 1, "commas-cents": 1, "plain": 1}
+
+
+def available_fonts():
+    """Names of the FONTS installed here, or ["default"] for Pillow's built-in font."""
+    names = [name for name, (regular, _) in FONTS.items() if os.path.exists(os.path.join(FONT_DIR, regular))]
+    return names or ["default"]
+
+
+def _font(size, bold=False, family="dejavu-mono"):
+    if family in FONTS:
+        try:
+            return ImageFont.truetype(os.path.join(FONT_DIR, FONTS[family][bold]), size)
+        except OSError:
+            pass
+    return ImageFont.load_default(size)
+
+
+def format_amount(value, style="dots"):
+    """value as a receipt in the given AMOUNT_FORMATS style prints it: 1.250.000, 1.250.000,00, 1,250,000.00..."""
+    if style == "plain":
+        return f"{value:.0f}"
+    if style == "commas":
+        return f"{value:,.0f}"
+    if style == "commas-cents":
+        return f"{value:,.2f}"
+    text = f"{value:,.2f}" if style == "dots-sen" else f"{value:,.0f}"
+    return text.replace(",", " ").replace(".", ",").replace(" ", ".")
+
+
+def receipt_lines(rng):
+    """
+    Text lines of one receipt, as (text, align, extra), and its gold labels.
+    Items are printed on two lines (name, then qty x price and amount) or
+    on one; headers sometimes carry a phone or NPWP number. All money on a
+    receipt is printed in one of the AMOUNT_FORMATS.
+    """
+    style = rng.choices(list(AMOUNT_FORMATS), weights=list(AMOUNT_FORMATS.values()))[0]
+
+    def rupiah(value):
+        return format_amount(value, style)
+
+    merchant = rng.choice(MERCHANTS)
+    date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2026"
+    items = []
+    # Now and then a big shop, with totals in the millions
+    unit = 5000 if rng.random() < 0.15 else 500
+    for name in rng.sample(ITEMS, rng.randint(2, 7)):
+        qty = rng.choice([1, 1, 1, 2, 3])
+        price = rng.randint(2, 60) * unit
+        items.append((name, qty, price))
+    subtotal = sum(qty * price for _, qty, price in items)
+    tax = round(subtotal * 0.11) if rng.random() < 0.5 else 0
+    total = subtotal + tax
+    cash = ((total // 50000) + 1) * 50000
+
+    lines = [(merchant, "center", True), (f"JL. {rng.choice(['SUDIRMAN', 'GATOT SUBROTO', 'MARGONDA'])} NO.{rng.randint(1, 200)}", "center", False)]
+    if rng.random() < 0.5:
+        lines.append((f"TELP 0812{rng.randint(10000000, 99999999)}", "center", False))
+    if rng.random() < 0.3:
+        lines.append((f"NPWP 0{rng.randint(1, 9)}.{rng.randint(100, 999)}.{rng.randint(100, 999)}.{rng.randint(1, 9)}-{rng.randint(100, 999)}.000", "center", False))
+    lines += [(f"TGL {date}  {rng.randint(7, 22):02d}:{rng.randint(0, 59):02d}", "left", False), ("-" * 30, "left", False)]
+    one_line = rng.random() < 0.4
+    for name, qty, price in items:
+        if one_line:
+            lines.append((f"{name} {qty}x{rupiah(price)}" if qty > 1 else name, "split", rupiah(qty * price)))
+        else:
+            lines.append((f"{name}", "left", False))
+            lines.append((f"  {qty} x {rupiah(price)}", "split", rupiah(qty * price)))
+    lines.append(("-" * 30, "left", False))
+    lines.append(("SUBTOTAL", "split", rupiah(subtotal)))
+    if tax:
+        lines.append(("PPN 11%", "split", rupiah(tax)))
+    lines.append(("TOTAL", "split-bold", rupiah(total)))
+    lines.append(("TUNAI", "split", rupiah(cash)))
+    lines.append(("KEMBALI", "split", rupiah(cash - total)))
+    lines.append(("TERIMA KASIH", "center", False))
+    truth_items = [{"name": name, "qty": qty, "price": float(price)} for name, qty, price in items]
+    return lines, {"merchant": merchant, "date": date, "amount": float(total), "items": truth_items,
+                   "amount_format": style}
+
+
+def _paper_width(lines, font_size):
+    """At least 19 font sizes, about a 58mm roll, and wide enough for the longest label, gap and amount."""
+    chars = max(len(text) + (len(extra) + 2 if isinstance(extra, str) else 0) for text, _, extra in lines)
+    return max(font_size * 19, int((chars * 0.6 + 1) * font_size))
+
+
+def render_paper(lines, font_size, font="dejavu-mono"):
+    font, bold = _font(font_size, family=font), _font(font_size, bold=True, family=font)
+    width = _paper_width(lines, font_size)
+    line_height = int(font_size * 1.45)
+    paper = Image.new("L", (width, line_height * (len(lines) + 2)), 250)
+    draw = ImageDraw.Draw(paper)
+    margin = font_size // 2
+    for i, (text, align, extra) in enumerate(lines):
+        y = line_height * (i + 1)
+        if align == "center":
+            w = draw.textlength(text, font=bold if extra else font)
+            draw.text(((width - w) / 2, y), text, fill=20, font=bold if extra else font)
+        elif align.startswith("split"):
+            f = bold if align == "split-bold" else font
+            draw.text((margin, y), text, fill=20, font=f)
+            draw.text((width - margin - draw.textlength(extra, font=f), y), extra, fill=20, font=f)
+        else:
+            draw.text((margin, y), text, fill=20, font=font)
+    return paper
+
+
+def thermal_fade(paper, rng, strength):
+    """
+    Paper as old thermal print: the ink lightened towards the paper tone by
+    up to `strength` (0-1), more towards one end of the receipt, and
+    unevenly across it in the print head's streaks.
+    """
+    ink = np.asarray(paper, dtype=np.float32)
+    along = np.linspace(0.4, 1.0, ink.shape[0])[:, None]
+    if rng.random() < 0.5:
+        along = along[::-1]
+    streaks = np.random.default_rng(rng.randint(0, 1 << 30)).uniform(0.6, 1.2, ink.shape[1] // 8 + 1)
+    across = np.repeat(streaks, 8)[None, :ink.shape[1]]
+    fade = np.clip(strength * along * across, 0, 0.9)
+    return Image.fromarray((ink + (250 - ink) * fade).astype(np.uint8))
+
+
+def generate_receipt(rng, fonts=None):
+    """One synthetic receipt photo: (JPEG bytes, gold labels). fonts: names to pick from, available_fonts() by default."""
+    lines, truth = receipt_lines(rng)
+    side = rng.choice(PHOTO_SIDES)
+    truth["font"] = rng.choice(fonts or available_fonts())
+    paper = render_paper(lines, font_size=rng.randint(24, 34), font=truth["font"])
+    truth["fade"] = round(rng.uniform(0.3, 0.7), 2) if rng.random() < 0.3 else 0.0
+    if truth["fade"]:
+        paper = thermal_fade(paper, rng, truth["fade"])
+
+    # Paper fills 45-75% of the photo height, on a darker table
+    height = side
+    width = side * 3 // 4
+    scale = rng.uniform(0.45, 0.75) * height / paper.height
+    paper = paper.resize((max(1, int(paper.width * scale)), max(1, int(paper.height * scale))), Image.LANCZOS)
+    paper = paper.rotate(rng.uniform(-6, 6), resample=Image.BICUBIC, expand=True, fillcolor=0)
+    mask = paper.point(lambda v: 255 if v > 0 else 0)
+    table_tone = rng.randint(40, 120)
+    table = np.clip(rng.gauss(0, 1) * 5 + table_tone + np.random.default_rng(rng.randint(0, 1 << 30)).normal(0, 12, (height, width)), 0, 255)
+    photo = Image.fromarray(table.astype(np.uint8)).convert("RGB")
+    paper_rgb = Image.merge("RGB", [paper.point(lambda v, k=k: min(255, int(v * k))) for k in (1.0, 0.98, 0.93)])
+    x = rng.randint(0, max(0, width - paper.width))
+    y = rng.randint(0, max(0, height - paper.height))
+    photo.paste(paper_rgb, (x, y), mask)
+    photo = photo.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.0)))
+    # Sensor noise over paper and table alike
+    noise = np.random.default_rng(rng.randint(0, 1 << 30)).normal(0, rng.uniform(1, 5), (height, width, 1))
+    photo = Image.fromarray(np.clip(np.asarray(photo, dtype=np.float32) + noise, 0, 255).astype(np.uint8))
+
+    exif = Image.Exif()
+    orientation = rng.choice([1, 1, 1, 1, 6, 8, 3]) if rng.random() < 0.5 else 1
+    if orientation != 1:
+        photo = photo.transpose(_EXIF_ROTATIONS[orientation])
+        exif[0x0112] = orientation
+    out = io.BytesIO()
+    photo.save(out, "JPEG", quality=rng.randint(75, 92), exif=exif.tobytes())
+    truth["orientation"] = orientation
+    return out.getvalue(), truth
+
+
+# Characters OCR confuses, each way
+_CONFUSIONS = {"O": "0", "0": "O", "S": "5", "5": "S", "I": "1", "1": "I", "B": "8", "8": "B", "G": "6", ".": ","}
+
+
+def _noisy(text, rng, char_noise):
+    return "".join(_CONFUSIONS.get(c, c) if c in _CONFUSIONS and rng.random() < char_noise else c for c in text)
+
+
+def simulate_ocr(lines, rng, font_size=24, tilt=1.5, char_noise=0.02, split_rate=0.1):
+    """
+    EasyOCR-style readtext results for receipt lines: axis-aligned boxes of
+    each run of text (double spaces and the split-line gap separate boxes),
+    tilted up to `tilt` degrees, jittered, with `char_noise` confusions per
+    character, boxes split at a space with `split_rate`, and sorted by
+    their top edge like EasyOCR does.
+    """
+    char_w, line_h = font_size * 0.6, font_size * 1.45
+    width, margin = _paper_width(lines, font_size), font_size // 2
+    slope = np.tan(np.radians(rng.uniform(-tilt, tilt)))
+
+    runs = []
+    for i, (text, align, extra) in enumerate(lines):
+        y = line_h * (i + 1)
+        if align == "center":
+            runs.append(((width - len(text) * char_w) / 2, y, text))
+        elif align.startswith("split"):
+            runs.append((margin + (len(text) - len(text.lstrip())) * char_w, y, text.strip()))
+            runs.append((width - margin - len(extra) * char_w, y, extra))
+        else:
+            x = margin
+            for part in text.split("  "):
+                if part:
+                    runs.append((x, y, part))
+                x += (len(part) + 2) * char_w
+
+    results = []
+    for x, y, text in runs:
+        parts = [text]
+        if " " in text and rng.random() < split_rate:
+            cut = rng.choice([i for i, c in enumerate(text) if c == " "])
+            parts = [text[:cut], text[cut + 1:]]
+        for part in parts:
+            x0 = x + (text.find(part) * char_w if part is not text else 0)
+            x1 = x0 + len(part) * char_w
+            top = y + x0 * slope + rng.uniform(-2, 2)
+            bottom = y + x1 * slope + font_size + rng.uniform(-2, 2)
+            top, bottom = min(top, bottom - font_size), max(bottom, top + font_size)
+            box = [[int(x0), int(top)], [int(x1), int(top)], [int(x1), int(bottom)], [int(x0), int(bottom)]]
+            results.append((box, _noisy(part, rng, char_noise), round(rng.uniform(0.6, 0.99), 2)))
+    return sorted(results, key=lambda r: r[0][0][1])
+
+
+def simulated_results(count, seed=2026, **noise):
+    """count receipts as [(readtext-style results, labels)], deterministic for a seed."""
+    rng = random.Random(seed)
+    receipts = []
+    for _ in range(count):
+        lines, truth = receipt_lines(rng)
+        receipts.append((simulate_ocr(lines, rng, **noise), truth))
+    return receipts
+
+
+def generate(count, seed=2026, fonts=None):
+    """count receipts as [(jpeg bytes, labels)], deterministic for a seed (and fonts)."""
+    rng = random.Random(seed)
+    fonts = fonts or available_fonts()
+    return [generate_receipt(rng, fonts) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--out", required=True, help="Directory for the JPEGs and labels.jsonl")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, "labels.jsonl"), "w", encoding="utf-8") as f:
+        for i, (data, truth) in enumerate(generate(args.count, args.seed)):
+            name = f"receipt_{i:03d}.jpg"
+            with open(os.path.join(args.out, name), "wb") as image:
+                image.write(data)
+            f.write(json.dumps({"file": name, **truth}) + "\n")
+    print(f"Wrote {args.count} receipts to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
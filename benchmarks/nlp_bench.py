@@ -0,0 +1,306 @@
+"""
+NLP throughput and accuracy benchmark.
+
+Runs normalize_text, _extract_amount, _detect_category, extract_merchant and
+process_text over the gold-labelled corpus (see make_nlp_corpus.py) and
+reports, per function:
+  - throughput in messages/sec and p50/p99 per-call latency
+  - allocations per call (tracemalloc: peak bytes and blocks left allocated)
+  - accuracy against the gold labels
+  - throughput relative to a fixed reference tokenizer timed in the same run
+process_batch is timed over the whole corpus as a single call.
+The whole benchmark is run --runs times and the median of each timing
+figure is reported, so a single noisy run can neither trip the gate nor end
+up in the baseline.
+
+Results are compared with a stored baseline; the run fails (exit code 1) if
+any relative throughput drops more than --max-regression below it, or any
+accuracy drops at all. Raw msg/s depend on the machine, so the baseline
+keeps only the ratio to the reference, which the same code keeps roughly
+constant across machines.
+
+Usage:
+    python -m benchmarks.nlp_bench
+    python -m benchmarks.nlp_bench --update-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.make_nlp_corpus import DEFAULT_PATH as DEFAULT_CORPUS
+from modules.nlp import NLPProcessor
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nlp_baseline.json")
+
+
+def load_corpus(path=DEFAULT_CORPUS, limit=None):
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return records[:limit] if limit else records
+
+
+# --- Accuracy checks: (record, output) -> True/False, or None if the record has no gold label ---
+
+def _check_normalize(record, output):
+    if not record["amount"]:
+        return None
+    return str(int(record["amount"])) in output
+
+
+def _check_amount(record, output):
+    return output == record["amount"]
+
+
+def _check_category(record, output):
+    if record["category"] is None:
+        return None
+    return output == record["category"]
+
+
+def _check_merchant(record, output):
+    if record["merchant"] is None:
+        return None
+    return output.lower() == record["merchant"].lower()
+
+
+def _check_process_text(record, output):
+    amount, category, type_ = output
+    if record["category"] is None:
+        return amount == 0
+    return (amount, category, type_) == (record["amount"], record["category"], record["type"])
+
+
+FUNCTIONS = [
+    ("normalize_text", lambda nlp: nlp.normalize_text, _check_normalize),
+    ("_extract_amount", lambda nlp: nlp._extract_amount, _check_amount),
+    ("_detect_category", lambda nlp: nlp._detect_category, _check_category),
+    ("extract_merchant", lambda nlp: nlp.extract_merchant, _check_merchant),
+    ("process_text", lambda nlp: nlp.process_text, _check_process_text),
+]
+
+
+_REFERENCE_WORD = re.compile(r"\w+")
+
+
+def reference_tokenize(text):
+    """Fixed workload the NLP functions are timed against; never change it, or re-baseline."""
+    return [word for word in _REFERENCE_WORD.findall(text.lower()) if not word.isdigit()]
+
+
+def _percentile(sorted_values, pct):
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _Failed:
+    """Output placeholder for a call that raised; graded as wrong."""
+
+
+FAILED = _Failed()
+
+
+def _guard(func):
+    # Inputs that make a function raise are part of what we measure, not a reason to abort
+    def call(text):
+        try:
+            return func(text)
+        except Exception:
+            return FAILED
+    return call
+
+
+def bench_function(func, check, records, repeat):
+    texts = [r["text"] for r in records]
+    func = _guard(func)
+
+    # 1. Timing, each call paired with a reference_tokenize call on the same
+    # text so machine speed and load drift cancel out of the ratio
+    latencies, reference = [], []
+    perf = time.perf_counter_ns
+    total = 0
+    for _ in range(repeat):
+        for text in texts:
+            t0 = perf()
+            reference_tokenize(text)
+            t1 = perf()
+            func(text)
+            t2 = perf()
+            reference.append(t1 - t0)
+            latencies.append(t2 - t1)
+            total += t2 - t1
+    total_s = total / 1e9
+    latencies.sort()
+    reference.sort()
+
+    # 2. Allocations (separate pass, tracemalloc distorts timing)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    outputs = [func(text) for text in texts]
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained_blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    # 3. Accuracy
+    verdicts = [check(r, out) if out is not FAILED else False for r, out in zip(records, outputs)]
+    graded = [v for v in verdicts if v is not None]
+
+    return {
+        "msgs_per_sec": len(texts) * repeat / total_s,
+        "p50_us": _percentile(latencies, 50) / 1000,
+        "p99_us": _percentile(latencies, 99) / 1000,
+        "relative": _percentile(reference, 50) / _percentile(latencies, 50),
+        "peak_bytes_per_call": peak / len(texts),
+        "retained_blocks": retained_blocks,
+        "accuracy": sum(graded) / len(graded) if graded else None,
+        "graded": len(graded),
+        "errors": sum(out is FAILED for out in outputs),
+    }
+
+
+def bench_batch(nlp, records, repeat):
+    texts = [r["text"] for r in records]
+    timings, ratios = [], []
+    # At least 5 passes: one whole-corpus call per pass is few samples
+    for _ in range(max(repeat, 5)):
+        t0 = time.perf_counter()
+        for text in texts:
+            reference_tokenize(text)
+        t1 = time.perf_counter()
+        result = nlp.process_batch(texts)
+        timings.append(time.perf_counter() - t1)
+        ratios.append((t1 - t0) / timings[-1])
+    categories = result["categories"]
+    correct = sum(
+        _check_process_text(r, (result["amounts"][i], categories[result["category_codes"][i]], result["types"][i]))
+        for i, r in enumerate(records)
+    )
+    best = min(timings)
+    return {
+        "msgs_per_sec": len(texts) / best,
+        "p50_us": best * 1e6,
+        "p99_us": max(timings) * 1e6,
+        "relative": sorted(ratios)[len(ratios) // 2],
+        "peak_bytes_per_call": None,
+        "retained_blocks": None,
+        "accuracy": correct / len(records),
+        "graded": len(records),
+        "errors": 0,
+    }
+
+
+def run_benchmark(corpus=DEFAULT_CORPUS, limit=None, repeat=3):
+    records = load_corpus(corpus, limit)
+    nlp = NLPProcessor()
+    # Keep the LLM out of the measurement
+    nlp.groq_enabled = False
+
+    results = {}
+    for name, getter, check in FUNCTIONS:
+        results[name] = bench_function(getter(nlp), check, records, repeat)
+    results["process_batch"] = bench_batch(nlp, records, repeat)
+    return results
+
+
+def median_of_runs(runs):
+    """Combines several run_benchmark results, taking the median timing figures per function."""
+    combined = {}
+    for name, first in runs[0].items():
+        merged = dict(first)
+        for key in ("msgs_per_sec", "p50_us", "p99_us", "relative"):
+            values = sorted(run[name][key] for run in runs)
+            merged[key] = values[len(values) // 2]
+        combined[name] = merged
+    return combined
+
+
+def compare_to_baseline(results, baseline, max_regression):
+    """Returns a list of human-readable regressions (empty if none)."""
+    problems = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        floor = base["relative"] * (1 - max_regression)
+        if current["relative"] < floor:
+            problems.append(
+                f"{name}: throughput {current['relative']:.3f}x reference < {floor:.3f}x "
+                f"(baseline {base['relative']:.3f}x, -{max_regression:.0%} allowed)"
+            )
+        if base.get("accuracy") is not None and current["accuracy"] is not None \
+                and current["accuracy"] + 1e-9 < base["accuracy"]:
+            problems.append(f"{name}: accuracy {current['accuracy']:.2%} < baseline {base['accuracy']:.2%}")
+    return problems
+
+
+def format_table(results):
+    lines = [
+        f"{'function':18s} {'msg/s':>11s} {'x ref':>7s} {'p50 us':>9s} {'p99 us':>9s} {'peak B/call':>12s} {'retained':>9s} {'accuracy':>9s} {'errors':>7s}",
+    ]
+    for name, r in results.items():
+        peak = f"{r['peak_bytes_per_call']:,.0f}" if r["peak_bytes_per_call"] is not None else "-"
+        retained = f"{r['retained_blocks']:,}" if r["retained_blocks"] is not None else "-"
+        acc = f"{r['accuracy']:.2%}" if r["accuracy"] is not None else "-"
+        lines.append(
+            f"{name:18s} {r['msgs_per_sec']:>11,.0f} {r['relative']:>7.3f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} {peak:>12s} {retained:>9s} {acc:>9s} {r['errors']:>7d}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N records")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=3,
+                        help="Independent runs; the gate and baseline use the median of them")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed drop in throughput relative to the reference vs baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="Also write raw results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    results = median_of_runs([run_benchmark(args.corpus, args.limit, args.repeat)
+                              for _ in range(max(args.runs, 1))])
+    print(format_table(results))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {name: {"relative": r["relative"], "accuracy": r["accuracy"]}
+                    for name, r in results.items()}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline found; run with --update-baseline first.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    problems = compare_to_baseline(results, baseline, args.max_regression)
+    if problems:
+        print("\nREGRESSION:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\nNo regression against baseline.")
+
+
+if __name__ == "__main__":
+    main()
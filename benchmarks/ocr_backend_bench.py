@@ -0,0 +1,105 @@
+"""
+OCR backends: latency, memory and amount accuracy on the same receipts.
+
+Reads a synthetic receipt set (benchmarks/make_receipts.py) with each
+OCR backend (modules/ocr_backends.py) through OCRProcessor, full reads with
+the configured preprocessing. Every backend runs in its own spawned process,
+so its peak RSS is its own: the model load and the reads, as one OCR worker
+would hold them. Reports the load time, OCR ms p50/p95 per receipt, peak RSS,
+how many totals were right and, for the cascade, how many receipts fell back
+to EasyOCR.
+
+A backend that cannot load here (no EasyOCR model in ~/.EasyOCR, no
+tesseract binary) is listed as unavailable with the reason.
+
+Usage:
+    python -m benchmarks.ocr_backend_bench
+    python -m benchmarks.ocr_backend_bench --count 50 --backends tesseract,cascade
+    python -m benchmarks.ocr_backend_bench --min-confidence 0.85
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from config import OCR_CASCADE_MIN_CONFIDENCE
+from modules.ocr_backends import BACKENDS, CascadeBackend, make_backend
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(name, count, seed, min_confidence):
+    """Load ms, OCR ms per receipt, correct totals, fallbacks and peak RSS of one backend; "error" if it cannot load."""
+    logging.disable(logging.WARNING)
+    from benchmarks.make_receipts import generate
+    from modules.ocr import OCRProcessor
+
+    receipts = generate(count, seed)
+    backend = make_backend(name)
+    if isinstance(backend, CascadeBackend):
+        backend.min_confidence = min_confidence
+    base_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        backend.load()
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+    load_ms = (time.perf_counter() - start) * 1000
+
+    ocr = OCRProcessor(backend=backend)
+    ocr_ms, correct = [], 0
+    try:
+        for data, truth in receipts:
+            result = ocr.process_receipt(data)
+            ocr_ms.append(result["timings"]["ocr"])
+            correct += result["amount"] == truth["amount"]
+    except Exception as e:
+        # The cascade loads EasyOCR on its first fallback
+        return {"error": str(e) or type(e).__name__}
+    return {
+        "load_ms": load_ms, "ocr_ms": ocr_ms, "correct": correct,
+        "fallbacks": getattr(backend, "fallbacks", None),
+        "base_rss_mb": base_rss, "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_isolated(name, count, seed, min_confidence):
+    """run_backend in a fresh spawned process, so backends do not share memory or loaded models."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_backend, (name, count, seed, min_confidence))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated, any of " + ", ".join(BACKENDS))
+    parser.add_argument("--min-confidence", type=float, default=OCR_CASCADE_MIN_CONFIDENCE,
+                        help="Cascade: mean Tesseract confidence below which EasyOCR reads the receipt")
+    args = parser.parse_args()
+
+    print(f"{args.count} receipts, cascade min confidence {args.min_confidence}\n")
+    print(f"{'backend':>10s} {'load ms':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'peak MB':>8s} {'+MB':>7s} "
+          f"{'amount ok':>10s} {'fallbacks':>10s}")
+    for name in (n.strip() for n in args.backends.split(",") if n.strip()):
+        r = _run_isolated(name, args.count, args.seed, args.min_confidence)
+        if "error" in r:
+            print(f"{name:>10s} unavailable: {r['error']}")
+            continue
+        p50, p95 = np.percentile(r["ocr_ms"], [50, 95])
+        fallbacks = f"{r['fallbacks']}/{args.count}" if r["fallbacks"] is not None else "-"
+        print(f"{name:>10s} {r['load_ms']:>9.0f} {p50:>8.0f} {p95:>8.0f} {r['peak_rss_mb']:>8.0f} "
+              f"{r['peak_rss_mb'] - r['base_rss_mb']:>7.0f} {str(r['correct']) + '/' + str(args.count):>10s} {fallbacks:>10s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+OCR benchmark suite: latency per stage, peak memory and accuracy per OCR
+backend and preprocessing setting.
+
+Reads one synthetic receipt set (benchmarks/make_receipts.py: installed
+fonts, every amount format, thermal fade, rotation, blur and noise, with
+known merchant, date and total) through OCRProcessor, full reads, once per
+backend (modules/ocr_backends.py) and preprocessing setting. Every
+combination runs in its own spawned process, so its peak RSS is its own.
+
+For each combination it reports the model load, the mean ms of every stage
+(decode, each preprocessing step, the OCR, parsing its text), ms p50/p95 per
+receipt, peak RSS and the share of receipts whose amount, date and merchant
+came out right. A second table breaks the amounts down by how the receipt
+printed them (1.250.000 / 1.250.000,00 / 1,250,000.00 ...) and by fade.
+
+Preprocessing settings are "full", "none", or those of ocr_preprocess_bench:
+"+step" (steps up to that one) and "-step" (the full pipeline without it).
+
+It runs offline: receipts are rendered locally and EasyOCR never downloads
+its model. A backend that cannot load here (no model in ~/.EasyOCR, no
+tesseract binary) is listed as unavailable with the reason.
+
+Usage:
+    python -m benchmarks.ocr_bench
+    python -m benchmarks.ocr_bench --count 50 --backends tesseract --preprocess none,full,-deskew
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from benchmarks.make_receipts import AMOUNT_FORMATS
+from benchmarks.ocr_preprocess_bench import configurations
+from modules.ocr_backends import BACKENDS
+from modules.ocr_preprocess import STEPS
+
+FIELDS = ("amount", "date", "merchant")
+
+
+def preprocessing_settings():
+    """Setting name -> preprocessing steps."""
+    return {"full": STEPS, **dict(configurations())}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def score(result, truth):
+    """Which of amount, date and merchant process_receipt read right."""
+    return {
+        "amount": result["amount"] == truth["amount"],
+        "date": result["date"] == truth["date"],
+        "merchant": (result["merchant"] or "").strip().upper() == truth["merchant"],
+    }
+
+
+def run_combination(backend_name, steps, count, seed):
+    """Load ms, stage ms, ms per receipt, peak RSS and hits of one backend and setting; "error" if it cannot load."""
+    logging.disable(logging.WARNING)
+    from benchmarks.make_receipts import generate
+    from modules.ocr import OCRProcessor
+    from modules.ocr_backends import make_backend
+    from modules.ocr_preprocess import ReceiptPreprocessor
+
+    receipts = generate(count, seed)
+    backend = make_backend(backend_name)
+    base_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        backend.load()
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+    load_ms = (time.perf_counter() - start) * 1000
+
+    ocr = OCRProcessor(preprocessor=ReceiptPreprocessor(steps=steps), backend=backend)
+    timings, receipt_ms, hits = [], [], []
+    try:
+        for data, truth in receipts:
+            start = time.perf_counter()
+            result = ocr.process_receipt(data)
+            receipt_ms.append((time.perf_counter() - start) * 1000)
+            timings.append(result["timings"])
+            hits.append({**score(result, truth), "format": truth["amount_format"], "faded": bool(truth["fade"])})
+    except Exception as e:
+        # The cascade loads EasyOCR on its first fallback
+        return {"error": str(e) or type(e).__name__}
+    names = {name for t in timings for name in t}
+    return {
+        "load_ms": load_ms, "receipt_ms": receipt_ms, "hits": hits,
+        "stage_ms": {name: float(np.mean([t.get(name, 0.0) for t in timings])) for name in names},
+        "base_rss_mb": base_rss, "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_isolated(backend_name, steps, count, seed):
+    """run_combination in a fresh spawned process, so combinations do not share memory or loaded models."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_combination, (backend_name, steps, count, seed))
+
+
+def _share(hits, field, **where):
+    """'hits/receipts' for field among the hits matching where, '-' when none match."""
+    chosen = [h for h in hits if all(h[key] == value for key, value in where.items())]
+    return f"{sum(h[field] for h in chosen)}/{len(chosen)}" if chosen else "-"
+
+
+def main():
+    settings = preprocessing_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated, any of " + ", ".join(BACKENDS))
+    parser.add_argument("--preprocess", default="none,full", help="Comma-separated, any of " + ", ".join(settings))
+    args = parser.parse_args()
+
+    names = lambda value: [n.strip() for n in value.split(",") if n.strip()]
+    unknown = [name for name in names(args.preprocess) if name not in settings]
+    if unknown:
+        parser.error(f"unknown preprocessing setting(s): {', '.join(unknown)}")
+    combos = [(backend, setting) for backend in names(args.backends) for setting in names(args.preprocess)]
+
+    results = {}
+    for backend, setting in combos:
+        results[backend, setting] = _run_isolated(backend, settings[setting], args.count, args.seed)
+
+    stages = ("decode",) + STEPS + ("ocr", "parse")
+    print(f"{args.count} receipts (mean ms per stage, accuracy in %)\n")
+    print(f"{'backend':>10s} {'preprocess':>11s} {'load ms':>8s} " + " ".join(f"{s:>9s}" for s in stages)
+          + f" {'p50 ms':>7s} {'p95 ms':>7s} {'peak MB':>8s} " + " ".join(f"{f:>8s}" for f in FIELDS))
+    for (backend, setting), r in results.items():
+        if "error" in r:
+            print(f"{backend:>10s} {setting:>11s} unavailable: {r['error']}")
+            continue
+        cells = " ".join(f"{r['stage_ms'][s]:>9.1f}" if s in r["stage_ms"] else f"{'-':>9s}" for s in stages)
+        p50, p95 = np.percentile(r["receipt_ms"], [50, 95])
+        accuracy = " ".join(f"{100 * np.mean([h[f] for h in r['hits']]):>8.0f}" for f in FIELDS)
+        print(f"{backend:>10s} {setting:>11s} {r['load_ms']:>8.0f} {cells} {p50:>7.0f} {p95:>7.0f} "
+              f"{r['peak_rss_mb']:>8.0f} {accuracy}")
+
+    read = {combo: r for combo, r in results.items() if "error" not in r}
+    if not read:
+        return
+    print("\namount right, by printed format and fade")
+    columns = list(AMOUNT_FORMATS) + ["faded", "clear"]
+    print(f"{'backend':>10s} {'preprocess':>11s} " + " ".join(f"{c:>12s}" for c in columns))
+    for (backend, setting), r in read.items():
+        cells = [_share(r["hits"], "amount", format=name) for name in AMOUNT_FORMATS]
+        cells += [_share(r["hits"], "amount", faded=True), _share(r["hits"], "amount", faded=False)]
+        print(f"{backend:>10s} {setting:>11s} " + " ".join(f"{c:>12s}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
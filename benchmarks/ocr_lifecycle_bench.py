@@ -0,0 +1,133 @@
+"""
+OCR model lifecycle: startup, first-receipt latency and memory per policy.
+
+Runs OCRPool with each lifecycle policy and reports:
+- ready s: time warm_up() took (the bot runs it in the background at startup)
+- first ms: latency of the first receipt after startup
+- RSS / PSS MB: memory of the workers (and, with preloading, of the bot
+  process holding the model), summed. PSS splits pages shared between
+  processes, so it is the memory actually used.
+- idle MB / reload ms: memory left once the idle workers exit
+  (OCR_IDLE_UNLOAD), and the latency of the receipt that brings them back
+
+Policies: lazy (workers load on the first receipt, the old behaviour), warm
+(OCR_WARMUP), preload (OCR_PRELOAD: the model is loaded once and the
+workers are forked with it), and warm + idle unload.
+
+By default the model is simulated: loading takes --load-seconds and fills
+--weights-mb of memory, so the benchmark runs without EasyOCR. --ocr loads
+OCRProcessor (OCR_BACKEND) and reads synthetic receipts instead.
+
+Usage:
+    python -m benchmarks.ocr_lifecycle_bench
+    python -m benchmarks.ocr_lifecycle_bench --workers 4 --weights-mb 800
+    python -m benchmarks.ocr_lifecycle_bench --ocr --workers 2
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from modules.ocr_pool import OCRPool, process_memory
+
+POLICIES = {
+    "lazy": {},
+    "warm": {"warm": True},
+    "preload": {"warm": True, "preload": True},
+    "warm+idle": {"warm": True, "idle_unload": 1.0},
+}
+
+
+class SimulatedModel:
+    """Stands in for OCRProcessor: loading takes `load_seconds` and fills `weights_mb` of memory."""
+
+    def __init__(self, weights_mb=300, load_seconds=2.0):
+        self.weights_mb = weights_mb
+        self.load_seconds = load_seconds
+        self.weights = None
+
+    @property
+    def reader(self):
+        if self.weights is None:
+            time.sleep(self.load_seconds)
+            self.weights = np.ones(self.weights_mb * 2**20 // 8)
+        return self.weights
+
+    def process_receipt(self, image, **options):
+        # Inference only reads the weights, so pages shared with the parent stay shared
+        checksum = float(self.reader[::4096].sum())
+        return {"amount": 25000.0, "merchant": "Indomaret", "date": None, "timings": {"ocr": checksum * 0}}
+
+
+def _memory(pool):
+    """Summed RSS and PSS (MB) of the workers, plus this process when it holds a preloaded model."""
+    model = pool.metrics()["model"]
+    parts = list(model["workers"].values()) + ([model["parent"]] if pool.preload else [])
+    return sum(p.get("rss_mb", 0) for p in parts), sum(p.get("pss_mb", 0) for p in parts)
+
+
+async def run_policy(factory, image, workers, warm=False, preload=False, idle_unload=0.0):
+    pool = OCRPool(factory, workers=workers, job_timeout=3600, idle_unload=idle_unload, preload=preload)
+    result = {"ready_s": None, "idle_mb": None, "reload_ms": None}
+    if warm:
+        start = time.perf_counter()
+        await pool.warm_up()
+        result["ready_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.process(image) for _ in range(workers)))
+    result["first_ms"] = (time.perf_counter() - start) * 1000
+    while len(pool.metrics()["model"]["workers"]) < workers:
+        await asyncio.sleep(0.1)
+    result["rss_mb"], result["pss_mb"] = _memory(pool)
+
+    if idle_unload:
+        pids = list(pool.worker_loads)
+        await asyncio.sleep(idle_unload * 1.5)
+        # Workers that exited have no memory left to report
+        result["idle_mb"] = sum(process_memory(pid).get("pss_mb", 0) for pid in pids)
+        start = time.perf_counter()
+        await pool.process(image)
+        result["reload_ms"] = (time.perf_counter() - start) * 1000
+    await pool.shutdown()
+    pool.unload()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--weights-mb", type=int, default=300, help="Simulated model size")
+    parser.add_argument("--load-seconds", type=float, default=2.0, help="Simulated model load time")
+    parser.add_argument("--ocr", action="store_true", help="Load OCRProcessor and read a synthetic receipt")
+    parser.add_argument("--policies", default=",".join(POLICIES), help="Comma-separated, any of " + ", ".join(POLICIES))
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.ocr:
+        from benchmarks.make_receipts import generate
+        from modules.ocr import OCRProcessor
+        factory, image = OCRProcessor, generate(1)[0][0]
+        model = "OCRProcessor"
+    else:
+        factory = functools.partial(SimulatedModel, args.weights_mb, args.load_seconds)
+        image = b"simulated"
+        model = f"simulated model, {args.weights_mb}MB, {args.load_seconds:.1f}s load"
+
+    print(f"{args.workers} worker(s), {model}\n")
+    print(f"{'policy':>10s} {'ready s':>8s} {'first ms':>9s} {'RSS MB':>8s} {'PSS MB':>8s} {'idle MB':>8s} {'reload ms':>10s}")
+    fmt = lambda value, spec: format(value, spec) if value is not None else f"{'-':>{spec.split('.')[0]}s}"
+    for name in (n.strip() for n in args.policies.split(",") if n.strip()):
+        r = asyncio.run(run_policy(factory, image, args.workers, **POLICIES[name]))
+        print(f"{name:>10s} {fmt(r['ready_s'], '8.1f')} {r['first_ms']:>9.0f} {r['rss_mb']:>8.0f} {r['pss_mb']:>8.0f} "
+              f"{fmt(r['idle_mb'], '8.0f')} {fmt(r['reload_ms'], '10.0f')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Receipt throughput and chat latency under concurrent photo uploads.
+
+Uploads --photos receipts (arrivals spread over --arrival-s) while chat
+messages keep arriving at --chat-rps, and compares reading the receipts
+inline in the event loop (the old handle_photo) with OCRPool at several
+worker counts. Reports receipts/minute, receipt latency, rejected uploads
+and the latency of the chat messages handled meanwhile.
+
+Without --images the OCR work is simulated by a CPU-bound loop of
+--ocr-seconds per receipt, so the benchmark runs without EasyOCR.
+
+Usage:
+    python -m benchmarks.ocr_pool_bench
+    python -m benchmarks.ocr_pool_bench --workers 1 2 4 --photos 40 --ocr-seconds 1.5
+    python -m benchmarks.ocr_pool_bench --images 'receipts/*.jpg'
+"""
+import argparse
+import asyncio
+import functools
+import glob
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from benchmarks.nlp_bench import load_corpus
+from modules.nlp import NLPProcessor
+from modules.ocr_pool import OCRPool, OCRQueueFull
+
+
+class SimulatedOCR:
+    """Stands in for OCRProcessor: burns `seconds` of CPU time (not wall time) per receipt."""
+
+    def __init__(self, seconds=1.0):
+        self.seconds = seconds
+
+    def process_receipt(self, image):
+        end = time.process_time() + self.seconds
+        n = 0
+        while time.process_time() < end:
+            n += 1
+        return {"amount": 25000.0, "merchant": "Indomaret", "date": None}
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    p50, p95 = np.percentile(values, [50, 95]) * 1000
+    return {"p50": p50, "p95": p95, "max": max(values) * 1000}
+
+
+async def run_once(factory, images, workers, photos, arrival_s, chat_rps, max_queue, seed=7):
+    """workers=0 reads receipts inline, blocking the event loop like the old handler."""
+    nlp = NLPProcessor()
+    nlp.groq_enabled = False
+    texts = [r["text"] for r in load_corpus(limit=200)]
+    rng = random.Random(seed)
+    pool = OCRPool(factory, workers=workers, max_queue=max_queue, job_timeout=3600) if workers else None
+    inline = factory() if not workers else None
+    if pool is not None:
+        # Warm the workers up front, as the bot does at startup
+        pool.start()
+        await asyncio.gather(*(pool.process(images[0]) for _ in range(workers)))
+
+    receipt_latencies, chat_latencies = [], []
+    rejected = 0
+    done = asyncio.Event()
+
+    async def upload(i):
+        nonlocal rejected
+        await asyncio.sleep(rng.uniform(0, arrival_s))
+        start = time.perf_counter()
+        image = images[i % len(images)]
+        if pool is None:
+            inline.process_receipt(image)
+        else:
+            try:
+                await pool.process(image)
+            except OCRQueueFull:
+                rejected += 1
+                return
+        receipt_latencies.append(time.perf_counter() - start)
+
+    async def chat():
+        loop = asyncio.get_running_loop()
+        n = 0
+        while not done.is_set():
+            scheduled = loop.time()
+            await asyncio.sleep(0)
+            nlp.process_text(texts[n % len(texts)])
+            chat_latencies.append(loop.time() - scheduled)
+            n += 1
+            await asyncio.sleep(max(0.0, scheduled + 1 / chat_rps - loop.time()))
+
+    chatter = asyncio.create_task(chat())
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(i) for i in range(photos)))
+    wall = time.perf_counter() - start
+    done.set()
+    await chatter
+    if pool is not None:
+        await pool.shutdown()
+
+    return {
+        "mode": f"pool x{workers}" if workers else "inline",
+        "receipts_per_min": len(receipt_latencies) / wall * 60,
+        "rejected": rejected,
+        "receipt_ms": _percentiles(receipt_latencies),
+        "chat_ms": _percentiles(chat_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--photos", type=int, default=20)
+    parser.add_argument("--arrival-s", type=float, default=5.0, help="Uploads arrive uniformly over this many seconds")
+    parser.add_argument("--chat-rps", type=float, default=20.0)
+    parser.add_argument("--max-queue", type=int, default=100)
+    parser.add_argument("--ocr-seconds", type=float, default=1.0, help="Simulated CPU time per receipt")
+    parser.add_argument("--images", help="Glob of receipt images to read with EasyOCR instead of simulating")
+    parser.add_argument("--skip-inline", action="store_true")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    if args.images:
+        from modules.ocr import OCRProcessor
+        paths = sorted(glob.glob(args.images))
+        if not paths:
+            parser.error(f"No images match {args.images!r}")
+        # Encoded bytes, as the bot hands downloaded photos to the pool
+        factory, images = OCRProcessor, [open(path, "rb").read() for path in paths]
+    else:
+        factory, images = functools.partial(SimulatedOCR, args.ocr_seconds), [b"simulated"]
+
+    modes = ([] if args.skip_inline else [0]) + args.workers
+    print(f"{args.photos} receipts over {args.arrival_s:.0f}s, chat at {args.chat_rps:.0f} msg/s, {os.cpu_count()} CPUs\n")
+    print(f"{'mode':>9s} {'rcpt/min':>9s} {'rejected':>9s} {'rcpt p50':>9s} {'rcpt p95':>9s} "
+          f"{'chat p50':>9s} {'chat p95':>9s} {'chat max':>9s}   (ms)")
+    for workers in modes:
+        r = asyncio.run(run_once(factory, images, workers, args.photos, args.arrival_s, args.chat_rps, args.max_queue))
+        fmt = lambda v: f"{v:>9.0f}" if v is not None else f"{'-':>9s}"
+        print(f"{r['mode']:>9s} {r['receipts_per_min']:>9.1f} {r['rejected']:>9d} {fmt(r['receipt_ms']['p50'])} "
+              f"{fmt(r['receipt_ms']['p95'])} {fmt(r['chat_ms']['p50'])} {fmt(r['chat_ms']['p95'])} "
+              f"{fmt(r['chat_ms']['max'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Receipt preprocessing: latency and amount accuracy per step.
+
+Reads a synthetic receipt set (benchmarks/make_receipts.py) with the
+preprocessing steps switched on one at a time, in pipeline order, then with
+each step left out of the full pipeline. For every configuration it reports
+the mean ms of each step, of the OCR itself and in total, the pixels handed
+to the reader, and how many receipts' totals OCRProcessor got right.
+
+--staged reads receipts in two stages, as the bot does (OCR_TWO_STAGE):
+detection, then recognition of the bottom of the receipt only while the
+total is found there.
+
+Without an EasyOCR model (pip install easyocr; models in ~/.EasyOCR) only
+the preprocessing side is measured: step timings and pixel counts.
+
+Usage:
+    python -m benchmarks.ocr_preprocess_bench
+    python -m benchmarks.ocr_preprocess_bench --count 50 --target-text-height 24
+    python -m benchmarks.ocr_preprocess_bench --staged
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from benchmarks.make_receipts import generate
+from modules.ocr import OCRProcessor
+from modules.ocr_preprocess import STEPS, ReceiptPreprocessor
+
+# Parts of a staged read, already included in its "ocr" time
+OCR_STAGES = ("detect", "recognize", "recognize_rest")
+
+
+def configurations():
+    """(label, steps): the raw photo, steps added one at a time, then the full pipeline minus each step."""
+    configs = [("none", ())]
+    configs += [("+" + step, STEPS[:i + 1]) for i, step in enumerate(STEPS)]
+    configs += [("-" + step, tuple(s for s in STEPS if s != step)) for step in STEPS]
+    return configs
+
+
+class _RecordingReader:
+    """Passes calls through to the real reader, noting the pixels of each image read."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.pixels = []
+
+    def readtext(self, image):
+        self.pixels.append(image.shape[0] * image.shape[1])
+        return self.reader.readtext(image)
+
+    def detect(self, image):
+        self.pixels.append(image.shape[0] * image.shape[1])
+        return self.reader.detect(image)
+
+    def recognize(self, image, **boxes):
+        return self.reader.recognize(image, **boxes)
+
+
+def run_config(receipts, steps, target_text_height, reader=None, staged=False):
+    """Mean ms per step ("ocr" and "total" included), mean megapixels, and correct totals (None without a reader)."""
+    preprocessor = ReceiptPreprocessor(steps=steps, target_text_height=target_text_height)
+    ocr = OCRProcessor(preprocessor=preprocessor)
+    recorder = ocr._reader = _RecordingReader(reader) if reader is not None else None
+    timings, pixels, correct = [], [], 0
+    for data, truth in receipts:
+        if recorder is not None:
+            result = ocr.process_receipt(data, staged=staged)
+            correct += result["amount"] == truth["amount"]
+            timings.append(result["timings"])
+        else:
+            image, step_ms = preprocessor.run(data)
+            pixels.append(image.shape[0] * image.shape[1])
+            timings.append(step_ms)
+    if recorder is not None:
+        pixels = recorder.pixels
+    names = {name for t in timings for name in t}
+    mean_ms = {name: float(np.mean([t.get(name, 0.0) for t in timings])) for name in names}
+    mean_ms["total"] = float(np.mean([sum(ms for name, ms in t.items() if name not in OCR_STAGES) for t in timings]))
+    return {"ms": mean_ms, "megapixels": float(np.mean(pixels)) / 1e6, "correct": correct if reader is not None else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--target-text-height", type=int, default=20)
+    parser.add_argument("--staged", action="store_true", help="Two-stage reads: stop once the total is found")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    receipts = generate(args.count, args.seed)
+    reader = OCRProcessor(preprocessor=ReceiptPreprocessor(steps=())).reader
+    if reader is None:
+        print("EasyOCR model not available: measuring preprocessing only\n")
+
+    ocr_columns = (OCR_STAGES if args.staged else ()) + ("ocr",)
+    columns = ("decode",) + STEPS + (ocr_columns if reader is not None else ()) + ("total",)
+    print(f"{args.count} receipts, target text height {args.target_text_height}px (mean ms per receipt)\n")
+    print(f"{'config':>11s} " + " ".join(f"{c:>9s}" for c in columns) + f" {'Mpx':>6s} {'amount ok':>10s}")
+    for label, steps in configurations():
+        r = run_config(receipts, steps, args.target_text_height, reader, args.staged)
+        cells = " ".join(f"{r['ms'][c]:>9.1f}" if c in r["ms"] else f"{'-':>9s}" for c in columns)
+        accuracy = f"{r['correct']}/{args.count}" if r["correct"] is not None else "-"
+        print(f"{label:>11s} {cells} {r['megapixels']:>6.2f} {accuracy:>10s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Microbenchmark for parse_amount against the per-handler parsing it replaced
+and the free-text path (_extract_amount).
+
+Usage:
+    python -m benchmarks.parse_amount_bench
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.nlp import NLPProcessor, parse_amount
+
+INPUTS = ["50000", "1500000", "50rb", "25k", "1,5jt", "2jt", "Rp 1.250.000", "100.000"]
+
+
+def legacy_parse(text):
+    # Copy of the parsing formerly duplicated in set_gaji/set_budget/set_target/add_savings
+    amount_str = text.lower().replace('.', '').replace(',', '')
+    if 'rb' in amount_str:
+        return float(amount_str.replace('rb', '')) * 1000
+    elif 'jt' in amount_str:
+        return float(amount_str.replace('jt', '')) * 1000000
+    return float(amount_str)
+
+
+def _safe(func):
+    def call(text):
+        try:
+            return func(text)
+        except ValueError:
+            return None
+    return call
+
+
+def main(number=20000):
+    nlp = NLPProcessor()
+    candidates = [
+        ("parse_amount", parse_amount),
+        ("legacy handler parse", _safe(legacy_parse)),
+        ("_extract_amount", nlp._extract_amount),
+    ]
+    print(f"{'input':14s}" + "".join(f"{name:>24s}" for name, _ in candidates))
+    for text in INPUTS:
+        row = f"{text:14s}"
+        for _, func in candidates:
+            ns = min(timeit.repeat(lambda: func(text), number=number, repeat=3)) / number * 1e9
+            row += f"{ns:>18.0f} ns/op"
+        print(row)
+
+    print("\nResults:")
+    for text in INPUTS:
+        print(f"  {text:14s} " + "  ".join(f"{name}={func(text)}" for name, func in candidates))
+
+
+if __name__ == "__main__":
+    main()
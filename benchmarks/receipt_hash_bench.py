@@ -0,0 +1,89 @@
+"""
+Receipt photo hash: cost per photo and how well it separates receipts.
+
+Hashes synthetic receipts (benchmarks/make_receipts.py) resized to the
+sizes Telegram sends (1280px, 2560px) and to a full-resolution camera photo,
+and reports ms p50/p95 per size. Then compares each receipt with copies of
+itself as a resend would deliver them (recompressed, downscaled, slightly
+brighter) and with every other receipt: the bit distances of both, and how
+many copies or different receipts fall within OCR_HASH_MAX_DISTANCE. A
+match only raises a duplicate warning, and only when the amounts agree too;
+OCR results are reused for the exact same photo (file_unique_id) alone.
+
+Usage:
+    python -m benchmarks.receipt_hash_bench
+    python -m benchmarks.receipt_hash_bench --count 100 --max-distance 6
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from benchmarks.make_receipts import generate
+from config import OCR_HASH_MAX_DISTANCE
+from modules.receipt_cache import hash_distance, receipt_hash
+
+
+def _jpeg(image, quality=87):
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def copies(data):
+    """A receipt photo as it may come back: recompressed, downscaled, brighter."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return {
+        "jpeg q60": _jpeg(image, 60),
+        "0.5x": _jpeg(cv2.resize(image, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)),
+        "brighter": _jpeg(cv2.convertScaleAbs(image, alpha=1.1, beta=10)),
+    }
+
+
+def hash_times(receipts, long_side, repeat=5):
+    """ms per receipt_hash of the receipts resized to long_side px."""
+    times = []
+    for data, _ in receipts:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        scale = long_side / max(image.shape[:2])
+        photo = _jpeg(cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR))
+        for _ in range(repeat):
+            start = time.perf_counter()
+            receipt_hash(photo)
+            times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=2026)
+    parser.add_argument("--max-distance", type=int, default=OCR_HASH_MAX_DISTANCE)
+    args = parser.parse_args()
+
+    receipts = generate(args.count, args.seed)
+    print(f"{args.count} receipts\n")
+    print(f"{'photo':>8s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    for long_side in (1280, 2560, 4000):
+        p50, p95 = np.percentile(hash_times(receipts, long_side), [50, 95])
+        print(f"{str(long_side) + 'px':>8s} {p50:>8.2f} {p95:>8.2f}")
+
+    hashes = [receipt_hash(data) for data, _ in receipts]
+    print(f"\nbit distance (of 64), matched within {args.max_distance}")
+    print(f"{'pair':>10s} {'min':>5s} {'p50':>5s} {'max':>5s} {'matched':>9s}")
+    same = {}
+    for (data, _), value in zip(receipts, hashes):
+        for name, copy in copies(data).items():
+            same.setdefault(name, []).append(hash_distance(value, receipt_hash(copy)))
+    rows = list(same.items()) + [("different", [hash_distance(a, b) for a, b in itertools.combinations(hashes, 2)])]
+    for name, distances in rows:
+        matched = sum(d <= args.max_distance for d in distances)
+        print(f"{name:>10s} {min(distances):>5d} {int(np.median(distances)):>5d} {max(distances):>5d} "
+              f"{matched:>4d}/{len(distances):<4d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,15 @@ import logging
 import os
 import threading
 import sys
+import json
+from urllib.parse import urlparse
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes, TypeHandler
 from datetime import time, datetime
 import pytz
 
-from config import TELEGRAM_BOT_TOKEN
-from core import init_components, db, ocr, nlp, ai, budget_mgr, analyzer, rules, visual_reporter
+from config import TELEGRAM_BOT_TOKEN, OCR_WARMUP
+from core import init_components, db, ocr, nlp, ai, budget_mgr, analyzer, rules, visual_reporter, llm_breaker, llm_cache, llm_metrics, llm_admission, ocr_pool, receipt_cache
 from handlers.commands import start, help_command
 from handlers.finance import set_gaji, set_budget, get_ai_insight
 from handlers.transactions import undo, hapus_transaksi, history, export_data
@@ -27,6 +29,23 @@ logging.basicConfig(
 
 class HealthCheckHandler(BaseHTTPRequestHandler):
     def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            # Aggregates only: this port is public, so nothing per user is served here
+            body = json.dumps({
+                "llm_circuit": llm_breaker.metrics(),
+                "llm_cache": llm_cache.stats(),
+                "intent_race": nlp.race_stats.metrics(),
+                "llm_usage": llm_metrics.metrics(),
+                "llm_admission": llm_admission.metrics(),
+                "ocr_pool": ocr_pool.metrics(),
+                "receipt_cache": receipt_cache.metrics(),
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+            return
         self.send_response(200)
         self.send_header('Content-type', 'text/plain')
         self.end_headers()
@@ -72,6 +91,9 @@ async def post_init(application):
         BotCommand("insight", "Analisis cerdas pola pengeluaran"),
     ]
     await application.bot.set_my_commands(commands)
+    if OCR_WARMUP and ocr.enabled:
+        # Load the OCR models in the background: the bot answers right away, the first receipt does not wait
+        application.create_task(ocr_pool.warm_up())
 
 if __name__ == '__main__':
     health_thread = threading.Thread(target=run_health_check_server, daemon=True)
@@ -83,7 +105,8 @@ if __name__ == '__main__':
         logging.error("Error: TELEGRAM_BOT_TOKEN tidak ditemukan di .env")
         exit(1)
         
-    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    # Concurrent updates: a slow LLM/OCR call for one user must not hold up everyone else
+    application = ApplicationBuilder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).concurrent_updates(True).build()
     
     application.add_error_handler(error_handler)
     
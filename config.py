@@ -5,12 +5,78 @@ load_dotenv()
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Optional override of the Groq endpoint (e.g. a local OpenAI-compatible server)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+# Offline mode: every Groq client talks to the local stand-in (python -m benchmarks.fake_llm_server)
+LLM_OFFLINE = os.getenv("LLM_OFFLINE", "0").lower() in ("1", "true", "yes")
+if LLM_OFFLINE:
+    GROQ_BASE_URL = GROQ_BASE_URL or "http://127.0.0.1:8088"
+    GROQ_API_KEY = GROQ_API_KEY or "offline"
+# Total seconds an async LLM call may take, retries included
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "15"))
+# Seconds a single LLM request may take before it counts as a failure for the circuit breaker
+LLM_LATENCY_BUDGET = float(os.getenv("LLM_LATENCY_BUDGET", "8"))
+# classify_intent_async: rule results at or above this confidence are
+# answered locally, without an LLM request
+INTENT_RACE_CONFIDENCE = float(os.getenv("INTENT_RACE_CONFIDENCE", "0.9"))
+# Opt-in: share of local answers also sent to the LLM in the background, only to measure agreement
+INTENT_RACE_SHADOW_RATE = float(os.getenv("INTENT_RACE_SHADOW_RATE", "0"))
+# Per-user LLM quota: a bucket of LLM_USER_BURST calls refilled at LLM_USER_RATE calls per minute
+LLM_USER_RATE = float(os.getenv("LLM_USER_RATE", "10"))
+LLM_USER_BURST = int(os.getenv("LLM_USER_BURST", "20"))
+# LLM calls in flight bot-wide; others wait up to LLM_QUEUE_TIMEOUT seconds, highest priority first
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+# Messages the local rules cannot read go to the LLM (batched, one LLM call's cost and quota each); what
+# it reads is shown for ✓/✎/✕ confirmation before anything is saved. 0 = reply "not understood" instead
+LLM_PARSE_FALLBACK = os.getenv("LLM_PARSE_FALLBACK", "1").lower() in ("1", "true", "yes")
+# Minimum seconds between progressive edits of a streamed reply (Telegram rate-limits edits per chat)
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+# Prompt tokens the structured spending summary (legend included) may use in the AI insight prompt
+INSIGHT_TOKEN_BUDGET = int(os.getenv("INSIGHT_TOKEN_BUDGET", "80"))
+# SQLite file for the persistent LLM response cache (unset = in-memory only)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+# SQLite file for per-day LLM usage totals (unset = in-memory metrics only)
+LLM_METRICS_PATH = os.getenv("LLM_METRICS_PATH")
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database/finbot.db")
 
 # Fix for Heroku/Railway PostgreSQL URL (replace postgres:// with postgresql://)
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+# Receipt OCR runs in worker processes (one EasyOCR model each) behind a bounded queue
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", "10"))
+# Seconds a receipt may take from upload to result, queueing included
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "60"))
+# "spawn" keeps the workers free of the bot's threads and sockets
+OCR_START_METHOD = os.getenv("OCR_START_METHOD", "spawn")
+# Start the OCR workers and load their models when the bot starts, not on the first receipt
+OCR_WARMUP = os.getenv("OCR_WARMUP", "1").lower() in ("1", "true", "yes")
+# Seconds without receipts after which the OCR workers exit to free their memory (0 = keep them loaded)
+OCR_IDLE_UNLOAD = float(os.getenv("OCR_IDLE_UNLOAD", "0"))
+# Load the OCR model once in the bot process and fork the workers from it, sharing its weights copy-on-write
+OCR_PRELOAD = os.getenv("OCR_PRELOAD", "0").lower() in ("1", "true", "yes")
+# Receipt preprocessing steps before OCR, comma-separated (any of exif,grayscale,crop,deskew,downscale; empty = none)
+OCR_PREPROCESS = tuple(s.strip() for s in os.getenv("OCR_PREPROCESS", "exif,grayscale,crop,deskew,downscale").split(",") if s.strip())
+# Text line height in px the downscale step shrinks receipt photos to
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "20"))
+# Read receipt photos in two stages: the total first, merchant and date only when the user edits them
+OCR_TWO_STAGE = os.getenv("OCR_TWO_STAGE", "1").lower() in ("1", "true", "yes")
+# Lower share of a receipt's text searched for the total in the first stage
+OCR_TOTAL_REGION = float(os.getenv("OCR_TOTAL_REGION", "0.5"))
+# Receipt OCR results cached by Telegram file_unique_id, so the same photo resent or forwarded skips OCR
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "1024"))
+# Saved receipts remembered per user for duplicate warnings
+OCR_CACHE_USER_SIZE = int(os.getenv("OCR_CACHE_USER_SIZE", "50"))
+# Bits (of 64) two receipt photo hashes may differ by and still warn of a duplicate (with the same amount)
+OCR_HASH_MAX_DISTANCE = int(os.getenv("OCR_HASH_MAX_DISTANCE", "4"))
+# Receipt OCR engine: easyocr, tesseract, or cascade (Tesseract first, EasyOCR when it is unsure)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "easyocr").lower()
+# Mean Tesseract confidence (0-1) below which the cascade reads the receipt again with EasyOCR
+OCR_CASCADE_MIN_CONFIDENCE = float(os.getenv("OCR_CASCADE_MIN_CONFIDENCE", "0.75"))
+# Tesseract binary (falls back to `tesseract` on PATH) and its languages
 TESSERACT_PATH = os.getenv("TESSERACT_PATH", r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "ind+eng")
 
 # Categories for classification
 CATEGORIES = ["Makanan", "Transportasi", "Belanja", "Tagihan", "Investasi", "Gaji", "Lain-lain"]
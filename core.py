@@ -1,23 +1,45 @@
 import logging
 from database.db_handler import DBHandler
 from modules.ocr import OCRProcessor
+from modules.ocr_pool import OCRPool
+from modules.receipt_cache import ReceiptCache
 from modules.nlp import NLPProcessor
 from modules.budget import BudgetManager
 from modules.analysis import ExpenseAnalyzer
 from modules.rules import RuleEngine
 from modules.ai_engine import AIEngine
+from modules.llm_cache import LLMCache
+from modules.llm_metrics import LLMMetrics
+from modules.llm_admission import AdmissionController
+from modules.llm_batch import ParseBatcher
+from modules.llm import create_breaker
 from utils.visuals import VisualReporter
 
 # Shared instances
 db = DBHandler()
 ocr = OCRProcessor()
-nlp = NLPProcessor()
-ai = AIEngine()
+# Receipts are read in worker processes so OCR never blocks the event loop
+ocr_pool = OCRPool()
+# Resent and forwarded receipt photos reuse an earlier read, and repeat saves get a duplicate warning
+receipt_cache = ReceiptCache()
+llm_cache = LLMCache()
+# One breaker for the Groq provider: when it trips, every LLM path falls back at once
+llm_breaker = create_breaker()
+# Usage of every LLM call by feature, served on /metrics
+llm_metrics = LLMMetrics()
+# Per-user LLM quotas and the bot-wide limit on calls in flight, shared by every LLM path
+llm_admission = AdmissionController()
+nlp = NLPProcessor(cache=llm_cache, breaker=llm_breaker, metrics=llm_metrics, admission=llm_admission)
+ai = AIEngine(cache=llm_cache, breaker=llm_breaker, nlp=nlp, metrics=llm_metrics, admission=llm_admission)
+parse_batcher = ParseBatcher(ai)
 budget_mgr = BudgetManager(db)
 analyzer = ExpenseAnalyzer(db)
 rules = RuleEngine()
 visual_reporter = VisualReporter()
 
+# Cached insights go stale as soon as the user's transactions change
+db.transaction_listeners.append(llm_cache.invalidate_user)
+
 def init_components():
     # This is now handled by module-level instantiation
     # but kept for backward compatibility if needed
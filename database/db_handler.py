@@ -1,6 +1,6 @@
 from .models import get_session, User, Transaction, Budget, MonthlyIncome, SavingGoal, init_db
 from datetime import datetime, timedelta
-from sqlalchemy import extract, and_
+from sqlalchemy import extract, and_, func
 
 class DBHandler:
     def __init__(self, session=None):
@@ -15,6 +15,16 @@ class DBHandler:
             self._migrate_db()
         # Principle 3.1: User-defined day cutoff (Default 04:00 AM)
         self.cutoff_hour = 4
+        # Callbacks run with user_id after that user's transactions change
+        self.transaction_listeners = []
+
+    def _notify_transactions_changed(self, user_id):
+        for listener in self.transaction_listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                import logging
+                logging.error(f"Transaction listener failed: {e}")
 
     def _migrate_db(self):
         """
@@ -142,8 +152,53 @@ class DBHandler:
             self.update_budget_usage(user_id, category, amount)
             
         self.session.commit()
+        self._notify_transactions_changed(user_id)
         return transaction
 
+    def add_transactions(self, user_id, items, trans_date=None):
+        """
+        Bulk version of add_transaction for multi-item messages and receipt albums.
+        items: list of dicts with amount, category, description and type, and
+        optionally their own date (else trans_date).
+        All rows go in with one commit and each budget is touched once per category and month.
+        """
+        if trans_date is None:
+            trans_date = datetime.now()
+
+        dated = [(item, item.get('date') or trans_date) for item in items]
+        transactions = [
+            Transaction(
+                user_id=user_id,
+                amount=item['amount'],
+                category=item['category'],
+                description=item.get('description'),
+                type=item.get('type', 'expense'),
+                date=date
+            )
+            for item, date in dated
+        ]
+        self.session.add_all(transactions)
+
+        usage = {}
+        for item, date in dated:
+            if item.get('type', 'expense') == 'expense':
+                key = (item['category'], date.month, date.year)
+                usage[key] = usage.get(key, 0) + item['amount']
+
+        if usage:
+            budgets = self.session.query(Budget).filter(
+                Budget.user_id == user_id,
+                Budget.month.in_({month for _, month, _ in usage}),
+                Budget.year.in_({year for _, _, year in usage}),
+                Budget.category.in_({category for category, _, _ in usage})
+            ).all()
+            for budget in budgets:
+                budget.current_usage += usage.get((budget.category, budget.month, budget.year), 0)
+
+        self.session.commit()
+        self._notify_transactions_changed(user_id)
+        return transactions
+
     def get_sliding_window_transactions(self, user_id, days=7):
         """
         Principle 3.2: Sliding window summary (Last N days)
@@ -232,6 +287,7 @@ class DBHandler:
             
             self.session.delete(tx)
             self.session.commit()
+            self._notify_transactions_changed(user_id)
             return True
         return False
 
@@ -264,6 +320,41 @@ class DBHandler:
             Transaction.date >= datetime(year, month, 1)
         ).all()
 
+    def _expense_query(self, user_id, start_date, end_date=None, *columns):
+        query = self.session.query(*columns).filter(
+            Transaction.user_id == user_id,
+            Transaction.type == 'expense',
+            Transaction.date >= start_date
+        )
+        if end_date:
+            query = query.filter(Transaction.date < end_date)
+        return query
+
+    def get_category_totals(self, user_id, start_date, end_date=None):
+        """
+        Expense totals per category in [start_date, end_date), summed in SQL.
+        Returns {category: (total, count)}.
+        """
+        rows = self._expense_query(
+            user_id, start_date, end_date,
+            Transaction.category, func.sum(Transaction.amount), func.count(Transaction.id)
+        ).group_by(Transaction.category).all()
+        return {category: (total or 0.0, count) for category, total, count in rows}
+
+    def get_hourly_totals(self, user_id, start_date, end_date=None):
+        """Expense totals per hour of day (0-23) in [start_date, end_date)."""
+        hour = extract('hour', Transaction.date)
+        rows = self._expense_query(
+            user_id, start_date, end_date, hour, func.sum(Transaction.amount)
+        ).group_by(hour).all()
+        return {int(h): total or 0.0 for h, total in rows}
+
+    def get_top_expenses(self, user_id, start_date, limit=3):
+        """The largest expenses since start_date, biggest first."""
+        return self._expense_query(user_id, start_date, None, Transaction).order_by(
+            Transaction.amount.desc()
+        ).limit(limit).all()
+
     # --- SAVING GOALS ---
     def add_saving_goal(self, user_id, name, target_amount, target_date=None):
         goal = SavingGoal(
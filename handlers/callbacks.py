@@ -1,6 +1,6 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
-from core import db, budget_mgr, rules, visual_reporter
+from core import db, budget_mgr, rules, visual_reporter, nlp, ocr_pool, receipt_cache
 from utils.dashboard import update_pinned_dashboard
 from utils.executor import execute_code
 from config import CATEGORIES
@@ -14,6 +14,30 @@ def get_main_menu_keyboard():
         [KeyboardButton("💡 Tips Hemat"), KeyboardButton("🚀 Menu Utama")]
     ], resize_keyboard=True)
 
+def _receipt_date(date_str):
+    """The datetime of a receipt's dd/mm/yyyy or yyyy-mm-dd date; now when it is missing or unreadable."""
+    if date_str:
+        try:
+            date_clean = date_str.replace('/', '-')
+            if len(date_clean.split('-')[0]) == 4:
+                return datetime.strptime(date_clean, "%Y-%m-%d")
+            return datetime.strptime(date_clean, "%d-%m-%Y")
+        except (AttributeError, ValueError):
+            pass
+    return datetime.now()
+
+def _tagged_description(tx, tx_date):
+    """The receipt's merchant, with the tags the user's rules give it: "Indomaret (boros)"."""
+    tags = rules.evaluate({
+        "amount": tx['amount'],
+        "category": tx['category'],
+        "hour": tx_date.hour
+    })
+    description = tx.get('merchant', 'Transaksi')
+    if tags:
+        description += f" ({', '.join(tags)})"
+    return description
+
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = update.effective_user.id
@@ -92,37 +116,31 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     os.remove(photo_path)
         return
 
+    if action == "album_confirm":
+        await confirm_album(update, context, user_db)
+        return
+
+    if action == "album_ignore":
+        user_data.pop('pending_album', None)
+        await query.edit_message_text("Struk-struk ini diabaikan. Ada lagi yang mau dicatat?")
+        return
+
     if action == "tx_confirm" and pending:
-        tx_date = datetime.now()
-        if pending.get('date'):
-            try:
-                date_clean = pending['date'].replace('/', '-')
-                if len(date_clean.split('-')[0]) == 4:
-                    tx_date = datetime.strptime(date_clean, "%Y-%m-%d")
-                else:
-                    tx_date = datetime.strptime(date_clean, "%d-%m-%Y")
-            except:
-                tx_date = datetime.now()
-
-        tags = rules.evaluate({
-            "amount": pending['amount'],
-            "category": pending['category'],
-            "hour": tx_date.hour
-        })
-        
-        description = pending.get('merchant', 'Transaksi')
-        if tags:
-            description += f" ({', '.join(tags)})"
+        tx_date = _receipt_date(pending.get('date'))
+        description = _tagged_description(pending, tx_date)
 
         db.add_transaction(
             user_id=user_db.id,
             amount=pending['amount'],
             category=pending['category'],
-            trans_type='expense',
+            trans_type=pending.get('type', 'expense'),
             description=description,
             trans_date=tx_date
         )
         
+        # Sending this receipt again will warn about a duplicate
+        receipt_cache.mark_saved(user_id, pending.get('receipt_hash'), pending['amount'])
+
         budget_msg = budget_mgr.check_budget_status(user_db.id, pending['category'])
         
         final_msg = f"✅ Tersimpan: Rp{pending['amount']:,.0f} · {pending['category']}"
@@ -144,6 +162,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text(final_msg, reply_markup=InlineKeyboardMarkup(keyboard))
         await query.message.reply_text("Ada lagi yang bisa saya bantu?", reply_markup=get_main_menu_keyboard())
         user_data.pop('pending_tx', None)
+        user_data.pop('pending_receipt', None)
         user_data.pop('state', None)
         
         await update_pinned_dashboard(context, user_id)
@@ -155,12 +174,24 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 InlineKeyboardButton("Kategori", callback_data="edit_category")
             ],
             [
-                InlineKeyboardButton("Tanggal", callback_data="edit_date"),
+                InlineKeyboardButton("Toko", callback_data="edit_merchant"),
+                InlineKeyboardButton("Tanggal", callback_data="edit_date")
+            ],
+            [
                 InlineKeyboardButton("Abaikan", callback_data="tx_ignore")
             ]
         ]
         await query.edit_message_text("Pilih bagian yang ingin diubah:", reply_markup=InlineKeyboardMarkup(keyboard))
 
+    elif action in ("edit_merchant", "edit_date") and pending:
+        await read_receipt_details(query, user_data)
+        if action == "edit_merchant":
+            user_data['state'] = 'WAITING_EDIT_MERCHANT'
+            await query.edit_message_text(f"Toko terbaca: {pending['merchant']}\nKetik nama toko yang benar:")
+        else:
+            user_data['state'] = 'WAITING_EDIT_DATE'
+            await query.edit_message_text(f"Tanggal terbaca: {pending['date']}\nKetik tanggal yang benar (contoh: 25-12-2025):")
+
     elif action == "edit_amount":
         user_data['state'] = 'WAITING_EDIT_AMOUNT'
         await query.edit_message_text("Ketik nominal baru (contoh: 50rb atau 50000):")
@@ -190,6 +221,7 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif action == "tx_ignore":
         user_data.pop('pending_tx', None)
+        user_data.pop('pending_receipt', None)
         user_data.pop('state', None)
         await query.edit_message_text("Transaksi diabaikan. Ada lagi yang mau dicatat?")
         await query.message.reply_text("Silakan pilih menu di bawah:", reply_markup=get_main_menu_keyboard())
@@ -207,6 +239,67 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         from handlers.finance import get_ai_insight
         await get_ai_insight(update, context)
 
+async def confirm_album(update: Update, context: ContextTypes.DEFAULT_TYPE, user_db):
+    """Saves every receipt of the pending album with one bulk insert and one dashboard refresh."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+    album = context.user_data.pop('pending_album', None)
+    if not album:
+        await query.edit_message_text("Struk-struk ini sudah diproses.")
+        return
+
+    items = []
+    for tx in album:
+        tx_date = _receipt_date(tx.get('date'))
+        items.append({
+            'amount': tx['amount'],
+            'category': tx['category'],
+            'description': _tagged_description(tx, tx_date),
+            'type': 'expense',
+            'date': tx_date
+        })
+    db.add_transactions(user_db.id, items)
+    for tx in album:
+        receipt_cache.mark_saved(user_id, tx.get('receipt_hash'), tx['amount'])
+
+    final_msg = f"✅ Tersimpan {len(items)} struk, total Rp{sum(item['amount'] for item in items):,.0f}"
+    categories = dict.fromkeys(item['category'] for item in items)
+    budget_msgs = [msg for msg in (budget_mgr.check_budget_status(user_db.id, cat) for cat in categories) if msg]
+    if budget_msgs:
+        final_msg += "\n\n" + "\n".join(budget_msgs)
+    await query.edit_message_text(final_msg)
+    await query.message.reply_text("Ada lagi yang bisa saya bantu?", reply_markup=get_main_menu_keyboard())
+    await update_pinned_dashboard(context, user_id)
+
+async def read_receipt_details(query, user_data):
+    """
+    Completes a receipt that was read in two stages (only the total so far):
+    reads the kept photo in full and fills the merchant and date of
+    pending_tx. On failure the defaults stay and the user types them. The
+    full read goes into the receipt cache, which keeps no partial ones.
+    """
+    receipt = user_data.pop('pending_receipt', None)
+    if receipt is None:
+        return
+    file_id, image = receipt
+    await query.edit_message_text("Membaca toko & tanggal dari struk... ⏳")
+    try:
+        result = await ocr_pool.process(image, staged=False)
+    except Exception as e:
+        # Queue full, timed out or unreadable: the user types the details instead
+        logging.warning(f"Full receipt read failed: {e!r}")
+        return
+    if isinstance(result, dict) and result.get('amount', 0) > 0:
+        receipt_cache.store(file_id, result)
+    pending = user_data['pending_tx']
+    if result and result.get('merchant'):
+        pending['merchant'] = nlp.merchants.canonicalize(result['merchant'])
+        if pending['category'] == "Belanja":
+            category = nlp._detect_category(pending['merchant'])
+            pending['category'] = category if category != "Lain-lain" else "Belanja"
+    if result and result.get('date'):
+        pending['date'] = result['date']
+
 async def send_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
         [
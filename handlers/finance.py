@@ -1,6 +1,10 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from core import db, analyzer, ai
+from modules.nlp import parse_amount
+from utils.tasks import Superseded, run_user_task
+from utils.streaming import stream_reply
+from contextlib import aclosing
 import logging
 
 async def set_gaji(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -13,13 +17,7 @@ async def set_gaji(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        amount_str = context.args[0].lower().replace('.', '').replace(',', '')
-        if 'rb' in amount_str:
-            amount = float(amount_str.replace('rb', '')) * 1000
-        elif 'jt' in amount_str:
-            amount = float(amount_str.replace('jt', '')) * 1000000
-        else:
-            amount = float(amount_str)
+        amount = parse_amount(context.args[0])
             
         db.add_monthly_income(user_db.id, amount)
         await update.message.reply_text(f"✅ Pendapatan bulanan berhasil diatur ke Rp{amount:,.0f}. Semangat mengelola uangnya! 💪", parse_mode='Markdown')
@@ -37,13 +35,7 @@ async def set_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     category = context.args[0].capitalize()
     try:
-        amount_str = context.args[1].lower().replace('.', '').replace(',', '')
-        if 'rb' in amount_str:
-            amount = float(amount_str.replace('rb', '')) * 1000
-        elif 'jt' in amount_str:
-            amount = float(amount_str.replace('jt', '')) * 1000000
-        else:
-            amount = float(amount_str)
+        amount = parse_amount(context.args[1])
             
         db.set_budget(user_db.id, category, amount)
         await update.message.reply_text(f"✅ Budget {category} berhasil diatur ke Rp {amount:,.0f} per bulan.")
@@ -54,9 +46,20 @@ async def get_ai_insight(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     user_db = db.get_user(user_id)
     if not user_db: return
-    
-    raw_insight = analyzer.analyze_patterns(user_db.id)
-    ai_insight = ai.generate_smart_insight(raw_insight)
-    
+
+    async def insight_chunks():
+        summary = analyzer.build_insight_summary(user_db.id)
+        if summary is None:
+            yield "Belum ada data pengeluaran bulan ini untuk dianalisis. Catat dulu yuk, misal 'makan 25rb'."
+            return
+        async with aclosing(ai.stream_smart_insight_async(summary, user_id=user_db.id)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    # The placeholder goes out before the analysis; the answer is then edited in as it streams
     target = update.callback_query.message if update.callback_query else update.message
-    await target.reply_text(f"🤖 **FINBOT AI ADVISOR**\n\n{ai_insight}", parse_mode='Markdown')
+    try:
+        await run_user_task(context, stream_reply(target, insight_chunks(), header="🤖 **FINBOT AI ADVISOR**\n\n"))
+    except Superseded:
+        # The user asked again; the newer request answers instead
+        return
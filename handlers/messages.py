@@ -1,11 +1,22 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import ContextTypes
-from core import db, ocr, nlp, budget_mgr
+from core import db, ocr, ocr_pool, receipt_cache, nlp, budget_mgr, parse_batcher
 from utils.dashboard import update_pinned_dashboard
+from modules.nlp import parse_amount
+from modules.ocr_pool import OCRQueueFull
+from config import CATEGORIES, LLM_PARSE_FALLBACK, OCR_TWO_STAGE
 from datetime import datetime
-import os
+import asyncio
 import logging
 
+# Seconds between refreshes of the "antrian ke-N" note while a receipt waits for a worker
+QUEUE_REFRESH_INTERVAL = 3.0
+# Seconds an album waits after its latest photo before it is read: Telegram sends one update per photo
+ALBUM_WAIT = 1.0
+
+# Albums being collected, (user_id, media_group_id) -> {"pending": downloads in flight, "photos", "last"}
+_albums = {}
+
 def get_main_menu_keyboard():
     return ReplyKeyboardMarkup([
         [KeyboardButton("📊 Cek Budget"), KeyboardButton("📈 Laporan")],
@@ -55,14 +66,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     state = context.user_data.get('state')
     if state == 'WAITING_EDIT_AMOUNT':
         try:
-            amount_str = text.lower().replace('.', '').replace(',', '')
-            if 'rb' in amount_str:
-                amount = float(amount_str.replace('rb', '')) * 1000
-            elif 'jt' in amount_str:
-                amount = float(amount_str.replace('jt', '')) * 1000000
-            else:
-                amount = float(amount_str)
-                
+            amount = parse_amount(text)
+
             pending = context.user_data.get('pending_tx')
             if pending:
                 pending['amount'] = amount
@@ -105,45 +110,137 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(f"Tanggal diubah ke: {text}")
         return
 
+    if state == 'WAITING_EDIT_MERCHANT':
+        pending = context.user_data.get('pending_tx')
+        if pending:
+            pending['merchant'] = text
+            context.user_data['pending_tx'] = pending
+            context.user_data['state'] = None
+            await update.message.reply_text(f"Toko diubah ke: {text}")
+        return
+
+    # Multi-item messages ("kopi 20rb, parkir 5rb") are recorded in one go
+    items = nlp.split_items(text)
+    if len(items) > 1:
+        await record_items(update, context, items)
+        return
+
     # Normal NLP Processing
     amount, category, trans_type = nlp.process_text(text)
-    
+
     if amount > 0:
-        user_db = db.get_or_create_user(user_id, update.effective_user.username)
-        db.add_transaction(user_db.id, amount, category, text, trans_type)
-        
-        budget_msg = budget_mgr.check_budget_status(user_db.id, category)
-        
-        reply = f"✅ Tercatat: Rp{amount:,.0f} · {category}"
-        if budget_msg:
-            reply += f"\n\n{budget_msg}"
-            
-        await update.message.reply_text(reply, reply_markup=get_main_menu_keyboard())
-        await update_pinned_dashboard(context, user_id)
+        await record_transaction(update, context, text, amount, category, trans_type)
     else:
-        # Check for other intents via NLP parse
-        parsed = nlp.parse_message(text)
-        intent = parsed.get('intent')
-        
-        if intent == 'query_budget':
+        # Other intents: rules first, racing the LLM intent classifier on ambiguous messages
+        # (see NLPProcessor.classify_intent_async), charged to this user's LLM quota
+        user_db = db.get_or_create_user(user_id, update.effective_user.username)
+        intent = (await nlp.classify_intent_async(text, user_id=user_db.id)).get('intent')
+
+        if intent == 'CHECK_BUDGET':
             await send_budget_summary(update, context)
-        elif intent == 'get_report':
+        elif intent == 'QUERY_SUMMARY':
             from handlers.callbacks import send_report
             await send_report(update, context)
-        elif intent == 'help':
+        elif intent == 'HELP':
             from handlers.commands import help_command
             await help_command(update, context)
-        elif intent == 'greeting':
+        elif intent == 'GREETING':
             await update.message.reply_text(
                 f"Halo {update.effective_user.first_name}! Ada yang bisa dibantu? 😊",
                 reply_markup=get_main_menu_keyboard()
             )
         else:
+            # Last resort: let the LLM read it ("beli cilok goceng"), batched with other users' messages
+            # and charged to this user's LLM quota (keyed by the DB id, like the insight cache)
+            parsed_llm = None
+            if LLM_PARSE_FALLBACK:
+                parsed_llm = await parse_batcher.parse(text, user_id=user_db.id)
+            if parsed_llm and parsed_llm.get('is_transaction'):
+                try:
+                    amount = float(parsed_llm.get('amount') or 0)
+                except (TypeError, ValueError):
+                    amount = 0
+                if amount > 0:
+                    category = parsed_llm.get('category') if parsed_llm.get('category') in CATEGORIES else "Lain-lain"
+                    trans_type = 'income' if parsed_llm.get('type') == 'income' else 'expense'
+                    await confirm_llm_transaction(update, context, text, amount, category, trans_type)
+                    return
+
             await update.message.reply_text(
                 "Aku nggak paham maksudnya. Coba ketik 'makan 50rb' atau cek /help. 🤔",
                 reply_markup=get_main_menu_keyboard()
             )
 
+async def record_transaction(update: Update, context: ContextTypes.DEFAULT_TYPE, text, amount, category, trans_type):
+    user_id = update.effective_user.id
+    user_db = db.get_or_create_user(user_id, update.effective_user.username)
+    db.add_transaction(user_db.id, amount, category, text, trans_type)
+    
+    budget_msg = budget_mgr.check_budget_status(user_db.id, category)
+    
+    reply = f"✅ Tercatat: Rp{amount:,.0f} · {category}"
+    if budget_msg:
+        reply += f"\n\n{budget_msg}"
+        
+    await update.message.reply_text(reply, reply_markup=get_main_menu_keyboard())
+    await update_pinned_dashboard(context, user_id)
+
+async def confirm_llm_transaction(update: Update, context: ContextTypes.DEFAULT_TYPE, text, amount, category, trans_type):
+    """
+    Shows what the LLM read from a message the rules could not, with the
+    receipt flow's ✓ Simpan / ✎ Edit / ✕ Abaikan buttons: an LLM may get
+    the amount wrong, so nothing is saved until the user confirms.
+    """
+    context.user_data['pending_tx'] = {
+        'amount': amount,
+        'category': category,
+        'merchant': text,
+        'date': datetime.now().strftime("%Y-%m-%d"),
+        'type': trans_type
+    }
+    context.user_data.pop('pending_receipt', None)
+    keyboard = [
+        [
+            InlineKeyboardButton("✓ Simpan", callback_data="tx_confirm"),
+            InlineKeyboardButton("✎ Edit", callback_data="tx_edit"),
+            InlineKeyboardButton("✕ Abaikan", callback_data="tx_ignore")
+        ]
+    ]
+    kind = "Pemasukan" if trans_type == 'income' else "Pengeluaran"
+    await update.message.reply_text(
+        f"🤔 Maksudnya ini?\n\n"
+        f"💰 {kind}: Rp{amount:,.0f}\n"
+        f"📂 Kategori: {category}\n"
+        f"📝 Catatan: {text}\n\n"
+        f"Simpan transaksi ini?",
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def record_items(update: Update, context: ContextTypes.DEFAULT_TYPE, items):
+    """
+    Saves every item of a multi-item message with one bulk insert and replies
+    with a single combined confirmation and one dashboard refresh.
+    """
+    user_id = update.effective_user.id
+    user_db = db.get_or_create_user(user_id, update.effective_user.username)
+    db.add_transactions(user_db.id, items)
+
+    reply = f"✅ Tercatat {len(items)} transaksi:\n"
+    for item in items:
+        sign = "+" if item['type'] == 'income' else ""
+        reply += f"• {sign}Rp{item['amount']:,.0f} · {item['category']} ({item['description']})\n"
+    total_expense = sum(item['amount'] for item in items if item['type'] == 'expense')
+    if total_expense:
+        reply += f"Total pengeluaran: Rp{total_expense:,.0f}"
+
+    categories = dict.fromkeys(item['category'] for item in items if item['type'] == 'expense')
+    budget_msgs = [msg for msg in (budget_mgr.check_budget_status(user_db.id, cat) for cat in categories) if msg]
+    if budget_msgs:
+        reply += "\n\n" + "\n".join(budget_msgs)
+
+    await update.message.reply_text(reply, reply_markup=get_main_menu_keyboard())
+    await update_pinned_dashboard(context, user_id)
+
 async def send_budget_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     user_db = db.get_or_create_user(user_id, update.effective_user.username)
@@ -161,36 +258,47 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_db = db.get_or_create_user(user_id, update.effective_user.username)
+
+    if update.message.media_group_id:
+        await collect_album_photo(update, context)
+        return
     
-    photo_file = await update.message.photo[-1].get_file()
-    file_path = f"temp_{user_id}.jpg"
-    await photo_file.download_to_drive(file_path)
-    
-    processing_msg = await update.message.reply_text("Sedang memproses struk... ⏳")
+    photo = update.message.photo[-1]
+    photo_file = await photo.get_file()
+    # The photo stays in memory from download to OCR: no temp files to collide or clean up
+    image = await photo_file.download_as_bytearray()
+
+    # The same photo resent or forwarded (same file_unique_id) reuses its earlier read; a receipt that
+    # looks like one the user already saved, with the same amount, gets a warning
+    cached = receipt_cache.lookup(photo.file_unique_id)
+    receipt_hash = receipt_cache.hash(image)
+    processing_msg = None
+    if cached is None:
+        try:
+            job = ocr_pool.submit(image, staged=OCR_TWO_STAGE)
+        except OCRQueueFull:
+            await update.message.reply_text("Lagi banyak struk yang antre nih. Coba kirim lagi sebentar lagi ya! 🙏")
+            return
+        processing_msg = await update.message.reply_text(_processing_text(job))
+    reply = processing_msg.edit_text if processing_msg is not None else update.message.reply_text
     
     try:
-        ocr_result = ocr.process_receipt(file_path)
-        if isinstance(ocr_result, dict):
-            amount = ocr_result.get('amount', 0)
-            merchant = ocr_result.get('merchant', 'Struk Belanja')
-            date_str = ocr_result.get('date', datetime.now().strftime("%Y-%m-%d"))
+        if cached is None:
+            ocr_result = await _await_receipt(job, processing_msg)
+            if isinstance(ocr_result, dict) and ocr_result.get('amount', 0) > 0:
+                receipt_cache.store(photo.file_unique_id, ocr_result)
         else:
-            amount = ocr_result if ocr_result else 0
-            merchant = 'Struk Belanja'
-            date_str = datetime.now().strftime("%Y-%m-%d")
+            ocr_result = cached
+        tx = receipt_transaction(ocr_result, receipt_hash)
         
-        if amount > 0:
-            category = nlp._detect_category(merchant)
-            if category == "Lain-lain":
-                category = "Belanja"
-            
-            context.user_data['pending_tx'] = {
-                'amount': amount,
-                'category': category,
-                'merchant': merchant,
-                'date': date_str,
-                'type': 'expense'
-            }
+        if tx:
+            saved = receipt_cache.duplicate(user_id, receipt_hash, tx['amount'])
+            amount, category, merchant, date_str = tx['amount'], tx['category'], tx['merchant'], tx['date']
+            context.user_data['pending_tx'] = tx
+            if isinstance(ocr_result, dict) and ocr_result.get('partial'):
+                context.user_data['pending_receipt'] = (photo.file_unique_id, image)
+            else:
+                context.user_data.pop('pending_receipt', None)
             
             keyboard = [
                 [
@@ -207,14 +315,166 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"📂 **Kategori:** {category}\n"
                 f"🏪 **Toko:** {merchant}\n"
                 f"📅 **Tanggal:** {date_str}\n\n"
-                f"Apakah data di atas sudah benar?"
             )
-            await processing_msg.edit_text(msg, reply_markup=reply_markup, parse_mode='Markdown')
+            if saved is not None:
+                saved_on = datetime.fromtimestamp(saved['saved_at']).strftime("%d/%m %H:%M")
+                msg += f"⚠️ Struk ini mirip dengan yang sudah kamu simpan ({saved_on}, Rp{saved['amount']:,.0f}). Yakin mau simpan lagi?"
+            else:
+                msg += "Apakah data di atas sudah benar?"
+            if 'pending_receipt' in context.user_data:
+                msg += "\n_Toko & tanggal belum dibaca dari struk, pilih ✎ Edit untuk membacanya._"
+            await reply(msg, reply_markup=reply_markup, parse_mode='Markdown')
         else:
-            await processing_msg.edit_text("Maaf, aku nggak nemu total harganya. Bisa coba foto lagi atau ketik manual?")
+            await reply("Maaf, aku nggak nemu total harganya. Bisa coba foto lagi atau ketik manual?")
+    except asyncio.TimeoutError:
+        await reply("Struknya kelamaan diproses, server lagi sibuk. Coba kirim lagi nanti ya!")
     except Exception as e:
         logging.error(f"OCR Error: {e}")
-        await processing_msg.edit_text("Terjadi kesalahan saat memproses gambar. Coba pastikan foto struk terlihat jelas.")
+        await reply("Terjadi kesalahan saat memproses gambar. Coba pastikan foto struk terlihat jelas.")
+
+def receipt_transaction(ocr_result, receipt_hash=None):
+    """The pending transaction read from a receipt (a result dict, or a bare amount); None when it has no total."""
+    if isinstance(ocr_result, dict):
+        amount = ocr_result.get('amount', 0)
+        # A staged read stops at the total: merchant and date are read later, if the user edits them
+        merchant = nlp.merchants.canonicalize(ocr_result.get('merchant') or 'Struk Belanja')
+        date_str = ocr_result.get('date') or datetime.now().strftime("%Y-%m-%d")
+    else:
+        amount = ocr_result if ocr_result else 0
+        merchant = 'Struk Belanja'
+        date_str = datetime.now().strftime("%Y-%m-%d")
+    if not amount > 0:
+        return None
+
+    category = nlp._detect_category(merchant)
+    if category == "Lain-lain":
+        category = "Belanja"
+    return {
+        'amount': amount,
+        'category': category,
+        'merchant': merchant,
+        'date': date_str,
+        'type': 'expense',
+        'receipt_hash': receipt_hash
+    }
+
+async def collect_album_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Gathers the photos of one album (same media_group_id). The update that
+    opened the album waits until every photo is downloaded and none has
+    arrived for ALBUM_WAIT seconds, then reads them all (process_album);
+    the others only add their photo. Needs concurrent updates, as bot.py sets.
+    """
+    loop = asyncio.get_running_loop()
+    key = (update.effective_user.id, update.message.media_group_id)
+    album = _albums.get(key)
+    opened = album is None
+    if opened:
+        album = _albums[key] = {"pending": 0, "photos": [], "last": loop.time()}
+    album["pending"] += 1
+    try:
+        photo = update.message.photo[-1]
+        photo_file = await photo.get_file()
+        album["photos"].append((update.message.message_id, photo.file_unique_id, await photo_file.download_as_bytearray()))
+    except Exception as e:
+        logging.error(f"Album photo download failed: {e}")
+    finally:
+        album["pending"] -= 1
+        album["last"] = loop.time()
+    if not opened:
+        return
+
+    while album["pending"] or loop.time() - album["last"] < ALBUM_WAIT:
+        await asyncio.sleep(max(0.05, ALBUM_WAIT - (loop.time() - album["last"])))
+    del _albums[key]
+    # In the order the user sent them
+    photos = [(file_id, image) for _, file_id, image in sorted(album["photos"], key=lambda photo: photo[0])]
+    if photos:
+        await process_album(update, context, photos)
+
+async def process_album(update: Update, context: ContextTypes.DEFAULT_TYPE, photos):
+    """
+    Reads an album's receipts, (file_unique_id, image) pairs, in parallel
+    on the OCR pool (photos read before come from the receipt cache) and
+    shows one confirmation with a row per receipt. The read transactions
+    wait in user_data['pending_album'] for ✓ Simpan Semua, which saves them
+    with one bulk insert. Albums are read in full, not staged: there is no
+    per-receipt ✎ Edit to fetch a merchant or date later.
+    """
+    user_id = update.effective_user.id
+    processing_msg = await update.message.reply_text(f"Sedang memproses {len(photos)} struk... ⏳")
+
+    async def read(file_id, image):
+        cached = receipt_cache.lookup(file_id)
+        if cached is not None:
+            return cached
+        result = await ocr_pool.process(image)
+        if isinstance(result, dict) and result.get('amount', 0) > 0:
+            receipt_cache.store(file_id, result)
+        return result
+
+    hashes = [receipt_cache.hash(image) for _, image in photos]
+    results = await asyncio.gather(*(read(file_id, image) for file_id, image in photos), return_exceptions=True)
+
+    album, rows = [], []
+    for i, (result, receipt_hash) in enumerate(zip(results, hashes), 1):
+        if isinstance(result, OCRQueueFull):
+            rows.append(f"{i}. ✕ antrean penuh, kirim ulang struk ini nanti")
+            continue
+        if isinstance(result, asyncio.TimeoutError):
+            rows.append(f"{i}. ✕ kelamaan diproses")
+            continue
+        if isinstance(result, Exception):
+            logging.error(f"OCR Error: {result}")
+            rows.append(f"{i}. ✕ gagal dibaca")
+            continue
+        tx = receipt_transaction(result, receipt_hash)
+        if tx is None:
+            rows.append(f"{i}. ✕ total tidak ditemukan")
+            continue
+        album.append(tx)
+        row = f"{i}. 🏪 {tx['merchant']} · Rp{tx['amount']:,.0f} · {tx['category']} · {tx['date']}"
+        if receipt_cache.duplicate(user_id, receipt_hash, tx['amount']) is not None:
+            row += " ⚠️ mirip struk yang sudah disimpan"
+        rows.append(row)
+
+    if not album:
+        context.user_data.pop('pending_album', None)
+        await processing_msg.edit_text(
+            "Maaf, aku nggak nemu total harga di struk-struk ini. Bisa coba foto lagi atau ketik manual?\n\n" + "\n".join(rows)
+        )
+        return
+
+    context.user_data['pending_album'] = album
+    keyboard = [
+        [
+            InlineKeyboardButton("✓ Simpan Semua", callback_data="album_confirm"),
+            InlineKeyboardButton("✕ Abaikan", callback_data="album_ignore")
+        ]
+    ]
+    msg = (
+        f"📝 {len(album)} dari {len(photos)} struk berhasil dibaca\n\n"
+        + "\n".join(rows)
+        + f"\n\n💰 Total: Rp{sum(tx['amount'] for tx in album):,.0f}\n\nSimpan semua struk yang terbaca?"
+    )
+    await processing_msg.edit_text(msg, reply_markup=InlineKeyboardMarkup(keyboard))
+
+def _processing_text(job):
+    if job.position > 0 and job.pool.saturated:
+        return f"Sedang memproses struk... ⏳ (antrian ke-{job.position})"
+    return "Sedang memproses struk... ⏳"
+
+async def _await_receipt(job, processing_msg):
+    """Waits for the OCR job, keeping the queue position in processing_msg up to date."""
+    task = asyncio.ensure_future(job.result())
+    shown = _processing_text(job)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=QUEUE_REFRESH_INTERVAL)
+            text = _processing_text(job)
+            if not task.done() and text != shown:
+                shown = text
+                await processing_msg.edit_text(text)
+        return task.result()
     finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        task.cancel()
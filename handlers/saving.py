@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from core import db
+from modules.nlp import parse_amount
 import logging
 
 async def set_target(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -14,13 +15,7 @@ async def set_target(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         name = " ".join(context.args[:-1])
-        amount_str = context.args[-1].lower().replace('.', '').replace(',', '')
-        if 'rb' in amount_str:
-            amount = float(amount_str.replace('rb', '')) * 1000
-        elif 'jt' in amount_str:
-            amount = float(amount_str.replace('jt', '')) * 1000000
-        else:
-            amount = float(amount_str)
+        amount = parse_amount(context.args[-1])
             
         db.add_saving_goal(user_db.id, name, amount)
         await update.message.reply_text(f"✅ Target **{name}** sebesar Rp{amount:,.0f} berhasil dibuat! Ayo menabung! 🚀", parse_mode='Markdown')
@@ -38,13 +33,7 @@ async def add_savings(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         goal_id = int(context.args[0])
-        amount_str = context.args[1].lower().replace('.', '').replace(',', '')
-        if 'rb' in amount_str:
-            amount = float(amount_str.replace('rb', '')) * 1000
-        elif 'jt' in amount_str:
-            amount = float(amount_str.replace('jt', '')) * 1000000
-        else:
-            amount = float(amount_str)
+        amount = parse_amount(context.args[1])
             
         goal = db.update_saving_progress(user_db.id, goal_id, amount)
         
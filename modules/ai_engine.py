@@ -2,16 +2,87 @@ import os
 import json
 import logging
 import time
-from groq import Groq
-from config import GROQ_API_KEY, CATEGORIES
+import asyncio
+from contextlib import aclosing
+from config import CATEGORIES
+from modules.llm import create_client, create_async_client, create_breaker, complete, stream_complete
+from modules.llm_cache import LLMCache
+from modules.llm_metrics import LLMMetrics
+from modules.llm_admission import AdmissionController, AdmissionRejected
+from modules.circuit_breaker import CircuitOpenError
+from modules.analysis import serialize_insight_summary, format_insight_summary, INSIGHT_SUMMARY_LEGEND
 
 logger = logging.getLogger(__name__)
 
 class AIEngine:
-    def __init__(self):
-        self.client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+    def __init__(self, cache=None, breaker=None, nlp=None, metrics=None, admission=None):
+        self.client = create_client()
+        # Non-blocking client for use inside async handlers
+        self.async_client = create_async_client()
         # Updated to llama-3.3-70b-versatile as llama3-8b-8192 is decommissioned
         self.model = "llama-3.3-70b-versatile"
+        # Responses to identical prompts are reused (see modules/llm_cache.py)
+        self.cache = cache if cache is not None else LLMCache()
+        # While Groq is failing, calls short-circuit to rule-based answers (nlp.parse_message)
+        self.breaker = breaker if breaker is not None else create_breaker()
+        self.nlp = nlp
+        # Tokens, latency and outcome of every call, per feature (see modules/llm_metrics.py)
+        self.metrics = metrics if metrics is not None else LLMMetrics()
+        # Per-user quotas and the bot-wide concurrency limit of the async paths (see modules/llm_admission.py)
+        self.admission = admission if admission is not None else AdmissionController()
+
+    def _create(self, prompt, call=None, **kwargs):
+        """
+        One sync completion request guarded by the circuit breaker and its
+        latency budget. Raises CircuitOpenError without calling out while open.
+        Token usage and the outcome go to `call`, if given.
+        """
+        if not self.breaker.allow():
+            error = CircuitOpenError(f"Circuit '{self.breaker.name}' is open")
+            if call is not None:
+                call.failed(error)
+            raise error
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                messages=[{"role": "user", "content": prompt}],
+                model=self.model,
+                timeout=self.breaker.latency_budget,
+                **kwargs
+            )
+        except Exception as e:
+            self.breaker.record_failure()
+            if call is not None:
+                call.failed(e)
+            raise
+        self.breaker.record_success(time.perf_counter() - started)
+        if call is not None:
+            call.succeeded(response)
+        return response
+
+    def _rule_based_parse(self, text):
+        """parse_transaction answer from the local rules, used while the circuit is open or the user is over quota."""
+        if self.nlp is None:
+            return None
+        parsed = self.nlp.parse_message(text)
+        if parsed.get("intent") != "add_transaction":
+            return {"amount": 0, "category": None, "description": text, "type": None, "is_transaction": False}
+        category = parsed["category"]
+        return {
+            "amount": parsed["amount"],
+            "category": category,
+            "description": text,
+            "type": "income" if category == "Gaji" else "expense",
+            "is_transaction": True
+        }
+
+    def _rule_based_insight(self, analysis_data):
+        """While the circuit is open the standard analysis text (or the summary, rendered) is shown as-is."""
+        if isinstance(analysis_data, dict):
+            return format_insight_summary(analysis_data)
+        if isinstance(analysis_data, str) and analysis_data.strip():
+            return analysis_data
+        return "AI lagi gangguan nih. Coba lagi beberapa menit lagi ya!"
 
     def parse_transaction(self, text, retries=2):
         """
@@ -20,7 +91,143 @@ class AIEngine:
         if not self.client:
             return None
 
-        prompt = f"""
+        with self.metrics.track("parse", self.model) as call:
+            key = self.cache.make_key(self.model, "parse", text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+            prompt = self._parse_prompt(text)
+            start = time.perf_counter()
+
+            for attempt in range(retries + 1):
+                try:
+                    response = self._create(prompt, call=call, response_format={"type": "json_object"})
+                    result = json.loads(response.choices[0].message.content)
+                    self.cache.set(key, result, time.perf_counter() - start)
+                    return result
+                except CircuitOpenError:
+                    return self._rule_based_parse(text)
+                except Exception as e:
+                    logger.error(f"Groq Parsing Error (attempt {attempt+1}): {e}")
+                    call.failed(e)
+                    if attempt == retries:
+                        return None
+                    call.retries += 1
+                    time.sleep(1)
+            return None
+
+    async def parse_transaction_async(self, text, retries=2, deadline=None, user_id=None, charged=False):
+        """
+        Async parse_transaction: never blocks the event loop, gives up after `deadline` seconds.
+        The call is charged to user_id's quota; over quota the local rules answer.
+        charged=True means the caller already charged user_id (ParseBatcher):
+        the charge is refunded when no request is made (cache hit or shed).
+        """
+        if not self.async_client:
+            return None
+
+        with self.metrics.track("parse", self.model) as call:
+            key = self.cache.make_key(self.model, "parse", text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                if charged:
+                    self.admission.refund(user_id, "parse")
+                return cached
+
+            start = time.perf_counter()
+            try:
+                async with self.admission.admit(None if charged else user_id, "parse", call=call):
+                    response = await complete(
+                        self.async_client, [{"role": "user", "content": self._parse_prompt(text)}], self.model,
+                        deadline=deadline, retries=retries, breaker=self.breaker, call=call,
+                        response_format={"type": "json_object"}
+                    )
+                result = json.loads(response.choices[0].message.content)
+                self.cache.set(key, result, time.perf_counter() - start)
+                return result
+            except AdmissionRejected:
+                if charged:
+                    self.admission.refund(user_id, "parse")
+                return self._rule_based_parse(text)
+            except CircuitOpenError:
+                return self._rule_based_parse(text)
+            except asyncio.TimeoutError:
+                logger.error("Groq Parsing Error: deadline exceeded")
+            except Exception as e:
+                logger.error(f"Groq Parsing Error: {e}")
+                call.failed(e)
+            return None
+
+    async def parse_transactions_async(self, texts, retries=1, deadline=None, user_ids=None):
+        """
+        Parses several texts with one LLM request (used by ParseBatcher).
+        Returns one dict per text, in order. Raises if the call fails or the
+        answer cannot be matched back to the inputs, so the caller can fall
+        back to single requests. user_ids (one per text) were charged by
+        ParseBatcher.parse; texts answered from the cache, or all of them
+        when the batch is shed, are refunded.
+        """
+        if not self.async_client:
+            return [None] * len(texts)
+
+        user_ids = user_ids or [None] * len(texts)
+        keys = [self.cache.make_key(self.model, "parse", text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        for i, result in enumerate(results):
+            if result is not None:
+                self.admission.refund(user_ids[i], "parse")
+        if not missing:
+            return results
+
+        with self.metrics.track("parse_batch", self.model) as call:
+            start = time.perf_counter()
+            try:
+                # Quotas were charged per text; the batch only needs a slot
+                async with self.admission.admit(None, "parse_batch", call=call):
+                    response = await complete(
+                        self.async_client, [{"role": "user", "content": self._batch_parse_prompt([texts[i] for i in missing])}],
+                        self.model, deadline=deadline, retries=retries, breaker=self.breaker, call=call,
+                        response_format={"type": "json_object"}
+                    )
+            except AdmissionRejected:
+                for i in missing:
+                    self.admission.refund(user_ids[i], "parse")
+                raise
+            parsed = json.loads(response.choices[0].message.content).get("results")
+            if not isinstance(parsed, list) or len(parsed) != len(missing) or not all(isinstance(r, dict) for r in parsed):
+                raise ValueError(f"Batch answer does not match {len(missing)} inputs")
+
+        # Latency is shared by the whole batch
+        latency = (time.perf_counter() - start) / len(missing)
+        for i, result in zip(missing, parsed):
+            results[i] = result
+            self.cache.set(keys[i], result, latency)
+        return results
+
+    def _batch_parse_prompt(self, texts):
+        return f"""
+        Extract transaction details from each text in this JSON array:
+        {json.dumps(texts, ensure_ascii=False)}
+        Categories available: {', '.join(CATEGORIES)}
+
+        Return ONLY a JSON object {{"results": [...]}} with exactly one entry per text, in the same order.
+        Each entry is an object with:
+        - "amount": (float)
+        - "category": (string from available categories)
+        - "description": (string, brief)
+        - "type": ("expense" or "income")
+        - "is_transaction": (boolean, false if text is just a chat)
+
+        If a text is about salary or receiving money, type is "income" and category is "Gaji".
+        If no amount is found, "is_transaction" should be false.
+        """
+
+    def _parse_prompt(self, text):
+        return f"""
         Extract transaction details from this text: "{text}"
         Categories available: {', '.join(CATEGORIES)}
         
@@ -37,29 +244,126 @@ class AIEngine:
         Example: "beli sate 50rb" -> {{"amount": 50000, "category": "Makanan", "description": "beli sate", "type": "expense", "is_transaction": true}}
         """
 
-        for attempt in range(retries + 1):
-            try:
-                response = self.client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model=self.model,
-                    response_format={"type": "json_object"}
-                )
-                return json.loads(response.choices[0].message.content)
-            except Exception as e:
-                logger.error(f"Groq Parsing Error (attempt {attempt+1}): {e}")
-                if attempt == retries:
-                    return None
-                time.sleep(1)
-        return None
-
-    def generate_smart_insight(self, analysis_data, retries=2):
+    def generate_smart_insight(self, analysis_data, retries=2, user_id=None):
         """
         Generates a human-like financial advice based on raw analysis data with retry logic.
+        user_id scopes the cached answer so it is dropped when the user's transactions change.
         """
         if not self.client:
             return "AI Key tidak ditemukan. Gunakan analisis standar."
 
-        prompt = f"""
+        with self.metrics.track("insight", self.model) as call:
+            key = self.cache.make_key(self.model, "insight", analysis_data, user_id)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+            prompt = self._insight_prompt(analysis_data)
+            start = time.perf_counter()
+
+            for attempt in range(retries + 1):
+                try:
+                    response = self._create(prompt, call=call)
+                    insight = response.choices[0].message.content
+                    self.cache.set(key, insight, time.perf_counter() - start, scope=self._user_scope(user_id))
+                    return insight
+                except CircuitOpenError:
+                    return self._rule_based_insight(analysis_data)
+                except Exception as e:
+                    logger.error(f"Error generating AI insight (attempt {attempt+1}): {e}")
+                    if attempt == retries:
+                        return f"Aduh, AI-nya lagi capek nih (Error: {e}). Coba lagi nanti ya!"
+                    call.retries += 1
+                    time.sleep(1)
+            return "Aduh, AI-nya lagi capek nih. Coba lagi nanti ya!"
+
+    async def generate_smart_insight_async(self, analysis_data, retries=2, deadline=None, user_id=None):
+        """
+        Async generate_smart_insight with a deadline and non-blocking backoff.
+        user_id is charged for the call; over quota the standard analysis is shown.
+        """
+        if not self.async_client:
+            return "AI Key tidak ditemukan. Gunakan analisis standar."
+
+        with self.metrics.track("insight", self.model) as call:
+            key = self.cache.make_key(self.model, "insight", analysis_data, user_id)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+            start = time.perf_counter()
+            try:
+                async with self.admission.admit(user_id, "insight", call=call):
+                    response = await complete(
+                        self.async_client, [{"role": "user", "content": self._insight_prompt(analysis_data)}], self.model,
+                        deadline=deadline, retries=retries, breaker=self.breaker, call=call
+                    )
+                insight = response.choices[0].message.content
+                self.cache.set(key, insight, time.perf_counter() - start, scope=self._user_scope(user_id))
+                return insight
+            except (CircuitOpenError, AdmissionRejected):
+                return self._rule_based_insight(analysis_data)
+            except asyncio.TimeoutError:
+                logger.error("Error generating AI insight: deadline exceeded")
+                return "Aduh, AI-nya kelamaan mikir nih. Coba lagi nanti ya!"
+            except Exception as e:
+                logger.error(f"Error generating AI insight: {e}")
+                return f"Aduh, AI-nya lagi capek nih (Error: {e}). Coba lagi nanti ya!"
+
+    async def stream_smart_insight_async(self, analysis_data, retries=2, deadline=None, user_id=None):
+        """
+        generate_smart_insight_async as an async generator of text pieces, for
+        replies that are edited as the answer arrives. Cached answers and
+        fallbacks come as one piece; a stream cut short ends with a note and
+        is not cached.
+        """
+        if not self.async_client:
+            yield "AI Key tidak ditemukan. Gunakan analisis standar."
+            return
+
+        with self.metrics.track("insight_stream", self.model) as call:
+            key = self.cache.make_key(self.model, "insight", analysis_data, user_id)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                yield cached
+                return
+
+            start = time.perf_counter()
+            parts = []
+            try:
+                async with self.admission.admit(user_id, "insight_stream", call=call):
+                    async with aclosing(stream_complete(
+                        self.async_client, [{"role": "user", "content": self._insight_prompt(analysis_data)}], self.model,
+                        deadline=deadline, retries=retries, breaker=self.breaker, call=call
+                    )) as deltas:
+                        async for delta in deltas:
+                            parts.append(delta)
+                            yield delta
+            except (CircuitOpenError, AdmissionRejected):
+                yield self._rule_based_insight(analysis_data)
+                return
+            except asyncio.TimeoutError:
+                logger.error("Error streaming AI insight: deadline exceeded")
+                yield "\n\n_(AI-nya kelamaan mikir, jawabannya kepotong)_" if parts else "Aduh, AI-nya kelamaan mikir nih. Coba lagi nanti ya!"
+                return
+            except Exception as e:
+                logger.error(f"Error streaming AI insight: {e!r}")
+                yield "\n\n_(Koneksi ke AI putus, jawabannya kepotong)_" if parts else f"Aduh, AI-nya lagi capek nih (Error: {e}). Coba lagi nanti ya!"
+                return
+
+            self.cache.set(key, "".join(parts), time.perf_counter() - start, scope=self._user_scope(user_id))
+
+    def _user_scope(self, user_id):
+        return f"user:{user_id}" if user_id is not None else None
+
+    def _insight_prompt(self, analysis_data):
+        """analysis_data is an ExpenseAnalyzer.build_insight_summary dict (sent as compact JSON) or plain text."""
+        if isinstance(analysis_data, dict):
+            analysis_data = serialize_insight_summary(analysis_data, legend=INSIGHT_SUMMARY_LEGEND)
+        return f"""
         Kamu adalah FinBot, asisten keuangan pribadi yang jujur, cerdas, dan sedikit humoris (ala Gen-Z Indonesia).
         Berdasarkan data berikut, berikan insight singkat (max 3-4 bullet points) dan saran yang tajam.
         
@@ -69,20 +373,6 @@ class AIEngine:
         Gunakan bahasa Indonesia yang santai tapi profesional. Berikan apresiasi jika bagus, dan tegur dengan sopan jika boros.
         """
 
-        for attempt in range(retries + 1):
-            try:
-                response = self.client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt}],
-                    model=self.model,
-                )
-                return response.choices[0].message.content
-            except Exception as e:
-                logger.error(f"Error generating AI insight (attempt {attempt+1}): {e}")
-                if attempt == retries:
-                    return f"Aduh, AI-nya lagi capek nih (Error: {e}). Coba lagi nanti ya!"
-                time.sleep(1)
-        return "Aduh, AI-nya lagi capek nih. Coba lagi nanti ya!"
-
     def chat_response(self, text, user_name="Teman"):
         """
         Handles general chat messages using Groq AI with a friendly, Gen-Z persona.
@@ -90,7 +380,58 @@ class AIEngine:
         if not self.client:
             return f"Halo {user_name}! Aku FinBot. Ada yang bisa kubantu catat hari ini?"
 
-        prompt = f"""
+        with self.metrics.track("chat", self.model) as call:
+            key = self.cache.make_key(self.model, "chat", text, user_name)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+            prompt = self._chat_prompt(text, user_name)
+            start = time.perf_counter()
+
+            try:
+                response = self._create(prompt, call=call)
+                reply = response.choices[0].message.content
+                self.cache.set(key, reply, time.perf_counter() - start)
+                return reply
+            except Exception as e:
+                logger.error(f"Error in AI chat response: {e}")
+                return f"Halo {user_name}! Ada yang bisa aku bantu catat hari ini? 💸"
+
+    async def chat_response_async(self, text, user_name="Teman", deadline=None, user_id=None):
+        """
+        Async chat_response. Chit-chat is not worth retrying, so one attempt within the deadline.
+        It has the lowest admission priority: over quota or when the bot is busy, a canned reply.
+        """
+        if not self.async_client:
+            return f"Halo {user_name}! Aku FinBot. Ada yang bisa kubantu catat hari ini?"
+
+        with self.metrics.track("chat", self.model) as call:
+            key = self.cache.make_key(self.model, "chat", text, user_name)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+            start = time.perf_counter()
+            try:
+                async with self.admission.admit(user_id, "chat", call=call):
+                    response = await complete(
+                        self.async_client, [{"role": "user", "content": self._chat_prompt(text, user_name)}], self.model,
+                        deadline=deadline, retries=0, breaker=self.breaker, call=call
+                    )
+                reply = response.choices[0].message.content
+                self.cache.set(key, reply, time.perf_counter() - start)
+                return reply
+            except AdmissionRejected:
+                return f"Halo {user_name}! Ada yang bisa aku bantu catat hari ini? 💸"
+            except Exception as e:
+                logger.error(f"Error in AI chat response: {e!r}")
+                return f"Halo {user_name}! Ada yang bisa aku bantu catat hari ini? 💸"
+
+    def _chat_prompt(self, text, user_name):
+        return f"""
         Kamu adalah FinBot, asisten keuangan pribadi yang super friendly, cerdas, dan asik diajak ngobrol (ala Gen-Z Indonesia).
         User saat ini menyapamu/bertanya: "{text}"
         Nama user: {user_name}
@@ -103,13 +444,3 @@ class AIEngine:
         5. Selalu akhiri jawaban dengan pertanyaan pancingan atau ajakan agar user terus berinteraksi (contoh: "Ada lagi yang mau dicatat hari ini?", "Mau cek budget kamu nggak?", "Gimana kabar dompet hari ini?").
         6. Jaga jawaban tetap singkat dan padat (max 2-3 kalimat).
         """
-
-        try:
-            response = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model=self.model,
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"Error in AI chat response: {e}")
-            return f"Halo {user_name}! Ada yang bisa aku bantu catat hari ini? 💸"
@@ -1,5 +1,16 @@
+import json
 import pandas as pd
 from datetime import datetime, timedelta
+from config import INSIGHT_TOKEN_BUDGET
+from modules.llm import estimate_tokens
+
+# Spending from this hour on counts as night spending
+NIGHT_HOUR = 19
+# Legend for the keys of build_insight_summary, sent once with the payload and
+# counted in its token budget (see serialize_insight_summary)
+INSIGHT_SUMMARY_LEGEND = "Ribu Rp s/d tgl day. week=[7hr ini,7hr lalu]; wow=%/minggu; night_pct=% stlh jam 19; x=kali rata2"
+# Week-over-week changes smaller than this (in %) are left out of the summary
+WOW_MIN_CHANGE = 10
 
 class ExpenseAnalyzer:
     def __init__(self, db_handler):
@@ -66,6 +77,64 @@ class ExpenseAnalyzer:
         
         return insight
 
+    def build_insight_summary(self, user_id, now=None):
+        """
+        Compact month-to-date spending summary for the AI insight prompt, built
+        from SQL aggregates (see serialize_insight_summary and
+        INSIGHT_SUMMARY_LEGEND). Returns None when there are no expenses yet.
+        """
+        now = now or datetime.now()
+        month_start = datetime(now.year, now.month, 1)
+        categories = self.db.get_category_totals(user_id, month_start)
+        if not categories:
+            return None
+
+        spent = sum(total for total, _ in categories.values())
+        count = sum(n for _, n in categories.values())
+        week_start = now - timedelta(days=7)
+        this_week = self.db.get_category_totals(user_id, week_start)
+        last_week = self.db.get_category_totals(user_id, week_start - timedelta(days=7), week_start)
+        this_week_total = sum(total for total, _ in this_week.values())
+        last_week_total = sum(total for total, _ in last_week.values())
+
+        summary = {
+            "month": now.strftime("%Y-%m"),
+            "day": now.day,
+            "spent": _rb(spent),
+            "tx": count,
+            "cat": {c: _rb(t) for c, (t, _) in sorted(categories.items(), key=lambda item: -item[1][0])},
+            "week": [_rb(this_week_total), _rb(last_week_total)],
+        }
+
+        # Week-over-week change per category, biggest swings first
+        wow = {}
+        for category in set(this_week) | set(last_week):
+            before = last_week.get(category, (0.0, 0))[0]
+            if before > 0:
+                change = round((this_week.get(category, (0.0, 0))[0] - before) / before * 100)
+                if abs(change) >= WOW_MIN_CHANGE:
+                    wow[category] = change
+        if wow:
+            summary["wow"] = dict(sorted(wow.items(), key=lambda item: -abs(item[1])))
+
+        hours = self.db.get_hourly_totals(user_id, month_start)
+        summary["night_pct"] = round(sum(t for h, t in hours.items() if h >= NIGHT_HOUR) / spent * 100) if spent else 0
+
+        # Same rule as analyze_patterns: a single expense above 3x the average
+        average = spent / count
+        anomalies = [
+            {"cat": t.category, "rb": _rb(t.amount), "x": round(t.amount / average, 1), "date": t.date.strftime("%d/%m")}
+            for t in self.db.get_top_expenses(user_id, month_start) if t.amount > average * 3
+        ]
+        if anomalies:
+            summary["anomalies"] = anomalies
+
+        income = self.db.get_latest_income(user_id)
+        if income and income.amount:
+            summary["income"] = _rb(income.amount)
+            summary["savings_pct"] = round((income.amount - spent) / income.amount * 100)
+        return summary
+
     def calculate_health_score(self, user_id):
         """
         Simple, transparent financial health score.
@@ -93,3 +162,81 @@ class ExpenseAnalyzer:
             score -= 20
             
         return max(0, min(100, score))
+
+
+def _rb(amount):
+    """Rupiah to thousands, the unit of the insight summary."""
+    return round(amount / 1000)
+
+
+def _dump(summary):
+    return json.dumps(summary, ensure_ascii=False, separators=(",", ":"))
+
+
+# How serialize_insight_summary shrinks a summary, in order: (key, shrink), None drops the key
+_TRIM_STEPS = [
+    ("wow", lambda wow: dict(list(wow.items())[:3])),
+    ("anomalies", lambda anomalies: anomalies[:1]),
+    ("cat", lambda cat: _fold_categories(cat, 4)),
+    ("wow", None),
+    ("cat", lambda cat: _fold_categories(cat, 2)),
+    ("anomalies", None),
+]
+
+
+def serialize_insight_summary(summary, token_budget=INSIGHT_TOKEN_BUDGET, legend=None):
+    """
+    Minified JSON of a build_insight_summary dict, trimmed to fit token_budget
+    by shortening and then dropping the detail lists (wow, anomalies) and
+    folding the smallest categories into "lainnya" (see _TRIM_STEPS). The
+    headline numbers (spent, week, night_pct, savings) are always kept.
+    A legend goes on the line above the JSON and counts toward the budget.
+    """
+    if legend:
+        body = serialize_insight_summary(summary, token_budget - estimate_tokens(legend + "\n"))
+        return f"{legend}\n{body}"
+
+    text = _dump(summary)
+    if estimate_tokens(text) <= token_budget:
+        return text
+
+    summary = dict(summary)
+    for key, shrink in _TRIM_STEPS:
+        if key not in summary:
+            continue
+        if shrink is None:
+            del summary[key]
+        else:
+            summary[key] = shrink(summary[key])
+        text = _dump(summary)
+        if estimate_tokens(text) <= token_budget:
+            break
+    return text
+
+
+def _fold_categories(categories, keep):
+    """Keeps the `keep` biggest categories and sums the rest into "lainnya"."""
+    items = list(categories.items())
+    if len(items) <= keep + 1:
+        return categories
+    folded = dict(items[:keep])
+    folded["lainnya"] = sum(total for _, total in items[keep:])
+    return folded
+
+
+def format_insight_summary(summary):
+    """Short plain-language rendering of a summary, shown when the AI is unavailable."""
+    if not summary:
+        return "Belum ada data pengeluaran bulan ini untuk dianalisis."
+    top_category, top_total = next(iter(summary["cat"].items()))
+    lines = [
+        "🧠 **RINGKASAN BULAN INI**",
+        f"• Pengeluaran: Rp{summary['spent']:,}rb dari {summary['tx']} transaksi",
+        f"• Terbesar: {top_category} (Rp{top_total:,}rb)",
+        f"• 7 hari terakhir: Rp{summary['week'][0]:,}rb (minggu sebelumnya Rp{summary['week'][1]:,}rb)",
+    ]
+    if summary.get("night_pct", 0) > 40:
+        lines.append(f"• {summary['night_pct']}% uangmu keluar setelah jam 7 malam")
+    if "savings_pct" in summary:
+        lines.append(f"• Sisa gaji: {summary['savings_pct']}%")
+    return "\n".join(lines)
@@ -0,0 +1,90 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_timeout=30.0, latency_budget=8.0):
+        """
+        Closed: calls go through; `failure_threshold` consecutive failures trip it.
+        Open: calls are refused instantly until `reset_timeout` seconds pass.
+        Half-open: one probe call is let through; success closes, failure re-opens.
+        A call slower than `latency_budget` seconds counts as a failure.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency_budget = latency_budget
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.counters = {"trips": 0, "successes": 0, "failures": 0, "slow_calls": 0, "short_circuits": 0}
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go out now. Counts a short circuit when it may not."""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.counters["short_circuits"] += 1
+            return False
+
+    def record_success(self, latency=0.0):
+        if latency > self.latency_budget:
+            with self.lock:
+                self.counters["slow_calls"] += 1
+            self.record_failure()
+            return
+        with self.lock:
+            self.counters["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Circuit '{self.name}' closed again")
+            self.state = CLOSED
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.counters["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+                self.counters["trips"] += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} failures")
+
+    def record_cancelled(self):
+        """The call was abandoned by its caller: no verdict, but free the half-open probe slot."""
+        with self.lock:
+            self.probe_in_flight = False
+
+    @property
+    def is_open(self):
+        """True while calls would be refused (without taking the half-open probe)."""
+        with self.lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self.probe_in_flight
+
+    def metrics(self):
+        with self.lock:
+            return {"name": self.name, "state": self.state,
+                    "consecutive_failures": self.consecutive_failures, **self.counters}
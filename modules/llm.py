@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import random
+from config import GROQ_API_KEY, GROQ_BASE_URL, LLM_DEADLINE, LLM_LATENCY_BUDGET
+from modules.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text):
+    """Rough prompt token count (about 4 characters per token for Llama tokenizers)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def create_client():
+    """
+    Sync Groq client for the non-async paths, or None without an API key.
+    Honours GROQ_BASE_URL like create_async_client (offline mode included).
+    """
+    if not GROQ_API_KEY:
+        return None
+    try:
+        from groq import Groq
+        return Groq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL or None)
+    except Exception as e:
+        logger.error(f"Groq initialization failed: {e}")
+        return None
+
+
+def create_async_client():
+    """
+    AsyncGroq client shared by the async LLM paths, or None without an API key.
+    Retries are disabled in the SDK because complete() does its own, bounded by a deadline.
+    """
+    if not GROQ_API_KEY:
+        return None
+    try:
+        from groq import AsyncGroq
+        return AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL or None, max_retries=0)
+    except Exception as e:
+        logger.error(f"AsyncGroq initialization failed: {e}")
+        return None
+
+
+def create_breaker():
+    """Circuit breaker for the Groq provider (one is shared by AIEngine and NLPProcessor in core.py)."""
+    return CircuitBreaker("groq", latency_budget=LLM_LATENCY_BUDGET)
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=4.0):
+    """Exponential backoff with full jitter: uniform(0, min(max_delay, base_delay * 2^attempt))."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+async def complete(client, messages, model, deadline=None, retries=2, base_delay=0.5, max_delay=4.0,
+                   breaker=None, call=None, **kwargs):
+    """
+    Runs one chat completion with retries, all within `deadline` seconds.
+    Each attempt gets whatever time is left (at most the breaker's latency
+    budget); backoff uses asyncio.sleep so the event loop keeps serving other
+    users. Raises CircuitOpenError without calling out while the breaker is
+    open, asyncio.TimeoutError when the deadline is used up, or the last
+    error once retries are exhausted.
+    Cancelling the calling task cancels the in-flight HTTP request.
+    Retries, token usage and the outcome go to `call` (an LLMCall), if given.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + (deadline if deadline is not None else LLM_DEADLINE)
+
+    for attempt in range(retries + 1):
+        remaining = end - loop.time()
+        if remaining <= 0:
+            raise _failed(call, asyncio.TimeoutError("LLM deadline exceeded"))
+        if breaker is not None and not breaker.allow():
+            raise _failed(call, CircuitOpenError(f"Circuit '{breaker.name}' is open"))
+
+        timeout = min(remaining, breaker.latency_budget) if breaker is not None else remaining
+        start = loop.time()
+        try:
+            response = await asyncio.wait_for(
+                client.chat.completions.create(messages=messages, model=model, **kwargs),
+                timeout=timeout
+            )
+        except asyncio.CancelledError:
+            if breaker is not None:
+                breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_failure()
+            if call is not None:
+                call.failed(e)
+            if isinstance(e, asyncio.TimeoutError) and loop.time() >= end:
+                raise
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if loop.time() + delay >= end:
+                raise
+            logger.warning(f"LLM call failed (attempt {attempt+1}), retrying in {delay:.2f}s: {e!r}")
+            if call is not None:
+                call.retries += 1
+            await asyncio.sleep(delay)
+            continue
+
+        if breaker is not None:
+            breaker.record_success(loop.time() - start)
+        if call is not None:
+            call.succeeded(response)
+        return response
+
+
+async def stream_complete(client, messages, model, deadline=None, retries=2, base_delay=0.5, max_delay=4.0,
+                          breaker=None, call=None, **kwargs):
+    """
+    Streaming counterpart of complete(): an async generator of content deltas.
+    Attempts are retried like complete() until the first delta arrives, which
+    must happen within the breaker's latency budget; after that the text is
+    already on the user's screen, so errors are raised instead. The whole
+    stream must finish within `deadline` seconds (asyncio.TimeoutError).
+    The breaker sees one call per attempt, timed to the first delta.
+    Streams carry no usage block, so `call` gets estimated token counts.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + (deadline if deadline is not None else LLM_DEADLINE)
+
+    for attempt in range(retries + 1):
+        remaining = end - loop.time()
+        if remaining <= 0:
+            raise _failed(call, asyncio.TimeoutError("LLM deadline exceeded"))
+        if breaker is not None and not breaker.allow():
+            raise _failed(call, CircuitOpenError(f"Circuit '{breaker.name}' is open"))
+
+        timeout = min(remaining, breaker.latency_budget) if breaker is not None else remaining
+        start = loop.time()
+        first_byte = None
+        stream = None
+        produced = []
+        try:
+            stream = await asyncio.wait_for(
+                client.chat.completions.create(messages=messages, model=model, stream=True, **kwargs),
+                timeout=timeout
+            )
+            deltas = _content_deltas(stream)
+            delta = await asyncio.wait_for(anext(deltas, None), timeout=start + timeout - loop.time())
+            first_byte = loop.time() - start
+            while delta is not None:
+                produced.append(delta)
+                yield delta
+                delta = await asyncio.wait_for(anext(deltas, None), timeout=end - loop.time())
+        except (asyncio.CancelledError, GeneratorExit):
+            if breaker is not None:
+                breaker.record_cancelled()
+            raise
+        except Exception as e:
+            if breaker is not None:
+                breaker.record_failure()
+            if call is not None:
+                call.failed(e)
+            if first_byte is not None:
+                raise
+            if isinstance(e, asyncio.TimeoutError) and loop.time() >= end:
+                raise
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            if loop.time() + delay >= end:
+                raise
+            logger.warning(f"LLM stream failed (attempt {attempt+1}), retrying in {delay:.2f}s: {e!r}")
+            if call is not None:
+                call.retries += 1
+            await asyncio.sleep(delay)
+            continue
+        finally:
+            if stream is not None:
+                if call is not None:
+                    call.prompt_tokens += sum(estimate_tokens(m["content"]) for m in messages)
+                    call.completion_tokens += estimate_tokens("".join(produced)) if produced else 0
+                await stream.response.aclose()
+
+        if breaker is not None:
+            breaker.record_success(first_byte)
+        if call is not None:
+            call.outcome = "ok"
+        return
+
+
+def _failed(call, error):
+    if call is not None:
+        call.failed(error)
+    return error
+
+
+async def _content_deltas(stream):
+    """Non-empty text pieces of a chat completion stream (role and finish chunks are skipped)."""
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,209 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from config import LLM_USER_RATE, LLM_USER_BURST, LLM_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+THROTTLED = "throttled"
+SHED = "shed"
+
+# Lower runs first: recording money beats insights beats intent guessing beats chit-chat
+PRIORITIES = {"parse": 0, "parse_batch": 0, "insight": 1, "insight_stream": 1, "intent": 2, "chat": 3}
+# Share of a user's bucket each priority must leave untouched, so chatting never uses up the quota for parsing
+_RESERVE = {0: 0.0, 1: 0.0, 2: 0.25, 3: 0.5}
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of calling the LLM when the user is over quota (throttled) or the bot is saturated (shed)."""
+
+    def __init__(self, reason, message=None):
+        super().__init__(message or reason)
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_sec):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+
+    def take(self, cost=1.0, reserve=0.0):
+        """Takes `cost` tokens if that leaves at least `reserve` in the bucket."""
+        self._refill()
+        if self.tokens - cost < reserve:
+            return False
+        self.tokens -= cost
+        return True
+
+    def give_back(self, cost=1.0):
+        """Returns tokens taken for a call that never ran."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+
+class AdmissionController:
+    def __init__(self, rate_per_min=LLM_USER_RATE, burst=LLM_USER_BURST, max_concurrency=LLM_MAX_CONCURRENCY,
+                 queue_timeout=LLM_QUEUE_TIMEOUT, max_users=10000):
+        """
+        Admission for LLM calls. Each user has a token bucket of `burst`
+        calls refilled at `rate_per_min`; low-priority features (see
+        PRIORITIES) must leave part of it for parsing. At most
+        `max_concurrency` calls are in flight bot-wide; the rest wait up to
+        `queue_timeout` seconds, and a freed slot goes to the highest
+        priority waiter. Callers degrade to rule-based or canned answers on
+        AdmissionRejected. Buckets of the `max_users` most recent users are kept.
+        """
+        self.rate_per_min = rate_per_min
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_users = max_users
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self.users = OrderedDict()
+        self.counters = {"admitted": 0, THROTTLED: 0, SHED: 0}
+        self.lock = threading.Lock()
+
+    def _user(self, user_id):
+        entry = self.users.get(user_id)
+        if entry is None:
+            entry = self.users[user_id] = {
+                "bucket": TokenBucket(self.burst, self.rate_per_min / 60),
+                "calls": 0, THROTTLED: 0, SHED: 0, "features": {},
+            }
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(user_id)
+        return entry
+
+    def charge(self, user_id, feature):
+        """
+        Takes one call from the user's quota. Raises AdmissionRejected
+        (throttled) when it is used up. Calls without a user are not charged.
+        """
+        if user_id is None:
+            return
+        priority = PRIORITIES.get(feature, 1)
+        with self.lock:
+            entry = self._user(user_id)
+            if not entry["bucket"].take(1, self.burst * _RESERVE[priority]):
+                entry[THROTTLED] += 1
+                self.counters[THROTTLED] += 1
+                raise AdmissionRejected(THROTTLED, f"User {user_id} is over the LLM quota for {feature}")
+            entry["calls"] += 1
+            entry["features"][feature] = entry["features"].get(feature, 0) + 1
+
+    def refund(self, user_id, feature):
+        """Undoes charge() for a call that never got a slot."""
+        if user_id is None:
+            return
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None or not entry["features"].get(feature):
+                return
+            entry["bucket"].give_back(1)
+            entry["calls"] -= 1
+            entry["features"][feature] -= 1
+            if not entry["features"][feature]:
+                del entry["features"][feature]
+
+    async def _acquire_slot(self, priority):
+        with self.lock:
+            while self._waiters and self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        with self.lock:
+            while self._waiters:
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    # The slot passes straight to the waiter, `active` is unchanged
+                    future.set_result(None)
+                    return
+            self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, user_id, feature, call=None):
+        """
+        Runs the block as one admitted LLM call:
+            async with self.admission.admit(user_id, "chat", call=call):
+                ... await complete(...)
+        Raises AdmissionRejected (also recorded on `call`, an LLMCall) when
+        the user is over quota or no slot frees up within queue_timeout. A
+        call that never gets a slot (shed or cancelled) is not charged.
+        """
+        try:
+            self.charge(user_id, feature)
+            try:
+                await self._acquire_slot(PRIORITIES.get(feature, 1))
+            except asyncio.CancelledError:
+                self.refund(user_id, feature)
+                raise
+            except asyncio.TimeoutError:
+                self.refund(user_id, feature)
+                with self.lock:
+                    self.counters[SHED] += 1
+                    if user_id is not None:
+                        self._user(user_id)[SHED] += 1
+                logger.warning(f"LLM call for {feature} shed: no slot within {self.queue_timeout}s")
+                raise AdmissionRejected(SHED, f"No LLM slot free for {feature}")
+        except AdmissionRejected as e:
+            if call is not None:
+                call.failed(e)
+            raise
+
+        with self.lock:
+            self.counters["admitted"] += 1
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def usage(self, user_id):
+        """
+        One user's counters and remaining quota (None if the user made no LLM
+        calls recently). `calls` counts calls charged to the quota, per feature.
+        """
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None:
+                return None
+            return {"calls": entry["calls"], THROTTLED: entry[THROTTLED], SHED: entry[SHED],
+                    "features": dict(entry["features"]), "tokens": round(entry["bucket"].available(), 2),
+                    "burst": self.burst, "rate_per_min": self.rate_per_min}
+
+    def metrics(self):
+        with self.lock:
+            waiting = sum(1 for _, _, future in self._waiters if not future.done())
+            return {"active": self.active, "waiting": waiting, "max_concurrency": self.max_concurrency,
+                    "users": len(self.users), **self.counters}
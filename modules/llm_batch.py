@@ -0,0 +1,95 @@
+import asyncio
+import logging
+from modules.llm_admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+
+class ParseBatcher:
+    def __init__(self, ai, max_batch=8, max_wait_ms=50):
+        """
+        Micro-batches AIEngine parse requests: callers await parse(text), and
+        pending texts are sent together as one prompt once max_batch are
+        queued or max_wait_ms has passed since the first one arrived.
+        """
+        self.ai = ai
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.pending = []
+        self._timer = None
+        self._tasks = set()
+        self.stats = {"requests": 0, "batches": 0, "batched_items": 0, "fallbacks": 0, "throttled": 0, "shed": 0}
+
+    async def parse(self, text, user_id=None):
+        """
+        Same result as AIEngine.parse_transaction_async(text, user_id=user_id):
+        the call is charged to user_id's quota before the text joins a batch,
+        and refunded if no request is made for it (cancelled while queued,
+        answered from the cache, or shed).
+        """
+        if not self.ai.async_client:
+            return None
+        try:
+            self.ai.admission.charge(user_id, "parse")
+        except AdmissionRejected:
+            self.stats["throttled"] += 1
+            return self.ai._rule_based_parse(text)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, user_id, future))
+        self.stats["requests"] += 1
+
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        """Sends whatever is pending now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up (cancelled) are dropped from the batch and refunded
+        batch = []
+        for text, user_id, future in self.pending:
+            if future.done():
+                self.ai.admission.refund(user_id, "parse")
+            else:
+                batch.append((text, user_id, future))
+        self.pending = []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        texts = [text for text, _, _ in batch]
+        user_ids = [user_id for _, user_id, _ in batch]
+        try:
+            if len(texts) == 1:
+                results = [await self.ai.parse_transaction_async(texts[0], user_id=user_ids[0], charged=True)]
+            else:
+                self.stats["batches"] += 1
+                self.stats["batched_items"] += len(texts)
+                try:
+                    results = await self.ai.parse_transactions_async(texts, user_ids=user_ids)
+                except AdmissionRejected:
+                    # No slot freed up in time: single calls would only queue again
+                    self.stats["shed"] += 1
+                    results = [self.ai._rule_based_parse(text) for text in texts]
+                except Exception as e:
+                    logger.warning(f"Batch parse of {len(texts)} texts failed, falling back to single calls: {e!r}")
+                    self.stats["fallbacks"] += 1
+                    results = await asyncio.gather(*(
+                        self.ai.parse_transaction_async(text, user_id=user_id, charged=True)
+                        for text, user_id in zip(texts, user_ids)
+                    ))
+        except Exception as e:
+            logger.error(f"Parse batch failed: {e!r}")
+            results = [None] * len(texts)
+
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
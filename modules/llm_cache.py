@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from config import LLM_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response stays valid, per call type (prompt template)
+DEFAULT_TTLS = {
+    "parse": 7 * 24 * 3600,   # same text -> same transaction
+    "intent": 24 * 3600,
+    "chat": 3600,             # keep small talk from feeling canned
+    "insight": 6 * 3600,      # also dropped whenever the user's transactions change
+}
+
+
+def normalize_input(value):
+    """Canonical text for a prompt input: case/whitespace-insensitive strings, sorted dicts."""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class LLMCache:
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=1024, ttls=None):
+        """
+        Two-tier cache for LLM responses: an in-memory LRU in front of an
+        optional SQLite file (path=None keeps it memory-only).
+        Entries can carry a scope (e.g. "user:12") so they can be dropped together.
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.memory = OrderedDict()  # key -> (value, expires_at, scope, latency)
+        self.stats_by_template = {}
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, template TEXT, scope TEXT, value TEXT, expires_at REAL, latency REAL)"
+                )
+                self.db.execute("CREATE INDEX IF NOT EXISTS llm_cache_scope ON llm_cache (scope)")
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"LLM cache disk tier disabled: {e}")
+                self.db = None
+
+    def make_key(self, model, template, *inputs):
+        raw = "\x1f".join([model, template] + [normalize_input(value) for value in inputs])
+        return f"{template}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+    def get(self, key):
+        """Cached value or None. Counts a hit or a miss for the key's template."""
+        template = key.split(":", 1)[0]
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[1] <= now:
+                del self.memory[key]
+                entry = None
+            if entry:
+                self.memory.move_to_end(key)
+                self._count(template, "memory_hits", entry[3])
+                return entry[0]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT value, expires_at, scope, latency FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, (value, row[1], row[2], row[3]))
+                    self._count(template, "disk_hits", row[3])
+                    return value
+
+            self._count(template, "misses", 0.0)
+            return None
+
+    def set(self, key, value, latency=0.0, scope=None):
+        """
+        Stores a response. latency is what the real call took, credited as
+        saved time on every later hit.
+        """
+        template = key.split(":", 1)[0]
+        expires_at = time.time() + self.ttls.get(template, 3600)
+        try:
+            encoded = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        with self.lock:
+            self._remember(key, (value, expires_at, scope, latency))
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, template, scope, value, expires_at, latency) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, template, scope, encoded, expires_at, latency)
+                )
+                self.db.commit()
+
+    def invalidate_scope(self, scope):
+        with self.lock:
+            for key in [k for k, entry in self.memory.items() if entry[2] == scope]:
+                del self.memory[key]
+            if self.db is not None:
+                self.db.execute("DELETE FROM llm_cache WHERE scope = ?", (scope,))
+                self.db.commit()
+
+    def invalidate_user(self, user_id):
+        """Drops the user's insight entries; called when their transactions change."""
+        self.invalidate_scope(f"user:{user_id}")
+
+    def stats(self):
+        """Per template: memory_hits, disk_hits, misses, hit_rate and latency_saved (seconds)."""
+        with self.lock:
+            result = {}
+            for template, counts in self.stats_by_template.items():
+                hits = counts["memory_hits"] + counts["disk_hits"]
+                total = hits + counts["misses"]
+                result[template] = {**counts, "hit_rate": hits / total if total else 0.0}
+            return result
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _count(self, template, field, latency):
+        counts = self.stats_by_template.setdefault(
+            template, {"memory_hits": 0, "disk_hits": 0, "misses": 0, "latency_saved": 0.0}
+        )
+        counts[field] += 1
+        if field != "misses":
+            counts["latency_saved"] += latency or 0.0
@@ -0,0 +1,173 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, timedelta
+import numpy as np
+from config import LLM_METRICS_PATH
+from modules.circuit_breaker import CircuitOpenError
+from modules.llm_admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+# USD per million tokens (input, output), Groq list prices at time of writing
+MODEL_PRICES = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1e6
+
+
+class LLMCall:
+    def __init__(self, feature, model):
+        """
+        What one instrumented LLM call did. The caller marks cache hits;
+        complete(), stream_complete() and AIEngine._create fill in the rest.
+        """
+        self.feature = feature
+        self.model = model
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.retries = 0
+        self.cache_hit = False
+        self.outcome = None
+
+    def succeeded(self, response):
+        """Takes token counts from the response's usage block."""
+        self.outcome = "ok"
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def failed(self, error):
+        if isinstance(error, CircuitOpenError):
+            self.outcome = "circuit_open"
+        elif isinstance(error, AdmissionRejected):
+            self.outcome = error.reason
+        elif isinstance(error, asyncio.TimeoutError):
+            self.outcome = "timeout"
+        else:
+            self.outcome = "error"
+
+
+class LLMMetrics:
+    def __init__(self, path=LLM_METRICS_PATH, window=1000):
+        """
+        Per (feature, model) aggregates of instrumented LLM calls: calls by
+        outcome, tokens, estimated cost, retries, cache hits and latency
+        percentiles over the last `window` provider calls. With a path, daily
+        totals are also kept in SQLite for capacity planning.
+        """
+        self.window = window
+        self.stats = {}
+        self.lock = threading.Lock()
+
+        self.db = None
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self.db = sqlite3.connect(path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_usage_daily ("
+                    "day TEXT, feature TEXT, model TEXT, calls INTEGER, cache_hits INTEGER, errors INTEGER, "
+                    "retries INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER, latency_sum REAL, "
+                    "cost_usd REAL, PRIMARY KEY (day, feature, model))"
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"LLM usage persistence disabled: {e}")
+                self.db = None
+
+    @contextmanager
+    def track(self, feature, model):
+        """
+        Instruments the LLM call made inside the block:
+            with self.metrics.track("parse", self.model) as call:
+                ... complete(..., call=call)
+        An exception escaping the block is recorded as the outcome.
+        """
+        call = LLMCall(feature, model)
+        start = time.perf_counter()
+        try:
+            yield call
+        except (asyncio.CancelledError, GeneratorExit):
+            call.outcome = "cancelled"
+            raise
+        except Exception as e:
+            call.failed(e)
+            raise
+        finally:
+            self.record(call, time.perf_counter() - start)
+
+    def record(self, call, latency):
+        outcome = "cache" if call.cache_hit else (call.outcome or "skipped")
+        cost = estimate_cost(call.model, call.prompt_tokens, call.completion_tokens)
+        with self.lock:
+            entry = self.stats.get((call.feature, call.model))
+            if entry is None:
+                entry = self.stats[(call.feature, call.model)] = {
+                    "calls": 0, "outcomes": {}, "prompt_tokens": 0, "completion_tokens": 0,
+                    "retries": 0, "cache_hits": 0, "cost_usd": 0.0, "latencies": deque(maxlen=self.window),
+                }
+            entry["calls"] += 1
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            entry["prompt_tokens"] += call.prompt_tokens
+            entry["completion_tokens"] += call.completion_tokens
+            entry["retries"] += call.retries
+            entry["cache_hits"] += call.cache_hit
+            entry["cost_usd"] += cost
+            if outcome not in ("cache", "skipped"):
+                entry["latencies"].append(latency)
+
+            if self.db is not None:
+                try:
+                    self.db.execute(
+                        "INSERT INTO llm_usage_daily VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (day, feature, model) DO UPDATE SET "
+                        "calls = calls + 1, cache_hits = cache_hits + excluded.cache_hits, "
+                        "errors = errors + excluded.errors, retries = retries + excluded.retries, "
+                        "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                        "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                        "latency_sum = latency_sum + excluded.latency_sum, cost_usd = cost_usd + excluded.cost_usd",
+                        (date.today().isoformat(), call.feature, call.model, int(call.cache_hit),
+                         int(outcome in ("error", "timeout")), call.retries, call.prompt_tokens,
+                         call.completion_tokens, latency, cost)
+                    )
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"LLM usage write failed: {e}")
+
+    def metrics(self):
+        """Aggregates keyed "feature/model", with latency p50/p95/p99 in ms."""
+        with self.lock:
+            result = {}
+            for (feature, model), entry in self.stats.items():
+                summary = {k: v for k, v in entry.items() if k != "latencies"}
+                summary["outcomes"] = dict(entry["outcomes"])
+                summary["cost_usd"] = round(entry["cost_usd"], 8)
+                if entry["latencies"]:
+                    p50, p95, p99 = np.percentile(np.fromiter(entry["latencies"], float), [50, 95, 99]) * 1000
+                    summary["latency_ms"] = {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+                result[f"{feature}/{model}"] = summary
+            return result
+
+    def daily(self, days=30):
+        """Persisted per-day totals of the last `days` days (empty without a path)."""
+        if self.db is None:
+            return []
+        since = (date.today() - timedelta(days=days - 1)).isoformat()
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT * FROM llm_usage_daily WHERE day >= ? ORDER BY day, feature, model", (since,)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,174 @@
+from collections import defaultdict
+
+# Canonical merchant name -> aliases (lowercase, as users type them or as
+# they appear on receipts). The canonical name is what gets stored, so all
+# spellings of one merchant aggregate under the same key.
+MERCHANTS = {
+    # Makanan & minuman
+    "Starbucks": ["starbucks", "sbux", "starbuck"],
+    "Kopi Kenangan": ["kopi kenangan", "kenangan"],
+    "Janji Jiwa": ["janji jiwa", "kopi janji jiwa"],
+    "Fore Coffee": ["fore coffee", "fore"],
+    "Mixue": ["mixue"],
+    "McDonalds": ["mcdonalds", "mcdonald", "mcd", "mekdi"],
+    "KFC": ["kfc"],
+    "Burger King": ["burger king"],
+    "Pizza Hut": ["pizza hut"],
+    "Solaria": ["solaria"],
+    "Warteg Bahari": ["warteg bahari"],
+    "GoFood": ["gofood"],
+    "GrabFood": ["grabfood"],
+    "ShopeeFood": ["shopeefood"],
+    # Transportasi
+    "Gojek": ["gojek", "goride", "gocar"],
+    "Grab": ["grab", "grabbike", "grabcar"],
+    "Maxim": ["maxim"],
+    "Bluebird": ["bluebird", "blue bird"],
+    "Pertamina": ["pertamina", "spbu pertamina", "pertamax", "pertalite"],
+    "Shell": ["shell"],
+    "KAI": ["kai", "kai access"],
+    "Traveloka": ["traveloka"],
+    # Belanja
+    "Indomaret": ["indomaret"],
+    "Alfamart": ["alfamart", "alfamidi"],
+    "Superindo": ["superindo", "super indo"],
+    "Hypermart": ["hypermart"],
+    "Shopee": ["shopee"],
+    "Tokopedia": ["tokopedia", "tokped"],
+    "Lazada": ["lazada"],
+    "TikTok Shop": ["tiktok shop"],
+    # Tagihan
+    "PLN": ["pln", "token pln"],
+    "PDAM": ["pdam"],
+    "Indihome": ["indihome"],
+    "Biznet": ["biznet"],
+    "First Media": ["first media", "firstmedia"],
+    "Netflix": ["netflix"],
+    "Spotify": ["spotify"],
+    "Telkomsel": ["telkomsel", "tsel"],
+    "XL": ["xl", "xl axiata"],
+    "Indosat": ["indosat", "im3"],
+    "BPJS": ["bpjs"],
+    # Kesehatan
+    "Kimia Farma": ["kimia farma"],
+    "Guardian": ["guardian"],
+    # Bare "century" is also Century 21 and others: only the pharmacy's own names
+    "Apotek Century": ["apotek century", "century healthcare", "century pharmacy"],
+    "Halodoc": ["halodoc"],
+    # Lifestyle
+    "XXI": ["xxi", "cinema xxi", "cinema 21"],
+    "CGV": ["cgv"],
+    "Steam": ["steam"],
+    # Pendidikan
+    "Udemy": ["udemy"],
+    "Ruangguru": ["ruangguru", "ruang guru"],
+    "Gramedia": ["gramedia"],
+    # Investasi
+    "Bibit": ["bibit"],
+    "Ajaib": ["ajaib"],
+    "Stockbit": ["stockbit"],
+    "Pluang": ["pluang"],
+    "Pegadaian": ["pegadaian"],
+}
+
+# Aliases longer than this many words are never looked up
+_MAX_ALIAS_WORDS = 3
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b):
+    """Edits between two short words: insertions, deletions, substitutions and swaps of neighbours."""
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+class MerchantIndex:
+    def __init__(self, merchants=None, min_similarity=0.85, min_fuzzy_length=5):
+        """
+        merchants: dict of canonical name -> list of aliases (defaults to MERCHANTS).
+        Exact aliases are matched on token n-grams; single tokens that miss are
+        looked up fuzzily: a trigram index finds the candidates, and one wins
+        when the token is at least `min_similarity` like it (see _similarity).
+        """
+        self.min_similarity = min_similarity
+        self.min_fuzzy_length = min_fuzzy_length
+        self.aliases = {}
+        self.trigram_index = defaultdict(set)
+
+        for canonical, aliases in (merchants or MERCHANTS).items():
+            for alias in [canonical.lower()] + list(aliases):
+                self.aliases[alias] = canonical
+                if " " in alias:
+                    continue
+                for gram in _trigrams(alias):
+                    self.trigram_index[gram].add(alias)
+
+    def match_tokens(self, tokens):
+        """
+        Returns the canonical merchant for the first alias found in a token
+        list (longest n-gram first at each position), or None.
+        """
+        n_tokens = len(tokens)
+        for i in range(n_tokens):
+            for n in range(min(_MAX_ALIAS_WORDS, n_tokens - i), 0, -1):
+                canonical = self.aliases.get(" ".join(tokens[i:i + n]))
+                if canonical:
+                    return canonical
+        return None
+
+    def fuzzy_match(self, token):
+        """Best canonical merchant for a misspelt single token, or None."""
+        if len(token) < self.min_fuzzy_length:
+            return None
+        grams = _trigrams(token)
+        counts = defaultdict(int)
+        for gram in grams:
+            for alias in self.trigram_index.get(gram, ()):
+                counts[alias] += 1
+
+        best, best_score = None, self.min_similarity
+        for alias, shared in counts.items():
+            # Candidates share at least half of the token's trigrams
+            if 2 * shared < len(grams):
+                continue
+            score = self._similarity(token, alias)
+            if score >= best_score:
+                best, best_score = alias, score
+        return self.aliases[best] if best else None
+
+    @staticmethod
+    def _similarity(token, alias):
+        """
+        How much token looks like alias mistyped, 0-1: 1 - edits / length, so
+        one typo passes in names of 7+ letters. A token that contains the
+        alias and goes on ("forever", "shelly", "steamboat") or is cut short
+        of it ("solar", "guard") is another word: 0.
+        """
+        if alias in token or alias.startswith(token):
+            return 0.0
+        return 1 - _edit_distance(token, alias) / max(len(token), len(alias))
+
+    def canonicalize(self, name):
+        """
+        Maps a free-form merchant name (e.g. from a receipt) to its canonical
+        form. "Starbucks Coffee Grand Indonesia" -> "Starbucks". Unknown names
+        are returned unchanged.
+        """
+        tokens = name.lower().split()
+        canonical = self.match_tokens(tokens)
+        if canonical:
+            return canonical
+        for token in tokens:
+            canonical = self.fuzzy_match(token)
+            if canonical:
+                return canonical
+        return name
@@ -1,18 +1,201 @@
 import re
+import time
+import random
+import string
+import asyncio
 import logging
-from config import GROQ_API_KEY
+import threading
+from collections import deque
+import numpy as np
+from config import INTENT_RACE_CONFIDENCE, INTENT_RACE_SHADOW_RATE
+from modules.merchants import MerchantIndex
+from modules.llm import create_client, create_async_client, create_breaker, complete
+from modules.circuit_breaker import CircuitOpenError
+from modules.llm_metrics import LLMMetrics
+from modules.llm_admission import AdmissionController, AdmissionRejected
+from modules.llm_cache import LLMCache
+
+# Model used for LLM intent classification
+_INTENT_MODEL = "llama-3.3-70b-versatile"
+
+# Precompiled normalization patterns (see NLPProcessor.normalize_text)
+_DECIMAL_SUFFIX_RE = re.compile(r'(\d+),(\d+)\s*(jt|mio|rb|k|ribu)')
+_MILLION_RE = re.compile(r'([\d\.]+)\s*(jt|mio|juta)')
+_THOUSAND_RE = re.compile(r'([\d\.]+)\s*(rb|k|ribu|rebu)')
+_THOUSAND_SEP_RE = re.compile(r'(\d{1,3})([,\.]\d{3})+(?!\d)')
+_NUMBER_RE = re.compile(r'(\d+[\d\.]*)')
+
+# Tokenizer for process_batch amounts: either a line break or a run of
+# digits/separators plus an optional rb/jt-style suffix. Every normalize_text
+# rule that touches a number applies inside one such chunk, so chunks can be
+# valued on their own and memoized across the batch.
+_BATCH_CHUNK_RE = re.compile(r'(?=[\n\d.])(?:\n|[\d.][\d.,]*(?:[^\S\n]*(?:jt|mio|juta|rb|k|ribu|rebu))?)')
+# Chunk shapes that can be valued without running the full normalize_text chain
+_PLAIN_SUFFIX_RE = re.compile(r'(\d+)[^\S\n]*(jt|mio|juta|rb|k|ribu|rebu)')
+_GROUPED_NUMBER_RE = re.compile(r'\d{1,3}(?:[,\.]\d{3})+')
+_SUFFIX_FACTORS = {
+    "jt": 1000000, "mio": 1000000, "juta": 1000000,
+    "rb": 1000, "k": 1000, "ribu": 1000, "rebu": 1000
+}
+# Standalone amount as typed in commands and edit replies: "50000", "50rb",
+# "1,5jt", "Rp 1.250.000", "310.000,00". See parse_amount.
+_AMOUNT_RE = re.compile(r'(?:rp\.?\s*)?(\d[\d.,]*)\s*(jt|mio|juta|rb|k|ribu|rebu)?(?:\s*rupiah)?')
+_DECIMAL_AMOUNT_RE = re.compile(r'(\d{1,3}(?:[,\.]\d{3})+|\d+)[,\.](\d{1,2})')
+# Item separators for multi-item messages ("kopi 20rb, parkir 5rb"). Commas
+# between digits are decimal/thousand separators ("1,5jt", "100,000"), not items.
+_ITEM_SPLIT_RE = re.compile(r'\s*(?:\n|;|&|(?<!\d),|,(?!\d)|\s\+\s)\s*', re.IGNORECASE)
+# "dan" only separates items when both sides carry an amount ("kopi 20rb dan
+# parkir 5rb"); in "makan dan minum 50rb" it is part of one description.
+_DAN_SPLIT_RE = re.compile(r'\s*\bdan\b\s*', re.IGNORECASE)
+_GREETING_WORDS = ["halo", "hi", "hai", "p", "siang", "pagi", "malam", "u", "uii", "ui", "oey", "halo", "apa kabar", "gimana", "sehat", "baik"]
+# Greeting keywords inside longer messages ("gimana cara hemat ...") are weak evidence
+_RACE_GREETING_MAX_WORDS = 4
+# Line marker used when process_batch flattens a batch into one token stream
+_LINE_SENTINEL = "\0"
+_SENTINEL_CODE = 127
+
+# Words that never belong to a merchant name (verbs, prepositions, fillers)
+_MERCHANT_STOPWORDS = (
+    "beli", "bayar", "untuk", "ke", "di", "makan", "minum", "transaksi", "transfer",
+    "ngopi", "buat", "pembayaran", "tagihan", "biaya", "topup", "saldo", "isi", "pemasukan",
+    "gaji", "bonus", "duit", "uang", "bensin", "kopi", "sarapan", "lunch", "dinner",
+    "rp", "rupiah", "qris", "via", "lewat", "pakai", "tadi", "barusan", "habis", "ya"
+)
+# One-pass merchant tokenizer: amounts ("48rb", "Rp15.000") match without a
+# group and are dropped, stopwords land in group 1, other words in group 2.
+# Letter-only lookarounds let "rp15000" split into a stopword and an amount.
+_MERCHANT_TOKEN_RE = re.compile(
+    r'\d[\d.,]*(?:\s*(?:jt|mio|juta|rb|k|ribu|rebu)(?![^\W\d_]))?'
+    r'|(?<![^\W\d_])(' + '|'.join(_MERCHANT_STOPWORDS) + r')(?![^\W\d_])'
+    r'|([^\W\d_]+)'
+)
+
+
+def _strip_thousand_sep(match):
+    return match.group(0).replace(',', '').replace('.', '')
+
+
+def _newline_positions(text):
+    """Character offsets of every newline in text, as a sorted int array."""
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    return np.flatnonzero(codepoints == 10)
+
+
+def parse_amount(text):
+    """
+    Parses a single amount the way users type it: "50000", "50rb", "25 k",
+    "1,5jt", "Rp 1.250.000", "310.000,00".
+    Raises ValueError if text is not an amount.
+    """
+    text = text.strip().lower()
+    # Fast paths: plain digits ("50000") and digits with a suffix ("50rb")
+    if text.isascii():
+        if text.isdigit():
+            return float(text)
+        number = text.rstrip(string.ascii_lowercase)
+        if number.isdigit() and text[len(number):] in _SUFFIX_FACTORS:
+            return float(number) * _SUFFIX_FACTORS[text[len(number):]]
+
+    match = _AMOUNT_RE.fullmatch(text)
+    if not match:
+        raise ValueError(f"Invalid amount: {text!r}")
+    number, suffix = match.groups()
+
+    factor = _SUFFIX_FACTORS[suffix] if suffix else 1
+    if number.isdigit():
+        return float(number) * factor
+    if suffix and number.count('.') + number.count(',') == 1:
+        # "1,5jt" / "1.5jt": the separator is a decimal point, as in normalize_text
+        value = float(number.replace(',', '.'))
+    elif _GROUPED_NUMBER_RE.fullmatch(number):
+        return float(number.replace(',', '').replace('.', '')) * factor
+    else:
+        decimal = _DECIMAL_AMOUNT_RE.fullmatch(number)
+        if not decimal:
+            raise ValueError(f"Invalid amount: {text!r}")
+        value = float(decimal.group(1).replace(',', '').replace('.', '') + '.' + decimal.group(2))
+    # Round away float noise such as 1.1 * 1000000 = 1100000.0000000002
+    return round(value * factor, 2)
+
+
+class _MemoTable(dict):
+    """Dict that computes and stores missing keys, so map(table.__getitem__, ...) stays in C."""
+
+    def __init__(self, compute):
+        super().__init__()
+        self.compute = compute
+
+    def __missing__(self, key):
+        value = self[key] = self.compute(key)
+        return value
+
+
+class IntentRaceStats:
+    def __init__(self, window=1000):
+        """
+        Outcomes of classify_intent_async: how often each path answered, its
+        latency distribution (last `window` calls per outcome) and how often
+        the rule ladder and the LLM agreed when both answers were seen.
+        """
+        self.window = window
+        self.counts = {}
+        self.latencies = {}
+        self.compared = 0
+        self.agreed = 0
+        self.disagreements = {}
+        # metrics() is read from the health server thread
+        self.lock = threading.Lock()
+
+    def record(self, outcome, latency):
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            self.latencies.setdefault(outcome, deque(maxlen=self.window)).append(latency)
+
+    def record_agreement(self, local_intent, llm_intent):
+        with self.lock:
+            self.compared += 1
+            if local_intent == llm_intent:
+                self.agreed += 1
+            else:
+                pair = f"{local_intent}->{llm_intent}"
+                self.disagreements[pair] = self.disagreements.get(pair, 0) + 1
+
+    def metrics(self):
+        with self.lock:
+            latencies = {outcome: list(values) for outcome, values in self.latencies.items()}
+            counts, compared, agreed = dict(self.counts), self.compared, self.agreed
+            disagreements = dict(self.disagreements)
+        latency_ms = {}
+        for outcome, values in latencies.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            latency_ms[outcome] = {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+        return {
+            "counts": counts,
+            "latency_ms": latency_ms,
+            "compared": compared,
+            "agreement_rate": agreed / compared if compared else None,
+            "disagreements": disagreements,
+        }
+
 
 class NLPProcessor:
-    def __init__(self):
+    def __init__(self, cache=None, breaker=None, metrics=None, admission=None):
         # Initialize Groq
-        self.groq_enabled = False
-        try:
-            from groq import Groq
-            self.client = Groq(api_key=GROQ_API_KEY)
-            self.groq_enabled = True
-        except Exception as e:
-            logging.error(f"Groq initialization failed: {e}")
-            self.client = None
+        self.client = create_client()
+        self.groq_enabled = self.client is not None
+        self.async_client = create_async_client()
+        # LLM intent answers are cached (shared with AIEngine in core.py)
+        self.cache = cache if cache is not None else LLMCache()
+        # Shared with AIEngine in core.py; while open, classification stays rule-based
+        self.breaker = breaker if breaker is not None else create_breaker()
+        # Shared with AIEngine in core.py; LLM usage per feature
+        self.metrics = metrics if metrics is not None else LLMMetrics()
+        # Shared with AIEngine in core.py; intent calls rank below parsing for quota and slots
+        self.admission = admission if admission is not None else AdmissionController()
+        self.race_confidence = INTENT_RACE_CONFIDENCE
+        self.race_shadow_rate = INTENT_RACE_SHADOW_RATE
+        self.race_stats = IntentRaceStats()
+        self._shadow_tasks = set()
 
         # Keywords for categorization - User-centric mapping
         self.category_keywords = {
@@ -54,6 +237,12 @@ class NLPProcessor:
             "Gaji": ["gaji", "salary", "bonus", "transfer masuk", "income", "payroll", "pemasukan", "cashback", "refund", "jual"]
         }
 
+        # Lazily built keyword lookup tables for process_batch
+        self._batch_category_tables = None
+
+        # Known merchants, used to canonicalise extracted names
+        self.merchants = MerchantIndex()
+
     def process_text(self, text):
         """
         New minimalist processor for bot.py
@@ -67,6 +256,200 @@ class NLPProcessor:
         
         return amount, category, type_
 
+    def process_batch(self, lines):
+        """
+        Bulk version of process_text for pasted mutation statements or forwarded
+        notification backlogs: about 7.5x faster than calling process_text in a
+        loop (20k corpus lines, see benchmarks/nlp_bench.py).
+
+        Each line gets the amount, category and type process_text gives it,
+        except when numbers touch ("50rb3 jt"): process_text's normalize_text
+        glues them into one number (500003000000), while here every number is
+        its own chunk and the last one wins (3000000), as for "50rb 3jt".
+
+        Lines are lowercased once as a newline-joined blob. Categories are
+        resolved per whitespace token and amounts per number chunk, each through
+        a memo table shared by the whole batch, so repeated words and amounts
+        are only ever classified once.
+        Returns columnar results ready for a bulk insert:
+            {"amounts": float64 array, "category_codes": int8 array,
+             "types": str array, "categories": tuple of category names}
+        where categories[category_codes[i]] is the category of lines[i].
+        """
+        categories = self.batch_categories
+        n = len(lines)
+        amounts = np.zeros(n, dtype=np.float64)
+        if n == 0:
+            return {
+                "amounts": amounts,
+                "category_codes": np.zeros(0, dtype=np.int8),
+                "types": np.zeros(0, dtype='<U7'),
+                "categories": categories
+            }
+
+        blob = "\n".join(line.replace("\n", " ") if "\n" in line else line for line in lines).lower()
+
+        # 1. Categories: the lowest category index among a line's tokens, which is
+        # what _detect_category's "first category with any keyword" resolves to.
+        # The whole batch is one token stream with a sentinel after every line.
+        token_code, phrases, token_breaks = self._get_batch_category_tables()
+        default_code = len(categories) - 1
+        token_codes = _MemoTable(token_code)
+        token_codes[_LINE_SENTINEL] = _SENTINEL_CODE
+        tokens = (blob + "\n").translate(token_breaks).replace("\n", f" {_LINE_SENTINEL} ").split()
+        flat = np.fromiter(map(token_codes.__getitem__, tokens), dtype=np.int8, count=len(tokens))
+        ends = np.flatnonzero(flat == _SENTINEL_CODE)
+        flat[ends] = default_code
+        codes = np.minimum.reduceat(flat, np.concatenate(([0], ends[:-1] + 1)))
+
+        # Keywords containing a space can't be seen token by token
+        newlines = None
+        for phrase, code in phrases:
+            starts = []
+            pos = blob.find(phrase)
+            while pos != -1:
+                starts.append(pos)
+                pos = blob.find(phrase, pos + 1)
+            if starts:
+                if newlines is None:
+                    newlines = _newline_positions(blob)
+                line_idx = np.searchsorted(newlines, starts)
+                codes[line_idx] = np.minimum(codes[line_idx], code)
+
+        # 2. Amounts: the last chunk holding a number >= 100, like _extract_amount
+        chunk_values = _MemoTable(self._chunk_amount)
+        chunk_values["\n"] = -1.0
+        values = np.fromiter(map(chunk_values.__getitem__, _BATCH_CHUNK_RE.findall(blob)), dtype=np.float64)
+        line_idx = np.cumsum(values < 0)
+        found = values > 0
+        line_idx, values = line_idx[found], values[found]
+        if values.size:
+            last = np.append(line_idx[1:] != line_idx[:-1], True)
+            amounts[line_idx[last]] = values[last]
+
+        income_code = categories.index("Gaji")
+        types = np.where(codes == income_code, 'income', 'expense')
+
+        return {
+            "amounts": amounts,
+            "category_codes": codes,
+            "types": types,
+            "categories": categories
+        }
+
+    def split_items(self, text):
+        """
+        Splits a message that logs several purchases into separate items.
+        Example: "kopi 20rb, parkir 5rb" -> [
+            {"amount": 20000, "category": "Makanan", "type": "expense", "description": "kopi 20rb"},
+            {"amount": 5000, "category": "Transportasi", "type": "expense", "description": "parkir 5rb"}
+        ]
+        "dan" splits items only when both sides carry an amount, so
+        "makan dan minum 50rb" stays one item. Other fragments without an amount
+        are kept as part of the neighbouring item's description.
+        """
+        pieces = []
+        for chunk in _ITEM_SPLIT_RE.split(text.strip()):
+            if chunk:
+                pieces.extend(self._split_on_dan(chunk))
+        if not pieces:
+            return []
+
+        result = self.process_batch(pieces)
+        categories = result["categories"]
+        items = []
+        carry = []
+        for i, piece in enumerate(pieces):
+            amount = float(result["amounts"][i])
+            if amount <= 0:
+                carry.append(piece)
+                continue
+            category = categories[result["category_codes"][i]]
+            if carry:
+                # "makan dan minum 50rb": the leading words describe this item too
+                piece = " ".join(carry + [piece])
+                category = self._detect_category(piece)
+            items.append({
+                "amount": amount,
+                "category": category,
+                "type": 'income' if category == 'Gaji' else 'expense',
+                "description": piece
+            })
+            carry = []
+        if carry and items:
+            items[-1]["description"] = " ".join([items[-1]["description"]] + carry)
+        return items
+
+    def _split_on_dan(self, chunk):
+        """Splits a chunk on "dan" where the words on both sides have an amount."""
+        parts = [p for p in _DAN_SPLIT_RE.split(chunk) if p]
+        if len(parts) < 2:
+            return [chunk]
+        amounts = self.process_batch(parts)["amounts"]
+        merged = [parts[0]]
+        has_amount = amounts[0] > 0
+        for part, amount in zip(parts[1:], amounts[1:]):
+            if has_amount and amount > 0:
+                merged.append(part)
+            else:
+                merged[-1] = f"{merged[-1]} dan {part}"
+                has_amount = has_amount or amount > 0
+        return merged
+
+    @property
+    def batch_categories(self):
+        """Category names indexed by the codes returned from process_batch."""
+        return tuple(self.category_keywords) + ("Lain-lain",)
+
+    def _get_batch_category_tables(self):
+        """
+        Returns (token -> category code function, [(phrase, code), ...],
+        tokenizer translate table) built from category_keywords. Rebuilt if the
+        keyword mapping is swapped out.
+        """
+        if self._batch_category_tables is None or self._batch_category_tables[0] is not self.category_keywords:
+            groups = []
+            phrases = []
+            for code, keywords in enumerate(self.category_keywords.values()):
+                words = [re.escape(kw) for kw in keywords if ' ' not in kw]
+                phrases.extend((kw, code) for kw in keywords if ' ' in kw)
+                # An unmatchable group keeps group numbers aligned with category codes
+                groups.append(f"({'|'.join(words) or '(?!)'})")
+            # Zero-width lookahead reports a match at every position where any
+            # keyword starts; alternatives are in category order, so lastindex
+            # is the lowest category whose keyword starts there.
+            keyword_re = re.compile(f"(?=(?:{'|'.join(groups)}))")
+            default_code = len(self.category_keywords)
+
+            # Digits and punctuation never occur inside a keyword, so blanking them
+            # lets '50rb,' and '75rb' share the token 'rb'
+            keyword_chars = set(''.join(kw for keywords in self.category_keywords.values() for kw in keywords))
+            token_breaks = {ch: ' ' for ch in string.digits + string.punctuation + _LINE_SENTINEL
+                            if ch not in keyword_chars}
+
+            def token_code(token):
+                return min((m.lastindex - 1 for m in keyword_re.finditer(token)), default=default_code)
+
+            self._batch_category_tables = (self.category_keywords, token_code, phrases, str.maketrans(token_breaks))
+        return self._batch_category_tables[1:]
+
+    def _chunk_amount(self, chunk):
+        if chunk.isdigit():
+            val = float(chunk)
+        elif (m := _PLAIN_SUFFIX_RE.fullmatch(chunk)):
+            val = float(int(m.group(1)) * _SUFFIX_FACTORS[m.group(2)])
+        elif _GROUPED_NUMBER_RE.fullmatch(chunk):
+            val = float(chunk.replace(',', '').replace('.', ''))
+        else:
+            val = None
+        if val is not None:
+            return val if val >= 100 else 0.0
+        try:
+            return self._extract_amount(chunk)
+        except ValueError:
+            # e.g. '1.2.3jt' - skip the chunk instead of failing the whole batch
+            return 0.0
+
     def parse_message(self, text):
         """
         Parses text to extract amount, category, and intent.
@@ -113,20 +496,20 @@ class NLPProcessor:
         
         # 1. Standardize separators: change comma to dot for decimal parsing
         # But only if it looks like a decimal (e.g., 1,5jt or 1.5jt)
-        text = re.sub(r'(\d+),(\d+)\s*(jt|mio|rb|k|ribu)', r'\1.\2\3', text)
+        text = _DECIMAL_SUFFIX_RE.sub(r'\1.\2\3', text)
         
         # 2. Normalize Million (jt/mio -> 000000)
-        text = re.sub(r'([\d\.]+)\s*(jt|mio|juta)', lambda m: str(int(float(m.group(1)) * 1000000)), text)
+        text = _MILLION_RE.sub(lambda m: str(round(float(m.group(1)) * 1000000)), text)
         
         # 3. Normalize Thousand (rb/k -> 000)
-        text = re.sub(r'([\d\.]+)\s*(rb|k|ribu|rebu)', lambda m: str(int(float(m.group(1)) * 1000)), text)
+        text = _THOUSAND_RE.sub(lambda m: str(round(float(m.group(1)) * 1000)), text)
         
         # 4. Clean common Indonesian currency prefix and trailing zeros/separators
         text = text.replace('rp', '').replace('rupiah', '')
         
         # 5. Handle cases like 100,000 or 100.000 (treat as 100000)
         # If it matches \d{1,3}([,.]\d{3})+ it's likely a thousand separator
-        text = re.sub(r'(\d{1,3})([,\.]\d{3})+(?!\d)', lambda m: m.group(0).replace(',', '').replace('.', ''), text)
+        text = _THOUSAND_SEP_RE.sub(_strip_thousand_sep, text)
         
         return text
 
@@ -136,7 +519,78 @@ class NLPProcessor:
         Returns: {"intent": "...", "confidence": 0.0-1.0}
         """
         normalized_text = self.normalize_text(text)
-        
+        result = self._rule_intent(normalized_text, state)
+        if result["intent"] != "UNKNOWN":
+            return result
+
+        # 6. LLM Fallback (Groq) for complex queries
+        if self.groq_enabled:
+            llm_intent = self._llm_classify_intent(text)
+            # Only accept LLM intent if confidence is high, otherwise fallback to UNKNOWN
+            if llm_intent and llm_intent.get('confidence', 0) >= 0.7:
+                return llm_intent
+
+        return result
+
+    async def classify_intent_async(self, text, state="IDLE", deadline=None, user_id=None):
+        """
+        Async classify_intent. The rule ladder answers first; only when its
+        answer is below race_confidence is the LLM asked, within `deadline`.
+        Confident rule answers never make an LLM request (see shadow_intent
+        for opt-in sampling). Outcomes, latencies and agreement go to
+        self.race_stats. The LLM call is charged to user_id's quota; over
+        quota the rules answer alone.
+        """
+        start = time.perf_counter()
+        normalized_text = self.normalize_text(text)
+        local = self._rule_intent(normalized_text, state)
+        if not self.async_client:
+            self.race_stats.record("rules", time.perf_counter() - start)
+            return local
+
+        if self._race_confidence(normalized_text, local) >= self.race_confidence:
+            if self.race_shadow_rate and random.random() < self.race_shadow_rate:
+                self.shadow_intent(text, local)
+            self.race_stats.record("local", time.perf_counter() - start)
+            return local
+
+        llm_intent = await self._llm_classify_intent_async(text, deadline=deadline, user_id=user_id)
+        if llm_intent:
+            self.race_stats.record_agreement(local["intent"], llm_intent.get("intent"))
+        if llm_intent and llm_intent.get('confidence', 0) >= 0.7:
+            self.race_stats.record("llm", time.perf_counter() - start)
+            return llm_intent
+        self.race_stats.record("fallback", time.perf_counter() - start)
+        return local
+
+    def shadow_intent(self, text, local):
+        """
+        Asks the LLM in the background about a message the rules already
+        answered with `local`, only to record agreement in race_stats. Not
+        charged to any user; classify_intent_async calls it for a
+        race_shadow_rate share of confident rule answers (0 by default).
+        """
+        task = asyncio.create_task(self._llm_classify_intent_async(text))
+        self._shadow_tasks.add(task)
+        task.add_done_callback(lambda done: self._finish_shadow(done, local))
+        return task
+
+    def _race_confidence(self, normalized_text, local):
+        """Rule confidence as the race sees it: greeting keywords in long messages are discounted."""
+        if local["intent"] == "GREETING" and len(normalized_text.split()) > _RACE_GREETING_MAX_WORDS:
+            return 0.6
+        return local["confidence"]
+
+    def _finish_shadow(self, task, local):
+        self._shadow_tasks.discard(task)
+        if task.cancelled() or task.exception() is not None:
+            return
+        llm_intent = task.result()
+        if llm_intent:
+            self.race_stats.record_agreement(local["intent"], llm_intent.get("intent"))
+
+    def _rule_intent(self, normalized_text, state="IDLE"):
+        """The regex/keyword ladder of classify_intent, without the LLM fallback."""
         # Handle EDIT states strictly
         if state.startswith("WAITING_EDIT"):
             if any(kw in normalized_text for kw in ["batal", "cancel", "gak jadi", "stop", "abaikan"]):
@@ -149,7 +603,7 @@ class NLPProcessor:
             return {"intent": "ADD_TRANSACTION", "confidence": 0.95}
 
         # 2. Check for Budget Query
-        if any(kw in normalized_text for kw in ["sisa", "budget", "anggaran", "limit", "kuota"]):
+        if any(kw in normalized_text for kw in ["sisa", "budget", "anggaran", "limit", "kuota", "total pengeluaran"]):
             return {"intent": "CHECK_BUDGET", "confidence": 0.9}
 
         # 3. Check for Report/Summary
@@ -161,52 +615,98 @@ class NLPProcessor:
             return {"intent": "HELP", "confidence": 1.0}
 
         # 5. Check for Greetings and Social Chat
-        if any(re.search(rf'\b{re.escape(kw)}\b', normalized_text) for kw in ["halo", "hi", "hai", "p", "siang", "pagi", "malam", "u", "uii", "ui", "oey", "halo", "apa kabar", "gimana", "sehat", "baik"]):
+        if any(re.search(rf'\b{re.escape(kw)}\b', normalized_text) for kw in _GREETING_WORDS):
             return {"intent": "GREETING", "confidence": 1.0}
 
-        # 6. LLM Fallback (Groq) for complex queries
-        if self.groq_enabled:
-            llm_intent = self._llm_classify_intent(text)
-            # Only accept LLM intent if confidence is high, otherwise fallback to UNKNOWN
-            if llm_intent and llm_intent.get('confidence', 0) >= 0.7:
-                return llm_intent
-
         return {"intent": "UNKNOWN", "confidence": 0.0}
 
     def _llm_classify_intent(self, text):
         """
         Uses Groq LLM to classify intent when regex fails.
         """
-        try:
-            prompt = f"""
-            Classify the intent of this financial bot user message: "{text}"
-            
-            Allowed intents:
-            - ADD_TRANSACTION: User wants to record an expense or income (e.g., "beli cilok", "tadi makan 20k")
-            - CHECK_BUDGET: User asks about remaining budget or limits (e.g., "sisa budget", "berapa limitku")
-            - QUERY_SUMMARY: User EXPLICITLY wants to see reports, stats, or rekap (e.g., "liat laporan", "rekap bulan ini")
-            - HELP: User needs assistance or command list
-            - GREETING: Casual talk, greetings, or existential/social questions (e.g., "apa kabar", "kamu siapa", "baik2 saja")
-            - UNKNOWN: Anything else
-            
-            CRITICAL: If the message is just a social question or greeting, return GREETING. 
-            Do NOT return QUERY_SUMMARY unless the user specifically asks for a report or summary.
-            
-            Return ONLY a JSON with "intent" and "confidence" (0.0-1.0).
-            Example: {{"intent": "GREETING", "confidence": 0.95}}
-            """
-            
-            chat_completion = self.client.chat.completions.create(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
-                response_format={"type": "json_object"}
-            )
-            import json
-            result = json.loads(chat_completion.choices[0].message.content)
-            return result
-        except Exception as e:
-            logging.error(f"Groq LLM classification failed: {e}")
+        with self.metrics.track("intent", _INTENT_MODEL) as call:
+            key = self.cache.make_key(_INTENT_MODEL, "intent", text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+            if not self.breaker.allow():
+                call.outcome = "circuit_open"
+                return None
+            try:
+                prompt = self._intent_prompt(text)
+                start = time.perf_counter()
+
+                try:
+                    chat_completion = self.client.chat.completions.create(
+                        messages=[{"role": "user", "content": prompt}],
+                        model=_INTENT_MODEL,
+                        response_format={"type": "json_object"},
+                        timeout=self.breaker.latency_budget
+                    )
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                self.breaker.record_success(time.perf_counter() - start)
+                call.succeeded(chat_completion)
+                import json
+                result = json.loads(chat_completion.choices[0].message.content)
+                self.cache.set(key, result, time.perf_counter() - start)
+                return result
+            except Exception as e:
+                logging.error(f"Groq LLM classification failed: {e}")
+                call.failed(e)
+                return None
+
+    async def _llm_classify_intent_async(self, text, deadline=None, user_id=None):
+        """
+        Async _llm_classify_intent with a deadline; returns None on failure or timeout.
+        """
+        if not self.async_client:
             return None
+        with self.metrics.track("intent", _INTENT_MODEL) as call:
+            key = self.cache.make_key(_INTENT_MODEL, "intent", text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+            try:
+                start = time.perf_counter()
+                async with self.admission.admit(user_id, "intent", call=call):
+                    chat_completion = await complete(
+                        self.async_client, [{"role": "user", "content": self._intent_prompt(text)}],
+                        _INTENT_MODEL, deadline=deadline, retries=1, breaker=self.breaker, call=call,
+                        response_format={"type": "json_object"}
+                    )
+                import json
+                result = json.loads(chat_completion.choices[0].message.content)
+                self.cache.set(key, result, time.perf_counter() - start)
+                return result
+            except (CircuitOpenError, AdmissionRejected):
+                return None
+            except Exception as e:
+                logging.error(f"Groq LLM classification failed: {e!r}")
+                call.failed(e)
+                return None
+
+    def _intent_prompt(self, text):
+        return f"""
+        Classify the intent of this financial bot user message: "{text}"
+        
+        Allowed intents:
+        - ADD_TRANSACTION: User wants to record an expense or income (e.g., "beli cilok", "tadi makan 20k")
+        - CHECK_BUDGET: User asks about remaining budget or limits (e.g., "sisa budget", "berapa limitku")
+        - QUERY_SUMMARY: User EXPLICITLY wants to see reports, stats, or rekap (e.g., "liat laporan", "rekap bulan ini")
+        - HELP: User needs assistance or command list
+        - GREETING: Casual talk, greetings, or existential/social questions (e.g., "apa kabar", "kamu siapa", "baik2 saja")
+        - UNKNOWN: Anything else
+        
+        CRITICAL: If the message is just a social question or greeting, return GREETING. 
+        Do NOT return QUERY_SUMMARY unless the user specifically asks for a report or summary.
+        
+        Return ONLY a JSON with "intent" and "confidence" (0.0-1.0).
+        Example: {{"intent": "GREETING", "confidence": 0.95}}
+        """
 
     def extract_transaction_data(self, text):
         """
@@ -274,7 +774,7 @@ class NLPProcessor:
         normalized = self.normalize_text(text)
         
         # 2. Look for numbers (including those with dots like 2.000.000)
-        match_num = re.findall(r'(\d+[\d\.]*)', normalized)
+        match_num = _NUMBER_RE.findall(normalized)
         if match_num:
             for num in reversed(match_num):
                 cleaned = num.replace('.', '')
@@ -296,24 +796,23 @@ class NLPProcessor:
     def extract_merchant(self, text):
         """
         Tries to extract merchant name from text.
-        Example: "mixue 48rb" -> Mixue
+        Example: "mixue 48rb" -> Mixue, "ngopi di strabucks" -> Starbucks
+        Known merchants come back in their canonical form; anything else is
+        the message minus amounts and stopwords, title-cased.
         """
-        # 1. Remove amounts and suffixes
-        clean_text = self.normalize_text(text)
-        clean_text = re.sub(r'\d+', '', clean_text)
-        
-        # 2. Remove common transaction verbs/prepositions (Stopwords)
-        stopwords = [
-            "beli", "bayar", "untuk", "ke", "di", "makan", "minum", "transaksi", "transfer", 
-            "ngopi", "buat", "pembayaran", "tagihan", "biaya", "topup", "saldo", "isi", "pemasukan",
-            "gaji", "bonus", "duit", "uang", "bensin", "kopi", "makan", "sarapan", "lunch", "dinner"
-        ]
-        for word in stopwords:
-            clean_text = re.sub(r'\b' + word + r'\b', '', clean_text.lower())
-            
-        # 3. Clean up punctuation and extra spaces
-        clean_text = re.sub(r'[^\w\s]', ' ', clean_text)
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-        
-        merchant = clean_text.title()
+        tokens = _MERCHANT_TOKEN_RE.findall(text.lower())
+
+        # 1. Exact alias match over all words (aliases may contain stopwords, e.g. "kopi kenangan")
+        merchant = self.merchants.match_tokens([stop or word for stop, word in tokens if stop or word])
+        if merchant:
+            return merchant
+
+        # 2. Fuzzy match of the remaining words against the merchant dictionary
+        words = [word for _, word in tokens if word]
+        for word in words:
+            merchant = self.merchants.fuzzy_match(word)
+            if merchant:
+                return merchant
+
+        merchant = " ".join(words).title()
         return merchant if merchant else "Transaksi"
@@ -1,123 +1,134 @@
-import re
 import os
 import gc
+import time
+from modules.ocr_backends import make_backend
+from modules.ocr_preprocess import ReceiptPreprocessor
+from modules.receipt_parser import clean_amount, parse_receipt
+from config import OCR_TOTAL_REGION
+
+
+def _center_y(box):
+    """Vertical centre of an EasyOCR detection: [x_min, x_max, y_min, y_max] or four [x, y] corners."""
+    if hasattr(box[0], "__len__"):
+        return sum(point[1] for point in box) / len(box)
+    return (box[2] + box[3]) / 2
+
+
+def _recognize(reader, image, horizontal, free):
+    """EasyOCR recognition of just the given detected boxes."""
+    if not horizontal and not free:
+        return []
+    return reader.recognize(image, horizontal_list=horizontal, free_list=free)
+
 
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, preprocessor=None, backend=None):
         self.enabled = True
         self._reader = None
+        # ms the last model load took, None before the first
+        self.load_ms = None
+        self.preprocessor = preprocessor if preprocessor is not None else ReceiptPreprocessor()
+        # The OCRBackend (modules/ocr_backends.py) that reads the text: OCR_BACKEND by default
+        self.backend = backend if backend is not None else make_backend()
 
     @property
     def reader(self):
         """Lazy load the reader to save memory on startup"""
         if self._reader is None and self.enabled:
             try:
-                import easyocr
-                # Disable downloading inside the instance to prevent OOM
-                # We pre-downloaded models in Dockerfile
-                self._reader = easyocr.Reader(['id', 'en'], gpu=False, download_enabled=False)
-                print("OCR Reader initialized (CPU mode)")
+                start = time.perf_counter()
+                self.backend.load()
+                self.load_ms = (time.perf_counter() - start) * 1000
+                self._reader = self.backend
             except Exception as e:
                 print(f"OCR Reader Warning: {e}")
                 self._reader = None
         return self._reader
 
-    def process_receipt(self, image_path):
+    @property
+    def loaded(self):
+        return self._reader is not None
+
+    def unload(self):
+        """Drops the model so its memory can be freed; the next receipt loads it again."""
+        if self._reader is not None:
+            self.backend.unload()
+            self._reader = None
+            gc.collect()
+
+    def process_receipt(self, image, staged=False):
+        """
+        Reads a receipt given as photo bytes, an ndarray or a file path.
+        Photos and arrays go through the preprocessor first; paths are read
+        by the backend as they are. The result's "timings" holds the ms each
+        preprocessing step, the OCR itself and parsing its text took.
+
+        staged=True only recognises what the total needs (see _read_staged):
+        when the total is found that way the result has "partial": True and
+        no merchant or date; read the receipt again unstaged for those.
+        Backends without separate detection (Tesseract, the cascade) always
+        read the whole receipt.
+        """
         reader = self.reader
         if not reader:
             return None
-        
-        try:
-            results = reader.readtext(image_path)
-            full_text = " ".join([res[1] for res in results])
-            
-            # 1. Extract Merchant Name (Usually the first few lines)
-            merchant = "Transaksi"
-            if len(results) > 0:
-                merchant = results[0][1].strip()
-                # Simple heuristic: if merchant looks like common noise, skip
-                if merchant.lower() in ["alamat", "telp", "tgl", "cashier", "nomor", "no:"]:
-                    merchant = "Transaksi"
-
-            # 2. Extract Amount
-            amount_patterns = [
-                r'(?:total|bayar|jumlah|amount|grand total|nett|total bayar|harga)[^\d]*([\d\.,]+)',
-                r'[\d\.,]+'
-            ]
-            
-            total_matches = re.findall(amount_patterns[0], full_text.lower())
-            amount = 0.0
-            if total_matches:
-                amount = self._clean_amount(total_matches[-1])
-                
-            if amount <= 100:
-                all_numbers = re.findall(r'(\d+[\d\.,]*)', full_text)
-                cleaned_numbers = []
-                for num in all_numbers:
-                    val = self._clean_amount(num)
-                    if val > 100:
-                        cleaned_numbers.append(val)
-                
-                if cleaned_numbers:
-                    amount = max(cleaned_numbers)
-                    
-            # 3. Extract Date
-            date_match = re.search(r'(\d{2}[/-]\d{2}[/-]\d{4})|(\d{4}[/-]\d{2}[/-]\d{2})', full_text)
-            date_str = None
-            if date_match:
-                date_str = date_match.group(0)
-
-            return {
-                "amount": amount,
-                "merchant": merchant,
-                "date": date_str
-            }
-        finally:
-            # Clean up after processing
-            gc.collect()
+
+        timings = {}
+        if not isinstance(image, (str, os.PathLike)):
+            image, timings = self.preprocessor.run(image)
+        if staged and getattr(reader, "staged", True):
+            return self._read_staged(reader, image, timings)
+        start = time.perf_counter()
+        results = reader.readtext(image)
+        timings["ocr"] = (time.perf_counter() - start) * 1000
+        return self._parse_timed(results, timings)
+
+    def _read_staged(self, reader, image, timings):
+        """
+        Detects every text box (cheap next to recognition), then recognises
+        only the boxes in the bottom OCR_TOTAL_REGION of the receipt, where
+        the total is printed. A total label found there ends the read early.
+        Otherwise the remaining boxes are recognised as well and the receipt
+        is parsed as a full read.
+        """
+        start = time.perf_counter()
+        horizontal, free = reader.detect(image)
+        horizontal, free = horizontal[0], free[0]
+        timings["detect"] = (time.perf_counter() - start) * 1000
+
+        centers = [_center_y(box) for box in horizontal + free]
+        cut = max(centers) - OCR_TOTAL_REGION * (max(centers) - min(centers)) if centers else 0
+        bottom = ([b for b in horizontal if _center_y(b) >= cut], [b for b in free if _center_y(b) >= cut])
+        top = ([b for b in horizontal if _center_y(b) < cut], [b for b in free if _center_y(b) < cut])
+
+        start = time.perf_counter()
+        bottom_results = _recognize(reader, image, *bottom)
+        timings["recognize"] = (time.perf_counter() - start) * 1000
+        amount = self._labelled_total(bottom_results)
+        if amount > 100:
+            timings["ocr"] = timings["detect"] + timings["recognize"]
+            return {"amount": amount, "merchant": None, "date": None, "partial": True, "timings": timings}
+
+        start = time.perf_counter()
+        results = _recognize(reader, image, *top) + bottom_results
+        timings["recognize_rest"] = (time.perf_counter() - start) * 1000
+        timings["ocr"] = timings["detect"] + timings["recognize"] + timings["recognize_rest"]
+        return self._parse_timed(results, timings)
+
+    def _labelled_total(self, results):
+        """The amount printed after a total label ("TOTAL", "JUMLAH", ...) in results; 0.0 when there is none."""
+        receipt = parse_receipt(results)
+        return receipt.total if receipt.total_label is not None else 0.0
+
+    def _parse_timed(self, results, timings):
+        start = time.perf_counter()
+        parsed = self._parse_results(results)
+        timings["parse"] = (time.perf_counter() - start) * 1000
+        return {**parsed, "timings": timings}
+
+    def _parse_results(self, results):
+        """Merchant, amount, date and line items from EasyOCR's (box, text, confidence) results."""
+        return parse_receipt(results).to_dict()
 
     def _clean_amount(self, amount_str):
-        # 1. Clean common noise but keep digits, comma and dot
-        cleaned = re.sub(r'[^\d,\.]', '', amount_str)
-        
-        # 2. Heuristic for Indonesian format (dot=thousand, comma=decimal)
-        if ',' in cleaned and '.' in cleaned:
-            # Both separators present: e.g., 1.250.000,00 or 1,250,000.00
-            if cleaned.find('.') < cleaned.find(','):
-                # dot is thousand, comma is decimal
-                val_str = cleaned.replace('.', '').replace(',', '.')
-            else:
-                # comma is thousand, dot is decimal
-                val_str = cleaned.replace(',', '')
-        elif ',' in cleaned:
-            # Only comma present
-            parts = cleaned.split(',')
-            if len(parts[-1]) == 3:
-                # Likely thousand separator: 1,250,000
-                val_str = cleaned.replace(',', '')
-            else:
-                # Likely decimal: 50,00
-                val_str = cleaned.replace(',', '.')
-        elif '.' in cleaned:
-            # Only dot present
-            parts = cleaned.split('.')
-            if len(parts[-1]) == 3:
-                # Likely thousand: 50.000
-                val_str = cleaned.replace('.', '')
-            else:
-                # Likely decimal: 50.00
-                val_str = cleaned
-        else:
-            val_str = cleaned
-
-        try:
-            return float(val_str)
-        except ValueError:
-            # Fallback: just digits, but try to handle trailing zeros if they look like decimals
-            digits_only = re.sub(r'[^\d]', '', amount_str)
-            if digits_only.endswith('00') and len(digits_only) > 4:
-                return float(digits_only[:-2])
-            try:
-                return float(digits_only)
-            except:
-                return 0.0
+        return clean_amount(amount_str)
@@ -0,0 +1,189 @@
+import os
+import csv
+import shutil
+import logging
+import subprocess
+from config import OCR_BACKEND, OCR_CASCADE_MIN_CONFIDENCE, TESSERACT_PATH, TESSERACT_LANG
+
+logger = logging.getLogger(__name__)
+
+
+class OCRBackend:
+    """
+    A text reader for OCRProcessor. readtext(image) returns EasyOCR-style
+    [(four [x, y] corners, text, confidence 0-1)] for a decoded image.
+    Backends with `staged = True` also offer EasyOCR's detect(image) and
+    recognize(image, horizontal_list=, free_list=) for two-stage reads.
+    """
+    name = "base"
+    staged = False
+
+    def load(self):
+        """Loads the model (or checks the binary); raises when the backend cannot run here."""
+
+    def unload(self):
+        """Drops the loaded model, if any; the next load() brings it back."""
+
+    def readtext(self, image):
+        raise NotImplementedError
+
+
+class EasyOCRBackend(OCRBackend):
+    """EasyOCR on CPU: the most accurate, but needs torch and about 1GB of RSS once loaded."""
+    name = "easyocr"
+    staged = True
+
+    def __init__(self, languages=("id", "en")):
+        self.languages = list(languages)
+        self.reader = None
+
+    def load(self):
+        if self.reader is None:
+            import easyocr
+            # Disable downloading inside the instance to prevent OOM
+            # We pre-downloaded models in Dockerfile
+            self.reader = easyocr.Reader(self.languages, gpu=False, download_enabled=False)
+            print("OCR Reader initialized (CPU mode)")
+
+    def unload(self):
+        self.reader = None
+
+    def readtext(self, image):
+        return self.reader.readtext(image)
+
+    def detect(self, image):
+        return self.reader.detect(image)
+
+    def recognize(self, image, horizontal_list=None, free_list=None):
+        return self.reader.recognize(image, horizontal_list=horizontal_list, free_list=free_list)
+
+
+def tesseract_results(tsv, gap=1.5):
+    """
+    EasyOCR-style results from `tesseract ... tsv` output: the words of each
+    line, split where the gap between words exceeds `gap` times the line
+    height (so a label and its right-aligned amount are separate boxes, as
+    EasyOCR returns them). Confidence is the boxes' mean word confidence / 100.
+    """
+    lines = {}
+    for row in csv.DictReader(tsv.splitlines(), delimiter="\t", quoting=csv.QUOTE_NONE):
+        text = (row.get("text") or "").strip()
+        if row.get("level") != "5" or not text or float(row["conf"]) < 0:
+            continue
+        left, top, width, height = (int(row[k]) for k in ("left", "top", "width", "height"))
+        key = (row["page_num"], row["block_num"], row["par_num"], row["line_num"])
+        lines.setdefault(key, []).append((left, top, left + width, top + height, text, float(row["conf"])))
+
+    results = []
+    for words in lines.values():
+        words.sort()
+        height = max(w[3] - w[1] for w in words)
+        segment = [words[0]]
+        for word in words[1:] + [None]:
+            if word is not None and word[0] - segment[-1][2] <= gap * height:
+                segment.append(word)
+                continue
+            x0, y0 = min(w[0] for w in segment), min(w[1] for w in segment)
+            x1, y1 = max(w[2] for w in segment), max(w[3] for w in segment)
+            text = " ".join(w[4] for w in segment)
+            confidence = sum(w[5] for w in segment) / len(segment) / 100
+            results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, confidence))
+            segment = [word]
+    return sorted(results, key=lambda r: r[0][0][1])
+
+
+class TesseractBackend(OCRBackend):
+    """
+    The Tesseract CLI (TESSERACT_PATH, else `tesseract` on PATH): a few
+    hundred ms per receipt and no model in the bot's memory, but weaker than
+    EasyOCR on blurry or curled photos.
+    """
+    name = "tesseract"
+
+    def __init__(self, path=TESSERACT_PATH, lang=TESSERACT_LANG, psm=4, timeout=30):
+        self.path = path
+        self.lang = lang
+        # 4: a single column of text of variable sizes, i.e. a receipt
+        self.psm = psm
+        self.timeout = timeout
+        self.binary = None
+
+    def load(self):
+        if self.binary is None:
+            binary = self.path if self.path and os.path.exists(self.path) else shutil.which("tesseract")
+            if binary is None:
+                raise RuntimeError(f"Tesseract not found at {self.path!r} or on PATH")
+            self.binary = binary
+
+    def readtext(self, image):
+        import cv2
+        if isinstance(image, (str, os.PathLike)):
+            image = cv2.imread(os.fspath(image))
+            if image is None:
+                raise ValueError("Receipt image could not be read")
+        ok, png = cv2.imencode(".png", image)
+        if not ok:
+            raise ValueError("Receipt image could not be encoded for Tesseract")
+        done = subprocess.run(
+            [self.binary, "stdin", "stdout", "-l", self.lang, "--psm", str(self.psm), "tsv"],
+            input=png.tobytes(), capture_output=True, timeout=self.timeout, check=True
+        )
+        return tesseract_results(done.stdout.decode("utf-8", errors="replace"))
+
+
+def mean_confidence(results):
+    """Confidence of a read: its boxes' confidence weighted by text length; 0.0 for no text."""
+    chars = sum(len(text) for _, text, _ in results)
+    return sum(conf * len(text) for _, text, conf in results) / chars if chars else 0.0
+
+
+class CascadeBackend(OCRBackend):
+    """
+    Reads with the `fast` backend and keeps the result when its mean
+    confidence reaches `min_confidence`; otherwise reads again with the
+    `accurate` one. `fallbacks` counts the second reads. If the fast backend
+    cannot load, every read goes to the accurate one.
+    """
+    name = "cascade"
+
+    def __init__(self, fast=None, accurate=None, min_confidence=OCR_CASCADE_MIN_CONFIDENCE):
+        self.fast = fast if fast is not None else TesseractBackend()
+        self.accurate = accurate if accurate is not None else EasyOCRBackend()
+        self.min_confidence = min_confidence
+        self.fast_ready = False
+        self.reads = 0
+        self.fallbacks = 0
+
+    def load(self):
+        try:
+            self.fast.load()
+            self.fast_ready = True
+        except Exception as e:
+            logger.warning(f"{self.fast.name} unavailable, cascade reads with {self.accurate.name} only: {e}")
+        # The accurate backend loads on its first fallback, so a cascade that rarely needs it stays small
+
+    def unload(self):
+        self.fast.unload()
+        self.accurate.unload()
+        self.fast_ready = False
+
+    def readtext(self, image):
+        self.reads += 1
+        if self.fast_ready:
+            results = self.fast.readtext(image)
+            if mean_confidence(results) >= self.min_confidence:
+                return results
+        self.fallbacks += 1
+        self.accurate.load()
+        return self.accurate.readtext(image)
+
+
+BACKENDS = {"easyocr": EasyOCRBackend, "tesseract": TesseractBackend, "cascade": CascadeBackend}
+
+
+def make_backend(name=OCR_BACKEND):
+    """The OCRBackend called `name` (see BACKENDS)."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown OCR backend {name!r}, expected one of: {', '.join(BACKENDS)}")
@@ -0,0 +1,382 @@
+import os
+import gc
+import time
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from config import OCR_WORKERS, OCR_MAX_QUEUE, OCR_JOB_TIMEOUT, OCR_START_METHOD, OCR_IDLE_UNLOAD, OCR_PRELOAD
+
+logger = logging.getLogger(__name__)
+
+# The OCR processor of a worker process, built once by _init_worker. With preloading it is
+# built in the bot process instead and the workers fork with it already loaded
+_processor = None
+
+
+def _load_processor(factory):
+    """A processor from factory with its model loaded, and the ms that took."""
+    start = time.perf_counter()
+    processor = factory()
+    # OCRProcessor loads EasyOCR lazily; touching the reader loads it now
+    getattr(processor, "reader", None)
+    return processor, (time.perf_counter() - start) * 1000
+
+
+def _init_worker(factory, reports=None):
+    """
+    Builds the worker's processor and loads its model before the first job
+    arrives, unless it was forked with one. Puts (pid, load ms, preloaded)
+    on `reports` for OCRPool.metrics.
+    """
+    global _processor
+    preloaded = _processor is not None
+    load_ms = 0.0
+    if not preloaded:
+        _processor, load_ms = _load_processor(factory)
+    if reports is not None:
+        reports.put((os.getpid(), load_ms, preloaded))
+
+
+def _run_job(image, options):
+    return _processor.process_receipt(image, **options)
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+def process_memory(pid):
+    """
+    RSS and PSS in MB of a process, from /proc (Linux; {} elsewhere). PSS
+    counts pages shared with other processes fractionally, so preloaded
+    workers sharing one model show it split between them.
+    """
+    fields = {}
+    for name in ("smaps_rollup", "status"):
+        try:
+            with open(f"/proc/{pid}/{name}") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in ("Rss", "Pss", "VmRSS") and value.strip().endswith("kB"):
+                        fields[key] = int(value.split()[0]) / 1024
+        except OSError:
+            continue
+        if fields:
+            break
+    rss = fields.get("Rss", fields.get("VmRSS"))
+    if rss is None:
+        return {}
+    memory = {"rss_mb": round(rss, 1)}
+    if "Pss" in fields:
+        memory["pss_mb"] = round(fields["Pss"], 1)
+    return memory
+
+
+class OCRQueueFull(Exception):
+    """Raised by OCRPool.submit when max_queue jobs are already waiting."""
+
+
+class OCRJob:
+    def __init__(self, pool, image, ticket, deadline, options=None):
+        self.pool = pool
+        self.image = image
+        self.options = options or {}
+        self.ticket = ticket
+        self.deadline = deadline
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.perf_counter()
+
+    @property
+    def position(self):
+        """1-based place in the queue ("antrian ke-3"); 0 once a worker has the job."""
+        return max(0, self.ticket - self.pool.dispatched)
+
+    async def result(self):
+        """The processor's result. Raises asyncio.TimeoutError once the job's deadline passes."""
+        remaining = self.deadline - asyncio.get_running_loop().time()
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.future), max(0.0, remaining))
+        except asyncio.TimeoutError:
+            self.pool._count("timeouts")
+            raise
+        finally:
+            # Nobody waits for it any more: a queued job is skipped, a running one finishes unread
+            if not self.future.done():
+                self.future.cancel()
+
+
+class OCRPool:
+    def __init__(self, factory=None, workers=OCR_WORKERS, max_queue=OCR_MAX_QUEUE, job_timeout=OCR_JOB_TIMEOUT,
+                 start_method=OCR_START_METHOD, idle_unload=OCR_IDLE_UNLOAD, preload=OCR_PRELOAD):
+        """
+        Runs receipt OCR in `workers` separate processes, each loading the
+        model once, so CPU-bound inference never holds the event loop. Jobs
+        wait in a bounded FIFO queue: submit() refuses new ones once
+        `max_queue` are waiting (OCRQueueFull), and each job must finish
+        within `job_timeout` seconds of submission. A job whose caller gave up
+        is skipped if still queued; one already running cannot be interrupted
+        and keeps its worker busy until it finishes.
+
+        The workers start with the first job, or at warm_up(). After
+        `idle_unload` seconds without a job (0: never) they exit, handing
+        their models' memory back; the next job starts them again.
+        preload=True loads the model once in this process and forks the
+        workers from it (whatever `start_method`), so they share its
+        weights copy-on-write instead of holding a copy each.
+        """
+        if factory is None:
+            from modules.ocr import OCRProcessor
+            factory = OCRProcessor
+        self.factory = factory
+        self.workers = workers
+        self.max_queue = max_queue
+        self.job_timeout = job_timeout
+        self.start_method = start_method
+        self.idle_unload = idle_unload
+        self.preload = preload
+        self.executor = None
+        self._executor_lock = None
+        self._idle_task = None
+        self.last_active = time.monotonic()
+        # Workers report (pid, load ms, preloaded) here as they start
+        self._reports = None
+        self.worker_loads = {}
+        self.preload_ms = None
+        self.loads = 0
+        self.unloads = 0
+        self.queue = deque()
+        self.dispatched = 0
+        self.busy = 0
+        self._tickets = itertools.count(1)
+        self._ready = None
+        self._dispatchers = []
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "expired": 0, "timeouts": 0}
+        self.wait_times = deque(maxlen=1000)
+        self.service_times = deque(maxlen=1000)
+        # ms per preprocessing step and OCR, from the results' "timings"
+        self.step_times = {}
+        self.lock = threading.Lock()
+
+    def _count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def start(self):
+        """Starts the dispatchers (done by the first submit); the worker processes start with the first job."""
+        if self._dispatchers:
+            return
+        self._ready = asyncio.Event()
+        self._executor_lock = asyncio.Lock()
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        if self.idle_unload:
+            self._idle_task = asyncio.create_task(self._unload_when_idle())
+        logger.info(f"OCR pool started with {self.workers} worker(s)")
+
+    async def warm_up(self):
+        """Starts the workers and loads their models now, so the first receipt does not wait for them."""
+        self.start()
+        # Loading workers are busy: not idle enough to unload, and new receipts see they must wait
+        self.busy += self.workers
+        try:
+            executor = await self._get_executor()
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, _worker_pid) for _ in range(self.workers)))
+            # The worker that loaded first may have answered every ping: wait until each one reports its load
+            deadline = loop.time() + self.job_timeout
+            while loop.time() < deadline:
+                with self.lock:
+                    self._drain_reports()
+                    if len(self.worker_loads) >= self.workers:
+                        break
+                await asyncio.sleep(0.05)
+            logger.info(f"OCR workers warm: {self.metrics()['model']}")
+        except Exception as e:
+            logger.error(f"OCR warm-up failed, workers start with the first receipt: {e}")
+        finally:
+            self.busy -= self.workers
+            self.last_active = time.monotonic()
+
+    async def _get_executor(self):
+        """The running process pool, started (off the event loop: preloading takes seconds) if there is none."""
+        async with self._executor_lock:
+            if self.executor is None:
+                self.executor = await asyncio.to_thread(self._new_executor)
+                self.loads += 1
+            return self.executor
+
+    def _new_executor(self):
+        global _processor
+        context = multiprocessing.get_context("fork" if self.preload else self.start_method)
+        if self.preload and _processor is None:
+            # Workers forked from here inherit the loaded model, its weights shared copy-on-write
+            _processor, self.preload_ms = _load_processor(self.factory)
+        reports = context.SimpleQueue()
+        with self.lock:
+            self._reports = reports
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context,
+            initializer=_init_worker, initargs=(self.factory, reports)
+        )
+
+    def unload(self):
+        """Stops the worker processes (and drops a preloaded model), freeing their memory until the next job."""
+        global _processor
+        if self.executor is None and _processor is None:
+            return
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        with self.lock:
+            self._reports = None
+            self.worker_loads.clear()
+        if _processor is not None:
+            _processor = None
+            gc.collect()
+        self.unloads += 1
+        logger.info("OCR workers unloaded after being idle")
+
+    async def _unload_when_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_unload / 4, 30.0))
+            idle = time.monotonic() - self.last_active
+            if self.executor is not None and not self.busy and not self.queue and idle >= self.idle_unload:
+                self.unload()
+
+    @property
+    def saturated(self):
+        """True while every worker is busy, i.e. a new job has to wait its turn."""
+        return self.busy >= self.workers
+
+    def submit(self, image, timeout=None, **options):
+        """
+        Queues one receipt and returns its OCRJob (await job.result()).
+        The image is pickled to the worker as-is: pass the encoded photo
+        bytes, a fraction of the size of the decoded pixels, and the worker
+        decodes them. `options` go to process_receipt (e.g. staged=True).
+        Raises OCRQueueFull when the queue is full.
+        """
+        self.start()
+        pending = len(self.queue)
+        if pending >= self.max_queue:
+            self._count("rejected")
+            raise OCRQueueFull(f"{pending} receipts already waiting")
+        loop = asyncio.get_running_loop()
+        job = OCRJob(self, image, next(self._tickets), loop.time() + (timeout or self.job_timeout), options)
+        self.queue.append(job)
+        self.last_active = time.monotonic()
+        self._count("submitted")
+        self._ready.set()
+        return job
+
+    async def process(self, image, timeout=None, **options):
+        """submit() and wait for the result in one call."""
+        return await self.submit(image, timeout, **options).result()
+
+    async def _dispatch(self):
+        """One per worker: feeds the next live job to the process pool and waits for it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+            job = self.queue.popleft()
+            self.dispatched = job.ticket
+            if job.future.done():
+                continue
+            if loop.time() >= job.deadline:
+                self._count("expired")
+                job.future.set_exception(asyncio.TimeoutError("OCR job expired in the queue"))
+                continue
+
+            started = time.perf_counter()
+            with self.lock:
+                self.wait_times.append(started - job.queued_at)
+            self.busy += 1
+            executor = None
+            try:
+                executor = await self._get_executor()
+                result = await loop.run_in_executor(executor, _run_job, job.image, job.options)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool) and executor is not None and self.executor is executor:
+                    # A worker died (e.g. killed for memory): the next job starts fresh workers
+                    logger.error("OCR worker died, restarting the pool")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = None
+                    with self.lock:
+                        self._reports = None
+                        self.worker_loads.clear()
+                self._count("failed")
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            finally:
+                self.busy -= 1
+                self.last_active = time.monotonic()
+            with self.lock:
+                self.counters["completed"] += 1
+                self.service_times.append(time.perf_counter() - started)
+                timings = result.get("timings") if isinstance(result, dict) else None
+                for step, ms in (timings or {}).items():
+                    self.step_times.setdefault(step, deque(maxlen=1000)).append(ms)
+            if not job.future.done():
+                job.future.set_result(result)
+
+    async def shutdown(self):
+        tasks = self._dispatchers + ([self._idle_task] if self._idle_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatchers = []
+        self._idle_task = None
+        for job in self.queue:
+            if not job.future.done():
+                job.future.cancel()
+        self.queue.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _drain_reports(self):
+        """Moves the workers' load reports into worker_loads; call with self.lock held."""
+        reports = self._reports
+        while reports is not None and not reports.empty():
+            pid, load_ms, preloaded = reports.get()
+            self.worker_loads[pid] = {"load_ms": round(load_ms, 1), "preloaded": preloaded}
+
+    def _model_metrics(self):
+        """Whether the workers are up, loads and idle unloads so far, and each worker's load ms and memory."""
+        model = {"loaded": self.executor is not None, "preload": self.preload, "loads": self.loads,
+                 "unloads": self.unloads,
+                 "workers": {pid: {**load, **process_memory(pid)} for pid, load in self.worker_loads.items()}}
+        if self.preload:
+            model["preload_ms"] = round(self.preload_ms, 1) if self.preload_ms is not None else None
+            model["parent"] = process_memory(os.getpid())
+        return model
+
+    def metrics(self):
+        """
+        Job counters, queue length, p50/p95 queue wait and service time in
+        ms, the p50 ms of each preprocessing step and the OCR itself, and
+        the model lifecycle (see _model_metrics).
+        """
+        with self.lock:
+            self._drain_reports()
+            result = {"workers": self.workers, "busy": self.busy, "queued": len(self.queue),
+                      "max_queue": self.max_queue, **self.counters}
+            for name, values in (("wait_ms", self.wait_times), ("service_ms", self.service_times)):
+                if values:
+                    p50, p95 = np.percentile(np.fromiter(values, float), [50, 95]) * 1000
+                    result[name] = {"p50": round(p50, 1), "p95": round(p95, 1)}
+            if self.step_times:
+                result["steps_p50_ms"] = {step: round(float(np.median(np.fromiter(values, float))), 1)
+                                          for step, values in self.step_times.items()}
+            result["model"] = self._model_metrics()
+            return result
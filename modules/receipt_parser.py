@@ -0,0 +1,282 @@
+import re
+
+# A money token on its own: 25.000 / 1,250,000.00 / 25000 (a date, time, phone or NPWP number is not one)
+MONEY = r'(?:rp\.?\s*)?(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d{4,9}(?:[.,]\d{1,2})?)-?'
+# "2 x 14.500", "3x1.000", "2 @ 7.500": quantity and unit price of an item
+QTY_PRICE = r'(\d{1,3})\s*[x×*@]\s*' + MONEY
+# Dates, also glued to their label or time ("TGL28/02/202614:00")
+DATE_PATTERNS = [
+    r'(?<!\d)(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?!\d)',
+    r'(?<!\d)(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2}(?!\d))',
+]
+
+# Row labels (lowercased, spaces removed) and how sure they are to carry the total, lowest first.
+# Checked in order, so "subtotal" is seen before the "total" it contains
+TOTAL_LABELS = [
+    ("subtotal", 2), ("grandtotal", 0), ("totalbayar", 0), ("totalbelanja", 0), ("totalharga", 0), ("total", 0),
+    ("jumlah", 1), ("amount", 1), ("nett", 1), ("tagihan", 1),
+]
+# Labels of rows below the items that are not the total: tax, discount, payment and change
+OTHER_LABELS = ("item", "qty", "disc", "diskon", "hemat", "potongan", "ppn", "pajak", "tax", "service",
+                "tunai", "cash", "bayar", "kembali", "change", "debit", "kredit", "kartu", "card", "voucher")
+# Letters OCR reads in place of digits, put back in tokens that are mostly digits ("I0.OOO" -> "10.000")
+DIGIT_LOOKALIKES = str.maketrans("OoIlSB", "001158")
+# Header lines that are not the merchant's name
+NOISE_LABELS = ("alamat", "telp", "tgl", "cashier", "kasir", "nomor", "no:", "npwp", "jl.", "jl ", "jalan")
+
+
+def clean_amount(amount_str):
+    """A float from an OCR'd money string, reading Indonesian (1.250.000,00) and English (1,250,000.00) formats."""
+    # 1. Clean common noise but keep digits, comma and dot ("Rp.25000" and "25.000,-" leave an outer separator)
+    cleaned = re.sub(r'[^\d,\.]', '', amount_str).strip('.,')
+
+    # 2. Heuristic for Indonesian format (dot=thousand, comma=decimal)
+    if ',' in cleaned and '.' in cleaned:
+        # Both separators present: e.g., 1.250.000,00 or 1,250,000.00
+        if cleaned.find('.') < cleaned.find(','):
+            # dot is thousand, comma is decimal
+            val_str = cleaned.replace('.', '').replace(',', '.')
+        else:
+            # comma is thousand, dot is decimal
+            val_str = cleaned.replace(',', '')
+    elif ',' in cleaned:
+        # Only comma present
+        parts = cleaned.split(',')
+        if len(parts[-1]) == 3:
+            # Likely thousand separator: 1,250,000
+            val_str = cleaned.replace(',', '')
+        else:
+            # Likely decimal: 50,00
+            val_str = cleaned.replace(',', '.')
+    elif '.' in cleaned:
+        # Only dot present
+        parts = cleaned.split('.')
+        if len(parts[-1]) == 3:
+            # Likely thousand: 50.000
+            val_str = cleaned.replace('.', '')
+        else:
+            # Likely decimal: 50.00
+            val_str = cleaned
+    else:
+        val_str = cleaned
+
+    try:
+        return float(val_str)
+    except ValueError:
+        # Fallback: just digits, but try to handle trailing zeros if they look like decimals
+        digits_only = re.sub(r'[^\d]', '', amount_str)
+        if digits_only.endswith('00') and len(digits_only) > 4:
+            return float(digits_only[:-2])
+        try:
+            return float(digits_only)
+        except:
+            return 0.0
+
+
+def _geometry(box):
+    """(x_min, x_max, y_min, y_max) of an EasyOCR box (four [x, y] corners), None if it has no usable shape."""
+    try:
+        xs = [float(point[0]) for point in box]
+        ys = [float(point[1]) for point in box]
+    except (TypeError, IndexError, ValueError):
+        return None
+    if len(xs) < 3 or max(ys) <= min(ys):
+        return None
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+def _fix_digits(token):
+    """token with lookalike letters read as digits when it is mostly digits and separators, else unchanged."""
+    glued = re.fullmatch(r'(\d{1,3}[x×*@])(.+)', token)
+    if glued:
+        # "2x2S.000": the unit price glued to the quantity
+        return glued.group(1) + _fix_digits(glued.group(2))
+    if not re.fullmatch(r'[\dOoIlSB.,/:-]+', token):
+        return token
+    digits = sum(c.isdigit() for c in token)
+    return token.translate(DIGIT_LOOKALIKES) if digits and digits >= len(token) / 2 else token
+
+
+def _label_key(label):
+    return re.sub(r'\s+', '', label.lower()).replace('0', 'o')
+
+
+def _total_rank(label):
+    """The TOTAL_LABELS rank of a row label; None for other rows, "TOTAL ITEM" and "TOTAL DISC" included."""
+    key = _label_key(label)
+    for word, rank in TOTAL_LABELS:
+        if word in key:
+            rest = key.replace(word, "")
+            return None if any(other in rest for other in OTHER_LABELS) else rank
+    return None
+
+
+def _date(text):
+    """The first date in text as dd/mm/yyyy (yyyy-mm-dd kept as printed), or None."""
+    match = re.search(DATE_PATTERNS[0], text)
+    if match:
+        return match.group(0)
+    for match in re.finditer(DATE_PATTERNS[1], text):
+        day, month, year = match.groups()
+        if 1 <= int(day) <= 31 and 1 <= int(month) <= 12:
+            year = year if len(year) == 4 else "20" + year
+            return f"{int(day):02d}/{int(month):02d}/{year}"
+    return None
+
+
+class ReceiptRow:
+    """One visual line of the receipt: its boxes' text left to right, split into a label and a right-aligned amount."""
+
+    def __init__(self, texts, amount_text=None):
+        self.label = " ".join(texts).strip()
+        self.amount_text = amount_text
+        self.amount = clean_amount(amount_text) if amount_text else None
+
+    def __repr__(self):
+        return f"ReceiptRow({self.label!r}, {self.amount_text!r})"
+
+
+class Receipt:
+    """What a receipt says: merchant, date, line items and total, plus the rows they were read from."""
+
+    def __init__(self, merchant=None, date=None, total=0.0, items=None, total_label=None, rows=None):
+        self.merchant = merchant
+        self.date = date
+        self.total = total
+        # [{"name", "qty", "price", "amount"}]
+        self.items = items or []
+        # The label the total was printed after ("TOTAL"); None when it was guessed
+        self.total_label = total_label
+        self.rows = rows or []
+
+    def to_dict(self):
+        """The dict process_receipt returns: amount, merchant, date and items."""
+        return {"amount": self.total, "merchant": self.merchant, "date": self.date, "items": self.items}
+
+
+def group_rows(results, row_overlap=0.5, right_share=0.3):
+    """
+    EasyOCR (box, text, confidence) results as ReceiptRows, top to bottom.
+    Boxes whose vertical extents overlap by `row_overlap` of the shorter one
+    share a row (unless they overlap side by side too), so a label and its
+    amount end up together whatever order the reader returned them in. A
+    row's last token is its amount when it is a money token and its box ends
+    within the rightmost `right_share` of the receipt. Results without
+    usable boxes become one row each, in the given order.
+    """
+    boxes = [(_geometry(box), text) for box, text, *_ in results if text and text.strip()]
+    if not boxes:
+        return []
+    if any(geometry is None for geometry, _ in boxes):
+        return [_row([text], None) for _, text in boxes]
+
+    rows = []
+    for geometry, text in sorted(boxes, key=lambda b: (b[0][2] + b[0][3]) / 2):
+        x0, x1, y0, y1 = geometry
+        best, best_overlap = None, row_overlap
+        for row in rows[-3:]:
+            overlap = min(y1, row["y1"]) - max(y0, row["y0"])
+            shorter = min(y1 - y0, row["y1"] - row["y0"])
+            side_by_side = all(x1 <= bx0 or x0 >= bx1 for (bx0, bx1, _, _), _ in row["boxes"])
+            if side_by_side and overlap / shorter >= best_overlap:
+                best, best_overlap = row, overlap / shorter
+        if best is None:
+            best = {"y0": y0, "y1": y1, "boxes": []}
+            rows.append(best)
+        best["boxes"].append((geometry, text))
+        # The row's extent is its boxes' mean, so it does not grow into the next line
+        best["y0"] = sum(g[2] for g, _ in best["boxes"]) / len(best["boxes"])
+        best["y1"] = sum(g[3] for g, _ in best["boxes"]) / len(best["boxes"])
+
+    left = min(g[0] for g, _ in boxes)
+    right = max(g[1] for g, _ in boxes)
+    amount_edge = right - right_share * (right - left)
+    parsed = []
+    for row in rows:
+        row_boxes = sorted(row["boxes"], key=lambda b: b[0][0])
+        parsed.append(_row([text for _, text in row_boxes], row_boxes[-1][0][1] >= amount_edge))
+    return parsed
+
+
+def _row(texts, right_aligned):
+    """
+    A ReceiptRow, taking the last token as the amount when it is money and
+    right-aligned (None: unknown, no geometry). The unit price ending
+    "2 x 14.500" is never the row's amount.
+    """
+    tokens = [_fix_digits(token) for token in " ".join(texts).split()]
+    if not tokens or right_aligned is False or not re.fullmatch(MONEY, tokens[-1], re.IGNORECASE):
+        return ReceiptRow(tokens)
+    if re.search(QTY_PRICE + r'$', " ".join(tokens[-3:]), re.IGNORECASE):
+        return ReceiptRow(tokens)
+    label = tokens[:-1]
+    # "Rp 25.000": the currency may be its own token
+    if label and re.fullmatch(r'rp\.?', label[-1], re.IGNORECASE):
+        label = label[:-1]
+    return ReceiptRow(label, tokens[-1])
+
+
+def parse_receipt(results):
+    """
+    A Receipt from EasyOCR's readtext results, in one pass over the rows
+    group_rows builds: header rows give the merchant and date, rows with a
+    right-aligned amount above the first total/tax/payment row are the
+    items, and the total is the amount of the best total label (TOTAL over
+    JUMLAH over SUBTOTAL; its own row or the row below). Without any label
+    the largest right-aligned amount that is not a payment or change wins.
+    """
+    rows = group_rows(results)
+    receipt = Receipt(rows=rows)
+    pending_name = None
+    in_items = True
+    best_rank = None
+    fallback = 0.0
+
+    for i, row in enumerate(rows):
+        if receipt.date is None:
+            receipt.date = _date(row.label + " " + (row.amount_text or ""))
+        rank = _total_rank(row.label)
+        key = _label_key(row.label)
+        is_other = rank is None and any(word in key for word in OTHER_LABELS)
+
+        if rank is not None:
+            in_items = False
+            amount = row.amount
+            if amount is None and i + 1 < len(rows) and not rows[i + 1].label and rows[i + 1].amount:
+                # The label's amount wrapped onto the row below
+                amount = rows[i + 1].amount
+            if amount and amount > 100 and (best_rank is None or rank <= best_rank):
+                best_rank = rank
+                receipt.total, receipt.total_label = amount, row.label
+            continue
+        if is_other:
+            in_items = False
+            continue
+
+        if row.amount is None:
+            if re.search(r'[a-zA-Z]{2}', row.label) and not _date(row.label):
+                if receipt.merchant is None and not any(word in row.label.lower() for word in NOISE_LABELS):
+                    receipt.merchant = row.label
+                pending_name = row.label
+            continue
+
+        fallback = max(fallback, row.amount)
+        if not in_items:
+            continue
+        qty_price = re.search(QTY_PRICE, row.label, re.IGNORECASE)
+        if qty_price:
+            name = row.label[:qty_price.start()].strip() or pending_name
+            qty, price = int(qty_price.group(1)), clean_amount(qty_price.group(2))
+        elif re.search(r'[a-zA-Z]{2}', row.label):
+            name, qty, price = row.label, 1, row.amount
+        else:
+            name, qty, price = pending_name, 1, row.amount
+        if name:
+            receipt.items.append({"name": name, "qty": qty, "price": price, "amount": row.amount})
+        pending_name = None
+
+    if best_rank is None and fallback > 100:
+        receipt.total = fallback
+    if receipt.merchant is None:
+        receipt.merchant = "Transaksi"
+    return receipt
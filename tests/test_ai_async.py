@@ -0,0 +1,408 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, AsyncMock, patch, call
+from groq import AsyncGroq
+from telegram.error import BadRequest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ai_engine import AIEngine
+from modules.nlp import NLPProcessor
+from modules.llm_batch import ParseBatcher
+from modules.llm_cache import LLMCache
+from modules.llm_admission import AdmissionController
+from utils.tasks import Superseded, run_user_task, cancel_user_task
+from utils.streaming import stream_reply, PLACEHOLDER
+
+# --- FAKE OPENAI-COMPATIBLE SERVER ---
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append((self.path, body))
+        step = server.script.pop(0) if server.script else {}
+        time.sleep(step.get("delay", 0))
+
+        status = step.get("status", 200)
+        if status == 200 and body.get("stream"):
+            return self._stream(body, step)
+        if status != 200:
+            payload = {"error": {"message": "fake failure", "type": "server_error"}}
+        else:
+            payload = {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": step.get("content", server.default_content)}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            }
+        data = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (deadline or cancellation)
+
+    def _stream(self, body, step):
+        content = step.get("content", self.server.default_content)
+        pieces = step.get("pieces") or [content]
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for piece in pieces:
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(step.get("piece_delay", 0))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        return
+
+@pytest.fixture
+def fake_llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.script = []
+    server.default_content = '{"amount": 50000, "category": "Makanan", "is_transaction": true}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.client = AsyncGroq(api_key="test", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def ai_engine(fake_llm):
+    ai = AIEngine()
+    ai.async_client = fake_llm.client
+    return ai
+
+# --- ASYNC AI ENGINE TESTS ---
+
+@pytest.mark.asyncio
+async def test_parse_transaction_async(ai_engine, fake_llm):
+    result = await ai_engine.parse_transaction_async("makan sate 50rb")
+    assert result["amount"] == 50000
+    path, body = fake_llm.requests[0]
+    assert path == "/openai/v1/chat/completions"
+    assert body["response_format"] == {"type": "json_object"}
+    assert "makan sate 50rb" in body["messages"][0]["content"]
+
+@pytest.mark.asyncio
+async def test_async_retries_with_backoff(ai_engine, fake_llm):
+    fake_llm.script = [{"status": 500}, {"status": 503}, {"content": "Hemat ya!"}]
+    with patch("modules.llm.backoff_delay", return_value=0.01):
+        assert await ai_engine.generate_smart_insight_async({"data": "x"}) == "Hemat ya!"
+    assert len(fake_llm.requests) == 3
+
+    fake_llm.script = [{"status": 500}] * 3
+    with patch("modules.llm.backoff_delay", return_value=0.01):
+        assert await ai_engine.parse_transaction_async("kopi 20rb", retries=2) is None
+    assert len(fake_llm.requests) == 6
+
+@pytest.mark.asyncio
+async def test_async_deadline_does_not_block_loop(ai_engine, fake_llm):
+    fake_llm.script = [{"delay": 2}]
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.monotonic()
+    result = await ai_engine.generate_smart_insight_async({"data": "x"}, deadline=0.3)
+    elapsed = time.monotonic() - start
+    ticker_task.cancel()
+
+    assert "kelamaan" in result
+    assert elapsed < 1.0
+    # Other coroutines kept running while the LLM call was pending
+    assert ticks >= 10
+
+@pytest.mark.asyncio
+async def test_async_cancellation(ai_engine, fake_llm):
+    fake_llm.script = [{"delay": 2}]
+    task = asyncio.create_task(ai_engine.chat_response_async("halo"))
+    await asyncio.sleep(0.1)
+    start = time.monotonic()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert time.monotonic() - start < 0.5
+
+@pytest.mark.asyncio
+async def test_async_no_client():
+    ai = AIEngine()
+    ai.async_client = None
+    assert await ai.parse_transaction_async("halo") is None
+    assert "AI Key tidak ditemukan" in await ai.generate_smart_insight_async({})
+    assert "FinBot" in await ai.chat_response_async("halo")
+
+@pytest.mark.asyncio
+async def test_nlp_llm_classify_intent_async(fake_llm):
+    nlp = NLPProcessor()
+    nlp.async_client = fake_llm.client
+    fake_llm.script = [{"content": '{"intent": "GREETING", "confidence": 0.95}'}]
+    result = await nlp._llm_classify_intent_async("kamu siapa")
+    assert result == {"intent": "GREETING", "confidence": 0.95}
+
+    fake_llm.script = [{"delay": 2}]
+    assert await nlp._llm_classify_intent_async("kamu lagi apa", deadline=0.2) is None
+
+# --- STREAMING TESTS ---
+
+@pytest.mark.asyncio
+async def test_stream_insight_yields_pieces_and_caches(ai_engine, fake_llm):
+    fake_llm.script = [{"pieces": ["Hemat ", "ya ", "kak!"], "piece_delay": 0.05}]
+    pieces = [piece async for piece in ai_engine.stream_smart_insight_async({"data": "x"}, user_id=1)]
+    assert pieces == ["Hemat ", "ya ", "kak!"]
+    assert fake_llm.requests[0][1]["stream"] is True
+
+    # The complete answer is cached and replayed as one piece
+    assert [p async for p in ai_engine.stream_smart_insight_async({"data": "x"}, user_id=1)] == ["Hemat ya kak!"]
+    assert await ai_engine.generate_smart_insight_async({"data": "x"}, user_id=1) == "Hemat ya kak!"
+    assert len(fake_llm.requests) == 1
+
+@pytest.mark.asyncio
+async def test_stream_insight_retries_before_first_piece(ai_engine, fake_llm):
+    fake_llm.script = [{"status": 500}, {"pieces": ["Oke"]}]
+    with patch("modules.llm.backoff_delay", return_value=0.01):
+        pieces = [p async for p in ai_engine.stream_smart_insight_async({"data": "y"})]
+    assert pieces == ["Oke"]
+    assert len(fake_llm.requests) == 2
+
+@pytest.mark.asyncio
+async def test_stream_insight_cut_by_deadline(ai_engine, fake_llm):
+    fake_llm.script = [{"pieces": ["Satu ", "dua ", "tiga"], "piece_delay": 0.3}]
+    pieces = [p async for p in ai_engine.stream_smart_insight_async({"data": "z"}, deadline=0.5)]
+    assert pieces[0] == "Satu "
+    assert "kepotong" in pieces[-1]
+    assert ai_engine.cache.get(ai_engine.cache.make_key(ai_engine.model, "insight", {"data": "z"}, None)) is None
+
+def _message_mock():
+    message = MagicMock()
+    message.edit_text = AsyncMock()
+    message.delete = AsyncMock()
+    target = MagicMock()
+    target.reply_text = AsyncMock(return_value=message)
+    return target, message
+
+@pytest.mark.asyncio
+async def test_stream_reply_throttles_edits():
+    target, message = _message_mock()
+
+    async def chunks():
+        for i in range(10):
+            await asyncio.sleep(0.02)
+            yield f"{i} "
+
+    text = await stream_reply(target, chunks(), header="*Judul*\n", interval=0.1)
+    assert text == "0 1 2 3 4 5 6 7 8 9 "
+    assert target.reply_text.call_args[0][0] == "Judul\n" + PLACEHOLDER
+    # ~0.2s of streaming at one edit per 0.1s, plus the final edit
+    assert 2 <= message.edit_text.await_count <= 5
+    assert message.edit_text.call_args_list[0] == call("Judul\n0  ▌", parse_mode=None)
+    assert message.edit_text.call_args == call("*Judul*\n" + text, parse_mode="Markdown")
+
+@pytest.mark.asyncio
+async def test_stream_reply_falls_back_to_plain_text():
+    target, message = _message_mock()
+    message.edit_text.side_effect = [None, BadRequest("Can't parse entities"), None]
+
+    async def chunks():
+        yield "pakai *tebal"
+
+    await stream_reply(target, chunks(), interval=0)
+    assert message.edit_text.call_args == call("pakai tebal", parse_mode=None)
+
+@pytest.mark.asyncio
+async def test_stream_reply_cancelled_deletes_placeholder():
+    target, message = _message_mock()
+
+    async def chunks():
+        await asyncio.sleep(10)
+        yield "telat"
+
+    task = asyncio.create_task(stream_reply(target, chunks()))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    message.delete.assert_awaited_once()
+
+# --- INTENT RACE TESTS ---
+
+@pytest.fixture
+def race_nlp(fake_llm):
+    nlp = NLPProcessor(cache=LLMCache(path=None))
+    nlp.async_client = fake_llm.client
+    nlp.race_shadow_rate = 0
+    return nlp
+
+@pytest.mark.asyncio
+async def test_race_settled_messages_skip_llm(race_nlp, fake_llm):
+    assert (await race_nlp.classify_intent_async("makan 50rb"))["intent"] == "ADD_TRANSACTION"
+    assert (await race_nlp.classify_intent_async("batal", state="WAITING_EDIT_AMOUNT"))["intent"] == "CANCEL"
+    assert fake_llm.requests == []
+    assert race_nlp.race_stats.metrics()["counts"] == {"local": 2}
+
+@pytest.mark.asyncio
+async def test_race_confident_rules_make_no_llm_request(race_nlp, fake_llm):
+    race_nlp.admission = AdmissionController(burst=2)
+    texts = ["halo", "sisa budget", "laporan bulan ini", "help"] * 5
+    results = [await race_nlp.classify_intent_async(text, user_id=1) for text in texts]
+
+    assert [r["intent"] for r in results[:4]] == ["GREETING", "CHECK_BUDGET", "QUERY_SUMMARY", "HELP"]
+    assert fake_llm.requests == []
+    # Neither the user's quota nor the LLM metrics see these messages
+    assert race_nlp.admission.usage(1) is None
+    assert race_nlp.metrics.metrics() == {}
+    assert race_nlp.race_stats.metrics()["counts"] == {"local": 20}
+
+@pytest.mark.asyncio
+async def test_race_ambiguous_waits_for_llm(race_nlp, fake_llm):
+    fake_llm.script = [{"content": '{"intent": "QUERY_ADVICE", "confidence": 0.9}'}]
+    # Greeting keyword inside a long question is not confident enough to win
+    result = await race_nlp.classify_intent_async("gimana cara hemat uang jajan bulan ini")
+    assert result["intent"] == "QUERY_ADVICE"
+    assert len(fake_llm.requests) == 1
+
+    fake_llm.script = [{"delay": 2}]
+    result = await race_nlp.classify_intent_async("beli sesuatu yang aneh", deadline=0.2)
+    assert result["intent"] == "UNKNOWN"
+
+    metrics = race_nlp.race_stats.metrics()
+    assert metrics["counts"] == {"llm": 1, "fallback": 1}
+    assert metrics["compared"] == 1
+    assert metrics["agreement_rate"] == 0.0
+    assert metrics["disagreements"] == {"GREETING->QUERY_ADVICE": 1}
+    assert set(metrics["latency_ms"]["llm"]) == {"p50", "p95", "p99"}
+
+@pytest.mark.asyncio
+async def test_race_shadow_call_measures_agreement(race_nlp, fake_llm):
+    race_nlp.race_shadow_rate = 1.0
+    fake_llm.script = [{"content": '{"intent": "CHECK_BUDGET", "confidence": 0.95}'}]
+    assert (await race_nlp.classify_intent_async("sisa budget"))["intent"] == "CHECK_BUDGET"
+    await asyncio.gather(*race_nlp._shadow_tasks)
+    await asyncio.sleep(0)
+    metrics = race_nlp.race_stats.metrics()
+    assert metrics["counts"] == {"local": 1}
+    assert metrics["agreement_rate"] == 1.0
+
+# --- PARSE BATCHER TESTS ---
+
+@pytest.mark.asyncio
+async def test_parse_batcher_sends_one_request(ai_engine, fake_llm):
+    fake_llm.script = [{"content": json.dumps({"results": [
+        {"amount": 20000, "is_transaction": True}, {"amount": 5000, "is_transaction": True}, {"is_transaction": False}
+    ]})}]
+    batcher = ParseBatcher(ai_engine, max_batch=3, max_wait_ms=1000)
+    results = await asyncio.gather(batcher.parse("kopi 20rb"), batcher.parse("parkir 5rb"), batcher.parse("halo"))
+
+    assert [r.get("amount") for r in results] == [20000, 5000, None]
+    assert len(fake_llm.requests) == 1
+    prompt = fake_llm.requests[0][1]["messages"][0]["content"]
+    assert '["kopi 20rb", "parkir 5rb", "halo"]' in prompt
+
+    # Parsed texts are cached individually
+    assert await ai_engine.parse_transaction_async("parkir 5rb") == {"amount": 5000, "is_transaction": True}
+    assert len(fake_llm.requests) == 1
+
+@pytest.mark.asyncio
+async def test_parse_batcher_flushes_after_wait(ai_engine, fake_llm):
+    batcher = ParseBatcher(ai_engine, max_batch=8, max_wait_ms=20)
+    result = await asyncio.wait_for(batcher.parse("makan sate 50rb"), timeout=2)
+    assert result["amount"] == 50000
+    # A lone request goes out as a normal single prompt
+    assert "JSON array" not in fake_llm.requests[0][1]["messages"][0]["content"]
+
+@pytest.mark.asyncio
+async def test_parse_batcher_falls_back_to_single_calls(ai_engine, fake_llm):
+    # The batch answer has the wrong number of results
+    fake_llm.script = [{"content": '{"results": [{"amount": 1}]}'}]
+    batcher = ParseBatcher(ai_engine, max_batch=2, max_wait_ms=1000)
+    results = await asyncio.gather(batcher.parse("kopi 20rb"), batcher.parse("parkir 5rb"))
+
+    assert all(r["amount"] == 50000 for r in results)
+    assert len(fake_llm.requests) == 3
+    assert batcher.stats["fallbacks"] == 1
+
+@pytest.mark.asyncio
+async def test_parse_batcher_refunds_texts_without_a_request(ai_engine, fake_llm):
+    ai_engine.admission = AdmissionController(burst=10, max_concurrency=1, queue_timeout=0.05)
+    ai_engine.nlp = NLPProcessor(cache=LLMCache(path=None))
+    batcher = ParseBatcher(ai_engine, max_batch=2, max_wait_ms=20)
+
+    # Answered from the cache: no request, no charge
+    ai_engine.cache.set(ai_engine.cache.make_key(ai_engine.model, "parse", "kopi 20rb"), {"amount": 20000})
+    ai_engine.cache.set(ai_engine.cache.make_key(ai_engine.model, "parse", "parkir 5rb"), {"amount": 5000})
+    results = await asyncio.gather(batcher.parse("kopi 20rb", user_id=1), batcher.parse("parkir 5rb", user_id=1))
+    assert [r["amount"] for r in results] == [20000, 5000]
+    assert await batcher.parse("kopi 20rb", user_id=1) == {"amount": 20000}
+
+    # Cancelled while queued
+    queued = asyncio.create_task(batcher.parse("makan sate 50rb", user_id=1))
+    await asyncio.sleep(0)
+    queued.cancel()
+    await asyncio.sleep(0.05)
+
+    # Shed: every slot is taken until the batch gives up
+    async with ai_engine.admission.admit(None, "parse"):
+        results = await asyncio.gather(batcher.parse("beli bakso 15rb", user_id=1), batcher.parse("gaji masuk 5jt", user_id=1))
+    assert [r["amount"] for r in results] == [15000, 5000000]
+    assert batcher.stats["shed"] == 1
+
+    assert fake_llm.requests == []
+    usage = ai_engine.admission.usage(1)
+    assert usage["calls"] == 0 and usage["features"] == {}
+    assert usage["tokens"] >= 9.9
+
+# --- USER TASK TESTS ---
+
+@pytest.mark.asyncio
+async def test_run_user_task_supersedes_previous():
+    context = MagicMock()
+    context.user_data = {}
+
+    async def answer(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    async def handler(value, delay):
+        # Caught in the handler's own task, as get_ai_insight does
+        try:
+            return await run_user_task(context, answer(value, delay))
+        except Superseded:
+            return "superseded"
+
+    first = asyncio.create_task(handler("lama", 10))
+    await asyncio.sleep(0)
+    assert await run_user_task(context, answer("baru", 0)) == "baru"
+    assert await first == "superseded"
+    assert "llm_task" not in context.user_data
+    assert cancel_user_task(context) is False
+
+    # Cancelling the handler itself is not a supersession
+    cancelled = asyncio.create_task(handler("lama", 10))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
@@ -0,0 +1,115 @@
+import sys
+import os
+import random
+import asyncio
+import pytest
+from groq import AsyncGroq
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.make_nlp_corpus import generate
+from benchmarks.nlp_bench import load_corpus, run_benchmark, compare_to_baseline
+from benchmarks.fake_llm_server import FakeLLMServer, bot_responder, parse_latency
+from benchmarks.llm_load_test import run_load, parse_mix
+from benchmarks import make_receipts
+from benchmarks.ocr_bench import preprocessing_settings, run_combination
+from modules.ocr_backends import BACKENDS, OCRBackend
+
+# --- NLP BENCHMARK TESTS ---
+def test_nlp_corpus_is_well_formed():
+    records = load_corpus()
+    assert len(records) >= 3000
+    assert len({r["id"] for r in records}) == len(records)
+    for r in records[:200]:
+        assert set(r) == {"id", "text", "amount", "category", "merchant", "type"}
+
+    # The generator is deterministic for a given seed
+    assert generate(50, seed=1) == generate(50, seed=1)
+
+def test_nlp_bench_runner():
+    results = run_benchmark(limit=100, repeat=1)
+    for name in ("normalize_text", "_extract_amount", "_detect_category", "extract_merchant", "process_batch"):
+        assert results[name]["msgs_per_sec"] > 0
+        assert results[name]["p50_us"] <= results[name]["p99_us"]
+
+    assert all(r["relative"] > 0 for r in results.values())
+    baseline = {"process_text": {"relative": results["process_text"]["relative"] * 10, "accuracy": 1.1}}
+    problems = compare_to_baseline(results, baseline, max_regression=0.25)
+    assert len(problems) == 2
+
+# --- FAKE LLM SERVER / LOAD TEST ---
+def test_fake_llm_server_latency_and_faults():
+    rng = random.Random(1)
+    assert parse_latency("0.25")() == 0.25
+    assert all(0.1 <= parse_latency("uniform:0.1,0.2", rng)() <= 0.2 for _ in range(20))
+    assert parse_latency("lognormal:0.3,0.4", rng)() > 0
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+
+    body = {"model": "m", "messages": [{"role": "user", "content": "Nama user: Budi\nPesan: halo"}]}
+    status, payload = FakeLLMServer(bot_responder(), base_latency=0, per_token_latency=0).handle(body)
+    assert status == 200
+    assert payload["choices"][0]["message"]["content"].startswith("Halo Budi!")
+    server = FakeLLMServer(base_latency=0, error_rate=1.0)
+    assert server.handle(body)[0] == 500
+    assert server.errors == 1
+
+def test_fake_llm_server_streams_to_async_client():
+    async def run():
+        client = AsyncGroq(api_key="test", base_url=server.base_url, max_retries=0)
+        stream = await client.chat.completions.create(
+            model="m", stream=True, messages=[{"role": "user", "content": "Beri 3 insight singkat"}])
+        pieces = [chunk.choices[0].delta.content async for chunk in stream]
+        await client.close()
+        return pieces
+
+    with FakeLLMServer(bot_responder(), base_latency=0, per_token_latency=0) as server:
+        pieces = asyncio.run(run())
+    assert len(pieces) > 1
+    assert "".join(pieces).startswith("• Pengeluaran")
+
+def test_llm_load_test_runner():
+    with FakeLLMServer(bot_responder(), base_latency=0.01, per_token_latency=0, max_concurrency=8) as server:
+        result = asyncio.run(run_load(server.base_url, rps=40, duration=0.5, texts=["kopi 20rb", "gaji 5jt"]))
+    assert result["requests"] > 0
+    assert sum(path["calls"] for path in result["paths"].values()) == result["requests"]
+    for path in result["paths"].values():
+        if path["calls"]:
+            assert path["p50_ms"] <= path["p99_ms"]
+    assert parse_mix("parse=2,chat") == {"parse": 2.0, "chat": 1.0}
+
+# --- OCR BENCHMARK SUITE ---
+class _FixedReceiptBackend(OCRBackend):
+    """Reads every photo as the same INDOMARET receipt."""
+    name = "fixed"
+    staged = False
+
+    def readtext(self, image):
+        return [([], "INDOMARET", 0.9), ([], "TGL 05/03/2026", 0.9), ([], "TOTAL 25.000", 0.9)]
+
+def test_receipt_generator_labels_and_fade():
+    receipts = make_receipts.generate(6, seed=5)
+    assert receipts == make_receipts.generate(6, seed=5)
+    for _, truth in receipts:
+        assert truth["font"] in make_receipts.available_fonts()
+        assert truth["amount_format"] in make_receipts.AMOUNT_FORMATS
+        assert 0 <= truth["fade"] <= 0.7
+
+    import numpy as np
+    lines, _ = make_receipts.receipt_lines(random.Random(3))
+    paper = make_receipts.render_paper(lines, font_size=24)
+    faded = np.asarray(make_receipts.thermal_fade(paper, random.Random(3), 0.6))
+    # The ink turns grey, the paper stays white
+    assert faded.min() > np.asarray(paper).min() + 25
+    assert faded.max() == np.asarray(paper).max()
+
+def test_ocr_bench_runs_a_backend_and_scores_its_reads(monkeypatch):
+    monkeypatch.setitem(BACKENDS, "fixed", _FixedReceiptBackend)
+    r = run_combination("fixed", preprocessing_settings()["full"], count=4, seed=5)
+    assert len(r["receipt_ms"]) == len(r["hits"]) == 4
+    assert {"decode", "deskew", "ocr", "parse"} <= set(r["stage_ms"])
+    truths = [truth for _, truth in make_receipts.generate(4, seed=5)]
+    assert [h["merchant"] for h in r["hits"]] == [t["merchant"] == "INDOMARET" for t in truths]
+    assert [h["amount"] for h in r["hits"]] == [t["amount"] == 25000.0 for t in truths]
+    assert preprocessing_settings()["none"] == ()
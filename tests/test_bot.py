@@ -1,4 +1,5 @@
 import pytest
+import asyncio
 from unittest.mock import MagicMock, patch, AsyncMock, ANY
 from telegram import Update, Message, User
 from telegram.ext import ContextTypes
@@ -249,7 +250,7 @@ async def test_handle_message_chat(mock_update, mock_context):
         mock_user = MagicMock(id=1)
         mock_db.get_or_create_user.return_value = mock_user
         mock_nlp.process_text.return_value = (0, None, None)
-        mock_nlp.parse_message.return_value = {'intent': 'greeting'}
+        mock_nlp.classify_intent_async = AsyncMock(return_value={'intent': 'GREETING', 'confidence': 1.0})
         
         await handle_message(mock_update, mock_context)
         
@@ -405,10 +406,10 @@ async def test_handle_message_waiting_edit_invalid(mock_update, mock_context):
 @pytest.mark.asyncio
 async def test_handle_message_unknown_intent(mock_update, mock_context):
     mock_update.message.text = "random text"
-    with patch('core.db') as mock_db, patch('core.nlp') as mock_nlp:
+    with patch('handlers.messages.db') as mock_db, patch('core.nlp') as mock_nlp:
         mock_db.get_or_create_user.return_value = MagicMock(id=1)
         mock_nlp.process_text.return_value = (0, None, None)
-        mock_nlp.parse_message.return_value = {'intent': 'unknown'}
+        mock_nlp.classify_intent_async = AsyncMock(return_value={'intent': 'UNKNOWN', 'confidence': 0.0})
         
         await handle_message(mock_update, mock_context)
         
@@ -456,7 +457,7 @@ async def test_send_budget_summary(mock_update, mock_context):
 
 @pytest.mark.asyncio
 async def test_handle_message_intents(mock_update, mock_context):
-    intents = ["query_budget", "get_report", "help", "greeting"]
+    intents = ["CHECK_BUDGET", "QUERY_SUMMARY", "HELP", "GREETING"]
     for intent in intents:
         mock_update.message.text = "test"
         with patch('core.db') as mock_db, patch('core.nlp') as mock_nlp, \
@@ -466,15 +467,15 @@ async def test_handle_message_intents(mock_update, mock_context):
             
             mock_db.get_or_create_user.return_value = MagicMock(id=1)
             mock_nlp.process_text.return_value = (0, None, None)
-            mock_nlp.parse_message.return_value = {'intent': intent}
+            mock_nlp.classify_intent_async = AsyncMock(return_value={'intent': intent, 'confidence': 0.9})
             
             await handle_message(mock_update, mock_context)
             
-            if intent == "query_budget":
+            if intent == "CHECK_BUDGET":
                 mock_sbs.assert_called_once()
-            elif intent == "get_report":
+            elif intent == "QUERY_SUMMARY":
                 mock_sr.assert_called_once()
-            elif intent == "help":
+            elif intent == "HELP":
                 mock_hc.assert_called_once()
             else:
                 mock_update.message.reply_text.assert_called()
@@ -635,3 +636,155 @@ async def test_handle_callback_edit_category(mock_update, mock_context):
         await handle_callback(mock_update, mock_context)
         assert mock_context.user_data['state'] == 'WAITING_EDIT_CATEGORY'
         query.edit_message_text.assert_called()
+
+@pytest.mark.asyncio
+async def test_handle_message_multi_item(mock_update, mock_context):
+    mock_update.message.text = "kopi 20rb, parkir 5rb, bensin 50rb"
+    with patch('handlers.messages.db') as mock_db, patch('handlers.messages.budget_mgr') as mock_bm, \
+         patch('handlers.messages.update_pinned_dashboard', new_callable=AsyncMock) as mock_dashboard:
+        mock_db.get_or_create_user.return_value = MagicMock(id=1)
+        mock_bm.check_budget_status.return_value = ""
+
+        await handle_message(mock_update, mock_context)
+
+        mock_db.add_transactions.assert_called_once()
+        items = mock_db.add_transactions.call_args[0][1]
+        assert [i['amount'] for i in items] == [20000.0, 5000.0, 50000.0]
+        mock_db.add_transaction.assert_not_called()
+        # One budget check per category, one reply, one dashboard refresh
+        assert mock_bm.check_budget_status.call_count == 2
+        mock_update.message.reply_text.assert_called_once()
+        assert "Tercatat 3 transaksi" in mock_update.message.reply_text.call_args[0][0]
+        mock_dashboard.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_handle_message_llm_fallback(mock_update, mock_context):
+    mock_update.message.text = "beli cilok goceng"
+    with patch('handlers.messages.db') as mock_db, patch('handlers.messages.budget_mgr') as mock_bm, \
+         patch('handlers.messages.parse_batcher') as mock_batcher, \
+         patch('handlers.messages.update_pinned_dashboard', new_callable=AsyncMock), \
+         patch.object(core.nlp, 'classify_intent_async', AsyncMock(return_value={'intent': 'UNKNOWN', 'confidence': 0.0})):
+        mock_db.get_or_create_user.return_value = MagicMock(id=1)
+        mock_bm.check_budget_status.return_value = ""
+        mock_batcher.parse = AsyncMock(return_value={
+            'amount': 5000, 'category': 'Makanan', 'type': 'expense', 'is_transaction': True
+        })
+
+        await handle_message(mock_update, mock_context)
+
+        mock_batcher.parse.assert_awaited_once_with("beli cilok goceng", user_id=1)
+        # What the LLM read waits for the user's ✓ before it is saved
+        mock_db.add_transaction.assert_not_called()
+        assert mock_context.user_data['pending_tx']['amount'] == 5000.0
+        args, kwargs = mock_update.message.reply_text.call_args
+        assert "Rp5,000" in args[0]
+        assert kwargs['reply_markup'].inline_keyboard[0][0].callback_data == "tx_confirm"
+
+        # With the fallback off the message is not sent to the LLM
+        mock_batcher.parse.reset_mock()
+        with patch('handlers.messages.LLM_PARSE_FALLBACK', False):
+            await handle_message(mock_update, mock_context)
+        mock_batcher.parse.assert_not_awaited()
+        assert "nggak paham" in mock_update.message.reply_text.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_handle_message_routes_raced_intent(mock_update, mock_context):
+    mock_update.message.text = "sisa duitku berapa"
+    with patch('handlers.messages.db') as mock_db, patch('handlers.messages.nlp') as mock_nlp, \
+         patch('handlers.messages.send_budget_summary', new_callable=AsyncMock) as mock_sbs, \
+         patch('handlers.messages.parse_batcher') as mock_batcher:
+        mock_db.get_or_create_user.return_value = MagicMock(id=1)
+        mock_nlp.split_items.return_value = []
+        mock_nlp.process_text.return_value = (0, None, None)
+        mock_nlp.classify_intent_async = AsyncMock(return_value={'intent': 'CHECK_BUDGET', 'confidence': 0.9})
+
+        await handle_message(mock_update, mock_context)
+
+        # The race is charged to the user's DB id, and a known intent never reaches the parse fallback
+        mock_nlp.classify_intent_async.assert_awaited_once_with("sisa duitku berapa", user_id=1)
+        mock_sbs.assert_awaited_once()
+        mock_batcher.parse.assert_not_called()
+
+def _album_update(message_id, data):
+    update = MagicMock(spec=Update)
+    update.effective_user = MagicMock(spec=User)
+    update.effective_user.id = 12345
+    update.effective_user.username = "testuser"
+    update.message = MagicMock(spec=Message)
+    update.message.media_group_id = "album-1"
+    update.message.message_id = message_id
+    update.message.reply_text = AsyncMock()
+    photo_file = AsyncMock()
+    photo_file.download_as_bytearray.return_value = data
+    update.message.photo = [MagicMock(get_file=AsyncMock(return_value=photo_file), file_unique_id=f"AQAD{message_id}")]
+    return update
+
+@pytest.mark.asyncio
+async def test_handle_photo_album_reads_receipts_together(mock_context):
+    results = {
+        b"one": {'amount': 25000, 'merchant': 'Indomaret', 'date': '2026-01-05'},
+        b"two": {'amount': 0, 'merchant': None, 'date': None},
+        b"three": {'amount': 40000, 'merchant': 'Alfamart', 'date': None},
+    }
+    # Telegram may deliver the photos of an album out of order
+    updates = [_album_update(3, b"three"), _album_update(1, b"one"), _album_update(2, b"two")]
+    with patch('handlers.messages.ocr') as mock_ocr, patch('handlers.messages.db') as mock_db, \
+         patch('handlers.messages.ocr_pool') as mock_pool, patch('handlers.messages.ALBUM_WAIT', 0.05):
+        mock_ocr.enabled = True
+        mock_db.get_or_create_user.return_value = MagicMock(id=1)
+        mock_pool.process = AsyncMock(side_effect=lambda image: results[bytes(image)])
+
+        await asyncio.gather(*(handle_photo(update, mock_context) for update in updates))
+
+        assert mock_pool.process.await_count == 3
+        updates[0].message.reply_text.assert_called_once_with("Sedang memproses 3 struk... ⏳")
+        assert not updates[1].message.reply_text.called and not updates[2].message.reply_text.called
+        text = updates[0].message.reply_text.return_value.edit_text.call_args[0][0]
+        assert "2 dari 3 struk" in text and "2. ✕ total tidak ditemukan" in text
+        assert text.index("Rp25,000") < text.index("Rp40,000")
+        album = mock_context.user_data['pending_album']
+        assert [tx['amount'] for tx in album] == [25000, 40000]
+
+@pytest.mark.asyncio
+async def test_handle_callback_album_confirm_saves_in_one_insert(mock_update, mock_context):
+    query = AsyncMock()
+    query.data = "album_confirm"
+    mock_update.callback_query = query
+    mock_context.user_data['pending_album'] = [
+        {'amount': 25000, 'category': 'Belanja', 'merchant': 'Indomaret', 'date': '2026-01-05', 'type': 'expense', 'receipt_hash': 1},
+        {'amount': 40000, 'category': 'Belanja', 'merchant': 'Alfamart', 'date': '2026-02-01', 'type': 'expense', 'receipt_hash': 2},
+    ]
+    with patch('handlers.callbacks.db') as mock_db, patch('handlers.callbacks.budget_mgr') as mock_bm, \
+         patch('handlers.callbacks.receipt_cache') as mock_cache, \
+         patch('handlers.callbacks.update_pinned_dashboard', new_callable=AsyncMock) as mock_dashboard:
+        mock_db.get_or_create_user.return_value = MagicMock(id=1)
+        mock_bm.check_budget_status.return_value = ""
+
+        await handle_callback(mock_update, mock_context)
+
+        mock_db.add_transactions.assert_called_once()
+        items = mock_db.add_transactions.call_args[0][1]
+        assert [i['date'] for i in items] == [datetime(2026, 1, 5), datetime(2026, 2, 1)]
+        assert mock_cache.mark_saved.call_count == 2
+        mock_bm.check_budget_status.assert_called_once_with(1, 'Belanja')
+        assert "Tersimpan 2 struk" in query.edit_message_text.call_args[0][0]
+        assert 'pending_album' not in mock_context.user_data
+        mock_dashboard.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_read_receipt_details_caches_the_full_read():
+    from handlers.callbacks import read_receipt_details
+    query = AsyncMock()
+    full = {'amount': 25000.0, 'merchant': 'INDOMARET', 'date': '05/01/2026'}
+    user_data = {
+        'pending_receipt': ("AQAD1", b"photo"),
+        'pending_tx': {'amount': 25000.0, 'category': 'Belanja', 'merchant': 'Struk Belanja', 'date': '2026-01-09'},
+    }
+    with patch('handlers.callbacks.ocr_pool') as mock_pool, patch('handlers.callbacks.receipt_cache') as mock_cache:
+        mock_pool.process = AsyncMock(return_value=full)
+        await read_receipt_details(query, user_data)
+
+        mock_pool.process.assert_awaited_once_with(b"photo", staged=False)
+        mock_cache.store.assert_called_once_with("AQAD1", full)
+        assert user_data['pending_tx']['date'] == '05/01/2026'
+        assert 'pending_receipt' not in user_data
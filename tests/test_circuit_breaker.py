@@ -0,0 +1,83 @@
+import sys
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from modules.ai_engine import AIEngine
+from modules.llm_cache import LLMCache
+from modules.nlp import NLPProcessor
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+    with patch("modules.circuit_breaker.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+def test_breaker_trips_and_short_circuits(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_success(0.1)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.is_open
+    assert not breaker.allow()
+    metrics = breaker.metrics()
+    assert metrics["trips"] == 1
+    assert metrics["short_circuits"] == 1
+
+def test_breaker_half_open_probe(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 31
+    assert breaker.allow()          # the probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()      # only one probe at a time
+    breaker.record_cancelled()      # abandoned probe frees the slot
+    assert breaker.allow()
+    breaker.record_failure()        # failed probe re-opens
+    assert breaker.state == OPEN
+    clock[0] += 31
+    assert breaker.allow()
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+
+def test_breaker_slow_call_counts_as_failure():
+    breaker = CircuitBreaker("t", failure_threshold=2, latency_budget=1.0)
+    breaker.record_success(1.5)
+    breaker.record_success(2.0)
+    assert breaker.state == OPEN
+    assert breaker.metrics()["slow_calls"] == 2
+
+def test_ai_engine_falls_back_while_open():
+    breaker = CircuitBreaker("t", failure_threshold=1)
+    breaker.record_failure()
+    nlp = NLPProcessor(cache=LLMCache(path=None), breaker=breaker)
+    ai = AIEngine(cache=LLMCache(path=None), breaker=breaker, nlp=nlp)
+    ai.client = MagicMock()
+
+    parsed = ai.parse_transaction("makan siang 25rb")
+    assert parsed["is_transaction"] is True
+    assert parsed["amount"] == 25000
+    assert ai.parse_transaction("halo bot")["is_transaction"] is False
+    assert ai.generate_smart_insight("Pengeluaran minggu ini naik 20%") == "Pengeluaran minggu ini naik 20%"
+    ai.client.chat.completions.create.assert_not_called()
+    assert nlp._llm_classify_intent("kamu siapa") is None
+
+@pytest.mark.asyncio
+async def test_async_calls_short_circuit_while_open():
+    breaker = CircuitBreaker("t", failure_threshold=1)
+    breaker.record_failure()
+    ai = AIEngine(cache=LLMCache(path=None), breaker=breaker, nlp=NLPProcessor(cache=LLMCache(path=None)))
+    ai.async_client = MagicMock()
+
+    assert await ai.generate_smart_insight_async("Boros di Makanan") == "Boros di Makanan"
+    assert (await ai.parse_transaction_async("bensin 50rb"))["amount"] == 50000
+    ai.async_client.chat.completions.create.assert_not_called()
@@ -6,7 +6,9 @@ from sqlalchemy.orm import sessionmaker
 from database.models import Base, User, Transaction
 from database.db_handler import DBHandler
 from modules.ai_engine import AIEngine
-from modules.analysis import ExpenseAnalyzer
+from datetime import datetime, timedelta
+from modules.analysis import ExpenseAnalyzer, serialize_insight_summary, format_insight_summary
+from modules.llm import estimate_tokens
 
 @pytest.fixture
 def db_setup():
@@ -124,3 +126,106 @@ def test_db_handler_advanced_features(db_setup):
     # 5. Test saving goals progress failure
     result = db.update_saving_progress(user.id, 999, 1000) # Non-existent goal
     assert result is None
+
+def test_db_handler_bulk_add_transactions(db_setup):
+    db, user = db_setup
+    db.set_budget(user.id, "Makanan", 100000)
+
+    items = [
+        {"amount": 20000, "category": "Makanan", "description": "kopi", "type": "expense"},
+        {"amount": 30000, "category": "Makanan", "description": "bakso", "type": "expense"},
+        {"amount": 5000, "category": "Transportasi", "description": "parkir", "type": "expense"},
+        {"amount": 1000000, "category": "Gaji", "description": "bonus", "type": "income"},
+        # A receipt from an album dated last year counts against that month's budget, not this one
+        {"amount": 15000, "category": "Makanan", "description": "struk lama", "type": "expense",
+         "date": datetime(datetime.now().year - 1, 1, 5)},
+    ]
+    txs = db.add_transactions(user.id, items)
+
+    assert len(txs) == 5
+    assert txs[-1].date.year == datetime.now().year - 1
+    assert len(db.get_transactions_history(user.id)) == 5
+    budget = db.get_user_budgets(user.id)[0]
+    assert budget.current_usage == 50000
+
+def test_insight_summary_from_aggregates(db_setup):
+    db, user = db_setup
+    now = datetime(2026, 3, 20, 12, 0)
+    rows = [
+        (40000, "Makanan", datetime(2026, 3, 18, 20, 0)),
+        (20000, "Makanan", datetime(2026, 3, 16, 9, 0)),
+        (15000, "Transportasi", datetime(2026, 3, 17, 8, 0)),
+        (30000, "Makanan", datetime(2026, 3, 10, 12, 0)),
+        (10000, "Transportasi", datetime(2026, 3, 9, 21, 0)),
+        (900000, "Belanja", datetime(2026, 3, 2, 22, 0)),
+        (50000, "Makanan", datetime(2026, 2, 25, 12, 0)),  # last month
+    ]
+    for amount, category, date in rows:
+        db.add_transaction(user.id, amount, category, category, "expense", trans_date=date)
+    db.add_transaction(user.id, 5000000, "Gaji", "gaji", "income", trans_date=datetime(2026, 3, 1, 9, 0))
+    db.add_monthly_income(user.id, 5000000)
+
+    assert db.get_category_totals(user.id, datetime(2026, 3, 1))["Makanan"] == (90000, 3)
+    assert db.get_hourly_totals(user.id, datetime(2026, 3, 1))[20] == 40000
+
+    summary = ExpenseAnalyzer(db).build_insight_summary(user.id, now=now)
+    assert summary["spent"] == 1015
+    assert summary["tx"] == 6
+    assert list(summary["cat"]) == ["Belanja", "Makanan", "Transportasi"]
+    assert summary["week"] == [75, 40]
+    assert summary["wow"] == {"Makanan": 100, "Transportasi": 50}
+    assert summary["night_pct"] == 94
+    assert summary["anomalies"] == [{"cat": "Belanja", "rb": 900, "x": 5.3, "date": "02/03"}]
+    assert summary["savings_pct"] == 80
+
+    assert "Belanja" in format_insight_summary(summary)
+    assert ExpenseAnalyzer(db).build_insight_summary(user.id, now=datetime(2026, 5, 1)) is None
+
+def test_insight_summary_respects_token_budget():
+    summary = {
+        "month": "2026-03", "day": 20, "spent": 4200, "tx": 80,
+        "cat": {f"Kategori{i}": 1000 - i * 100 for i in range(8)},
+        "week": [900, 700],
+        "wow": {f"Kategori{i}": 10 * i for i in range(8)},
+        "night_pct": 35,
+        "anomalies": [{"cat": "Belanja", "rb": 900, "x": 5.3, "date": "02/03"}] * 3,
+        "income": 5000, "savings_pct": 16,
+    }
+    full = serialize_insight_summary(summary, token_budget=1000)
+    assert json.loads(full) == summary
+
+    compact = serialize_insight_summary(summary, token_budget=60)
+    assert estimate_tokens(compact) <= 60
+    trimmed = json.loads(compact)
+    assert "lainnya" in trimmed["cat"]
+    assert trimmed["spent"] == 4200 and trimmed["savings_pct"] == 16
+
+def test_insight_prompt_data_fits_token_budget(db_setup, mock_ai):
+    db, user = db_setup
+    now = datetime(2026, 3, 20, 12, 0)
+    rows = [
+        (40000, "Makanan", datetime(2026, 3, 18, 20, 0)),
+        (20000, "Makanan", datetime(2026, 3, 16, 9, 0)),
+        (15000, "Transportasi", datetime(2026, 3, 17, 8, 0)),
+        (30000, "Makanan", datetime(2026, 3, 10, 12, 0)),
+        (900000, "Belanja", datetime(2026, 3, 2, 22, 0)),
+    ]
+    for amount, category, date in rows:
+        db.add_transaction(user.id, amount, category, category, "expense", trans_date=date)
+    db.add_monthly_income(user.id, 5000000)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return now
+
+    analyzer = ExpenseAnalyzer(db)
+    with patch("modules.analysis.datetime", FrozenDatetime):
+        old_text = analyzer.analyze_patterns(user.id)
+    prompt = mock_ai._insight_prompt(analyzer.build_insight_summary(user.id, now=now))
+    lines = [line.strip() for line in prompt.split("Data:", 1)[1].splitlines()]
+    data = "\n".join(lines[1:lines.index("", 1)])
+
+    assert data.startswith("Ribu Rp")
+    assert estimate_tokens(data) <= 80
+    assert estimate_tokens(data) < estimate_tokens(old_text)
@@ -0,0 +1,137 @@
+import sys
+import os
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.llm_admission import AdmissionController, AdmissionRejected, THROTTLED, SHED
+from modules.llm_batch import ParseBatcher
+from modules.llm_cache import LLMCache
+from modules.llm_metrics import LLMMetrics
+from modules.ai_engine import AIEngine
+from modules.nlp import NLPProcessor
+
+@pytest.fixture
+def clock():
+    now = [1000.0]
+    with patch("modules.llm_admission.time.monotonic", side_effect=lambda: now[0]):
+        yield now
+
+def _response(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 5
+    return response
+
+# --- LLM ADMISSION TESTS ---
+def test_quota_reserves_bucket_for_parsing(clock):
+    admission = AdmissionController(rate_per_min=6, burst=4)
+    # Chat must leave half the bucket, so only 2 chats pass...
+    admission.charge(1, "chat")
+    admission.charge(1, "chat")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.charge(1, "chat")
+    assert rejected.value.reason == THROTTLED
+    # ...while parsing can still use the rest
+    admission.charge(1, "parse")
+    admission.charge(1, "parse")
+    with pytest.raises(AdmissionRejected):
+        admission.charge(1, "parse")
+    # Other users and calls without a user are unaffected
+    admission.charge(2, "chat")
+    admission.charge(None, "chat")
+
+    # 6/min refills one call every 10s
+    clock[0] += 10
+    admission.charge(1, "parse")
+
+    usage = admission.usage(1)
+    assert usage["calls"] == 5
+    assert usage["throttled"] == 2
+    assert usage["features"] == {"chat": 2, "parse": 3}
+    assert usage["tokens"] == 0
+    assert admission.usage(99) is None
+    assert admission.metrics()["throttled"] == 2
+
+def test_concurrency_limit_serves_higher_priority_first():
+    admission = AdmissionController(burst=100, max_concurrency=1, queue_timeout=1)
+    order = []
+
+    async def run(feature, hold=0.0):
+        async with admission.admit(None, feature):
+            order.append(feature)
+            await asyncio.sleep(hold)
+
+    async def main():
+        first = asyncio.create_task(run("insight", hold=0.05))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(run(feature)) for feature in ("chat", "intent", "parse")]
+        await asyncio.sleep(0.01)
+        assert admission.metrics()["waiting"] == 3
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(main())
+    assert order == ["insight", "parse", "intent", "chat"]
+    metrics = admission.metrics()
+    assert (metrics["active"], metrics["waiting"], metrics["admitted"]) == (0, 0, 4)
+
+def test_queue_timeout_sheds_call():
+    admission = AdmissionController(burst=100, max_concurrency=1, queue_timeout=0.05)
+
+    async def main():
+        async with admission.admit(1, "parse"):
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with admission.admit(1, "chat"):
+                    pass
+            assert rejected.value.reason == SHED
+        # The slot is free again
+        async with admission.admit(1, "chat"):
+            pass
+
+    asyncio.run(main())
+    usage = admission.usage(1)
+    assert usage["shed"] == 1
+    # The shed call is refunded: only the two calls that ran are charged
+    assert usage["calls"] == 2 and usage["features"] == {"parse": 1, "chat": 1}
+    assert usage["tokens"] >= 98
+    assert admission.metrics()["active"] == 0
+
+def test_engine_degrades_over_quota(clock):
+    admission = AdmissionController(burst=2)
+    metrics = LLMMetrics(path=None)
+    nlp = NLPProcessor(cache=LLMCache(path=None), metrics=metrics, admission=admission)
+    ai = AIEngine(cache=LLMCache(path=None), nlp=nlp, metrics=metrics, admission=admission)
+    ai.async_client = MagicMock()
+    ai.async_client.chat.completions.create = AsyncMock(return_value=_response("Hai!"))
+
+    async def run():
+        # Chat may only use half the bucket of 2
+        assert await ai.chat_response_async("halo", "Budi", user_id=7) == "Hai!"
+        assert await ai.chat_response_async("halo lagi", "Budi", user_id=7) == "Halo Budi! Ada yang bisa aku bantu catat hari ini? 💸"
+        ai.async_client.chat.completions.create = AsyncMock(return_value=_response('{"amount": 7000, "is_transaction": true}'))
+        assert (await ai.parse_transaction_async("cilok goceng", user_id=7))["amount"] == 7000
+        # Over quota, the local rules parse instead
+        return await ai.parse_transaction_async("kopi 20rb", user_id=7)
+
+    parsed = asyncio.run(run())
+    assert parsed["amount"] == 20000
+    assert ai.async_client.chat.completions.create.await_count == 1
+    assert metrics.metrics()[f"chat/{ai.model}"]["outcomes"] == {"ok": 1, "throttled": 1}
+    assert metrics.metrics()[f"parse/{ai.model}"]["outcomes"] == {"ok": 1, "throttled": 1}
+
+def test_batcher_charges_each_user():
+    ai = MagicMock()
+    ai.admission = AdmissionController(burst=1)
+    ai._rule_based_parse.side_effect = lambda text: {"rules": text}
+    ai.parse_transaction_async = AsyncMock(return_value={"llm": True})
+    batcher = ParseBatcher(ai, max_wait_ms=1)
+
+    async def run():
+        return [await batcher.parse("beli cilok", user_id=3), await batcher.parse("beli sate", user_id=3)]
+
+    assert asyncio.run(run()) == [{"llm": True}, {"rules": "beli sate"}]
+    assert batcher.stats["throttled"] == 1
@@ -0,0 +1,112 @@
+import sys
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.circuit_breaker import CircuitBreaker
+from modules.llm_cache import LLMCache
+from modules.ai_engine import AIEngine
+
+def _response(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
+
+# --- LLM CACHE TESTS ---
+def test_llm_cache_memory_tier():
+    cache = LLMCache(path=None)
+    key = cache.make_key("model", "chat", "Halo  Bot")
+    # Case and whitespace do not change the key
+    assert key == cache.make_key("model", "chat", "halo bot")
+    assert key != cache.make_key("other-model", "chat", "halo bot")
+
+    assert cache.get(key) is None
+    cache.set(key, "Halo juga!", latency=0.8)
+    assert cache.get(key) == "Halo juga!"
+    assert cache.get(key) == "Halo juga!"
+
+    stats = cache.stats()["chat"]
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["latency_saved"] == pytest.approx(1.6)
+
+def test_llm_cache_disk_tier_and_ttl(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(path=path, ttls={"intent": 60})
+    key = cache.make_key("model", "intent", "kamu siapa")
+    cache.set(key, {"intent": "GREETING", "confidence": 0.9}, latency=0.5)
+
+    # A fresh instance (e.g. after a restart) reads it back from disk
+    restarted = LLMCache(path=path, ttls={"intent": 60})
+    assert restarted.get(key) == {"intent": "GREETING", "confidence": 0.9}
+    assert restarted.stats()["intent"]["disk_hits"] == 1
+
+    with patch("modules.llm_cache.time.time", return_value=10**10):
+        assert restarted.get(key) is None
+        assert LLMCache(path=path).get(key) is None
+
+def test_llm_cache_lru_and_scopes():
+    cache = LLMCache(path=None, max_entries=2)
+    keys = [cache.make_key("m", "parse", f"kopi {i}rb") for i in range(3)]
+    for key in keys:
+        cache.set(key, {"amount": 1})
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == {"amount": 1}
+
+    insight = cache.make_key("m", "insight", "data", 7)
+    cache.set(insight, "Boros!", scope="user:7")
+    cache.invalidate_user(8)
+    assert cache.get(insight) == "Boros!"
+    cache.invalidate_user(7)
+    assert cache.get(insight) is None
+
+def test_ai_engine_uses_cache():
+    # A breaker that never trips, so the failing retries below do not short-circuit
+    ai = AIEngine(cache=LLMCache(path=None), breaker=CircuitBreaker("test", failure_threshold=100))
+    ai.client = MagicMock()
+    ai.client.chat.completions.create.return_value = _response("Halo kak!")
+
+    assert ai.chat_response("halo") == "Halo kak!"
+    assert ai.chat_response("Halo ") == "Halo kak!"
+    assert ai.client.chat.completions.create.call_count == 1
+
+    # Failures are not cached
+    ai.client.chat.completions.create.side_effect = Exception("down")
+    with patch("modules.ai_engine.time.sleep"):
+        assert "capek" in ai.generate_smart_insight("data", user_id=1)
+    ai.client.chat.completions.create.side_effect = None
+    ai.client.chat.completions.create.return_value = _response("Hemat!")
+    assert ai.generate_smart_insight("data", user_id=1) == "Hemat!"
+    assert ai.generate_smart_insight("data", user_id=1) == "Hemat!"
+    assert ai.client.chat.completions.create.call_count == 5
+
+def test_insight_cache_invalidated_on_new_transaction(db_handler):
+    cache = LLMCache(path=None)
+    db_handler.transaction_listeners.append(cache.invalidate_user)
+    user = db_handler.get_or_create_user(111, "cache_user")
+
+    ai = AIEngine(cache=cache)
+    ai.client = MagicMock()
+    ai.client.chat.completions.create.return_value = _response("Insight lama")
+    assert ai.generate_smart_insight("data", user_id=user.id) == "Insight lama"
+
+    db_handler.add_transaction(user.id, 20000, "Makanan", "kopi")
+    ai.client.chat.completions.create.return_value = _response("Insight baru")
+    assert ai.generate_smart_insight("data", user_id=user.id) == "Insight baru"
+
+@pytest.fixture
+def db_handler():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database.models import init_db
+    from database.db_handler import DBHandler
+    engine = create_engine("sqlite:///:memory:")
+    init_db(engine)
+    session = sessionmaker(bind=engine)()
+    session.is_mock = True # Skip migration
+    yield DBHandler(session=session)
+    session.close()
+    engine.dispose()
@@ -0,0 +1,90 @@
+import sys
+import os
+import asyncio
+import pytest
+from unittest.mock import MagicMock, AsyncMock, patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.circuit_breaker import CircuitBreaker
+from modules.llm_cache import LLMCache
+from modules.llm_metrics import LLMMetrics, estimate_cost
+from modules.ai_engine import AIEngine
+from modules.nlp import NLPProcessor
+
+def _response(content, prompt_tokens=100, completion_tokens=20):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+# --- LLM METRICS TESTS ---
+def test_metrics_per_feature_with_cache_hits():
+    metrics = LLMMetrics(path=None)
+    ai = AIEngine(cache=LLMCache(path=None), metrics=metrics)
+    ai.client = MagicMock()
+    ai.client.chat.completions.create.return_value = _response('{"amount": 20000, "is_transaction": true}')
+
+    ai.parse_transaction("kopi 20rb")
+    ai.parse_transaction("kopi 20rb")
+    ai.client.chat.completions.create.return_value = _response("Halo!", 50, 10)
+    ai.chat_response("halo")
+
+    stats = metrics.metrics()
+    parse = stats[f"parse/{ai.model}"]
+    assert parse["calls"] == 2
+    assert parse["outcomes"] == {"ok": 1, "cache": 1}
+    assert parse["cache_hits"] == 1
+    assert parse["prompt_tokens"] == 100
+    assert parse["completion_tokens"] == 20
+    assert parse["cost_usd"] == pytest.approx(estimate_cost(ai.model, 100, 20))
+    assert set(parse["latency_ms"]) == {"p50", "p95", "p99"}
+    assert stats[f"chat/{ai.model}"]["prompt_tokens"] == 50
+
+def test_metrics_count_async_retries_and_failures():
+    metrics = LLMMetrics(path=None)
+    ai = AIEngine(cache=LLMCache(path=None), metrics=metrics)
+    ai.async_client = MagicMock()
+    ai.async_client.chat.completions.create = AsyncMock(side_effect=[RuntimeError("503"), _response("Hemat ya!")])
+
+    async def run():
+        with patch("modules.llm.backoff_delay", return_value=0.01):
+            assert await ai.generate_smart_insight_async({"data": "x"}) == "Hemat ya!"
+        ai.async_client.chat.completions.create = AsyncMock(side_effect=RuntimeError("down"))
+        await ai.chat_response_async("halo")
+
+    asyncio.run(run())
+    stats = metrics.metrics()
+    insight = stats[f"insight/{ai.model}"]
+    assert insight["retries"] == 1
+    assert insight["outcomes"] == {"ok": 1}
+    assert stats[f"chat/{ai.model}"]["outcomes"] == {"error": 1}
+
+def test_metrics_circuit_open_outcome():
+    breaker = CircuitBreaker("t", failure_threshold=1)
+    breaker.record_failure()
+    metrics = LLMMetrics(path=None)
+    nlp = NLPProcessor(cache=LLMCache(path=None), breaker=breaker, metrics=metrics)
+    assert nlp._llm_classify_intent("kamu siapa") is None
+    assert metrics.metrics()["intent/llama-3.3-70b-versatile"]["outcomes"] == {"circuit_open": 1}
+
+def test_metrics_daily_persistence(tmp_path):
+    path = str(tmp_path / "llm_metrics.db")
+    metrics = LLMMetrics(path=path)
+    with metrics.track("parse", "llama-3.3-70b-versatile") as call:
+        call.succeeded(_response("{}", 100, 20))
+    with metrics.track("parse", "llama-3.3-70b-versatile") as call:
+        call.cache_hit = True
+    with pytest.raises(ValueError):
+        with metrics.track("parse", "llama-3.3-70b-versatile"):
+            raise ValueError("bad json")
+
+    # A new instance reads the same daily totals back
+    rows = LLMMetrics(path=path).daily()
+    assert len(rows) == 1
+    row = rows[0]
+    assert (row["feature"], row["calls"], row["cache_hits"], row["errors"]) == ("parse", 3, 1, 1)
+    assert row["prompt_tokens"] == 100
+    assert LLMMetrics(path=None).daily() == []
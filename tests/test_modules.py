@@ -9,12 +9,15 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from modules.nlp import NLPProcessor
 from modules.ocr import OCRProcessor
+from modules.ocr_preprocess import ReceiptPreprocessor, decode_image
 from modules.rules import RuleEngine
 from modules.budget import BudgetManager
 from modules.analysis import ExpenseAnalyzer
 from modules.ai_engine import AIEngine
 from utils.visuals import VisualReporter
 from unittest.mock import patch
+from hypothesis import given, strategies as st
+from modules.nlp import parse_amount
 
 # --- VISUAL REPORTER TESTS ---
 def test_visual_reporter():
@@ -83,11 +86,128 @@ def test_nlp_process_text():
     assert nlp.process_text("kopi 25k")[0] == 25000
     assert nlp.process_text("beli sepatu 500.000")[0] == 500000
 
+def test_nlp_process_batch():
+    nlp = NLPProcessor()
+    lines = [
+        "makan siang 50rb",
+        "gaji masuk 5jt",
+        "kopi 25 k",
+        "beli sepatu 500.000",
+        "Rp 1.250.000 bayar listrik",
+        "transfer masuk 1,5jt",
+        "berobat ke rumah sakit 300rb",
+        "halo apa kabar",
+        "",
+    ]
+    result = nlp.process_batch(lines)
+    categories = result["categories"]
+
+    assert len(result["amounts"]) == len(lines)
+    for i, line in enumerate(lines):
+        amount, category, type_ = nlp.process_text(line)
+        assert result["amounts"][i] == amount
+        assert categories[result["category_codes"][i]] == category
+        assert result["types"][i] == type_
+
+def test_nlp_process_batch_edge_cases():
+    nlp = NLPProcessor()
+    empty = nlp.process_batch([])
+    assert len(empty["amounts"]) == 0
+    assert len(empty["category_codes"]) == 0
+
+    # A malformed amount only zeroes its own line
+    result = nlp.process_batch(["beli 1.2.3jt", "parkir 5rb"])
+    assert list(result["amounts"]) == [0.0, 5000.0]
+    assert result["categories"][result["category_codes"][1]] == "Transportasi"
+
+    # Numbers that touch stay separate chunks (process_text glues them together)
+    assert nlp.process_batch(["makan 50rb3 jt"])["amounts"][0] == 3000000.0
+
+def test_nlp_split_items():
+    nlp = NLPProcessor()
+    items = nlp.split_items("kopi 20rb, parkir 5rb, bensin 50rb")
+    assert [i["amount"] for i in items] == [20000, 5000, 50000]
+    assert [i["category"] for i in items] == ["Makanan", "Transportasi", "Transportasi"]
+    assert items[0]["description"] == "kopi 20rb"
+
+    # Decimal and thousand commas are not item separators
+    assert len(nlp.split_items("gaji 1,5jt")) == 1
+    assert nlp.split_items("beli sepatu 100,000")[0]["amount"] == 100000
+
+    # Fragments without an amount stay with their item
+    items = nlp.split_items("makan dan minum 50rb\ngaji 2jt")
+    assert items[0]["description"] == "makan dan minum 50rb"
+    assert items[0]["amount"] == 50000
+    assert items[1]["type"] == "income"
+    assert len(nlp.split_items("makan dan minum 50rb")) == 1
+    # "dan" between two priced items still separates them
+    items = nlp.split_items("kopi 20rb dan parkir 5rb")
+    assert [i["description"] for i in items] == ["kopi 20rb", "parkir 5rb"]
+    assert nlp.split_items("halo") == []
+
+def test_parse_amount():
+    assert parse_amount("50000") == 50000
+    assert parse_amount("50rb") == 50000
+    assert parse_amount("25 K") == 25000
+    assert parse_amount("1,5jt") == 1500000
+    assert parse_amount("1.5jt") == 1500000
+    assert parse_amount("Rp 1.250.000") == 1250000
+    assert parse_amount("310.000,00") == 310000
+    assert parse_amount("2 juta") == 2000000
+    for bad in ["", "abc", "rb", "1.2.3jt", "12,34,5", "-5000"]:
+        with pytest.raises(ValueError):
+            parse_amount(bad)
+
+@given(st.integers(min_value=0, max_value=10**12))
+def test_parse_amount_integers(n):
+    assert parse_amount(str(n)) == n
+    assert parse_amount(f"{n:,}") == n
+    assert parse_amount(f"{n:,}".replace(",", ".")) == n
+    assert parse_amount(f"Rp{n:,}".replace(",", ".")) == n
+
+@given(st.integers(min_value=0, max_value=10**6), st.sampled_from(["rb", "k", "ribu", "jt", "juta"]), st.sampled_from(["", " "]))
+def test_parse_amount_suffixes(n, suffix, space):
+    factor = 1000000 if suffix in ("jt", "juta") else 1000
+    assert parse_amount(f"{n}{space}{suffix}") == n * factor
+
+@given(st.integers(min_value=0, max_value=999), st.integers(min_value=0, max_value=9), st.sampled_from([",", "."]))
+def test_parse_amount_decimal_suffix(whole, tenth, sep):
+    # Agrees with the free-text path ("1,5jt" in a message)
+    text = f"{whole}{sep}{tenth}jt"
+    assert parse_amount(text) == (whole * 10 + tenth) * 100000
+    if whole or tenth:
+        assert parse_amount(text) == NLPProcessor()._extract_amount(f"gaji {text}")
+
+@given(st.text())
+def test_parse_amount_never_crashes(text):
+    try:
+        assert parse_amount(text) >= 0
+    except ValueError:
+        pass
+
 def test_nlp_extract_merchant():
     nlp = NLPProcessor()
     assert nlp.extract_merchant("ngopi di mixue 48rb") == "Mixue"
     assert nlp.extract_merchant("beli bensin pertamina 100k") == "Pertamina"
 
+    # Known merchants are canonicalised, including typos and multi-word aliases
+    assert nlp.extract_merchant("ngopi di strabucks 30rb") == "Starbucks"
+    assert nlp.extract_merchant("Pembayaran QRIS Rp85.000 di KOPI KENANGAN") == "Kopi Kenangan"
+    assert nlp.merchants.canonicalize("STARBUCKS COFFEE GRAND INDONESIA") == "Starbucks"
+    assert nlp.merchants.canonicalize("Toko Jaya") == "Toko Jaya"
+
+    # Words that merely contain or resemble a merchant's name are not that merchant
+    for name in ("FOREVER BAKERY", "TOKO SHELLY", "Steamboat House", "Centurion", "Century 21 Realty", "Grabbag store",
+                 "Steak House"):
+        assert nlp.merchants.canonicalize(name) == name
+    assert nlp.extract_merchant("beli forest 50rb") == "Forest"
+    # Ordinary words that start a merchant's name are not that merchant either
+    assert nlp.extract_merchant("isi solar 200rb") == "Solar"
+    assert nlp.extract_merchant("guard 20rb") == "Guard"
+    for name in ("SOLAR", "Guard Post", "Indomie Goreng", "Alfa Cell"):
+        assert nlp.merchants.canonicalize(name) == name
+    assert nlp.merchants.canonicalize("netflx") == "Netflix"
+
 # --- OCR TESTS ---
 def test_ocr_cleaning():
     ocr = OCRProcessor()
@@ -95,6 +215,49 @@ def test_ocr_cleaning():
     assert ocr._clean_amount("1.250.000,00") == 1250000.0
     assert ocr._clean_amount("Total: 75,000") == 75000.0
 
+def test_ocr_reads_photo_bytes_in_memory():
+    import cv2
+    import numpy as np
+    pixels = np.full((40, 60, 3), 255, np.uint8)
+    photo = bytearray(cv2.imencode(".png", pixels)[1].tobytes())
+    assert decode_image(photo).shape == (40, 60, 3)
+    assert decode_image(pixels) is pixels
+    with pytest.raises(ValueError):
+        decode_image(b"not an image")
+
+    # The reader gets the decoded array, never a file path
+    ocr = OCRProcessor(preprocessor=ReceiptPreprocessor(steps=()))
+    ocr._reader = MagicMock()
+    ocr._reader.readtext.return_value = [([], "INDOMARET", 0.9), ([], "TOTAL 25.000", 0.9)]
+    assert ocr.process_receipt(photo)["amount"] == 25000.0
+    assert ocr._reader.readtext.call_args[0][0].shape == (40, 60, 3)
+
+def test_ocr_staged_reads_total_region_first():
+    import numpy as np
+    # Detected rows top to bottom: merchant, date, item, total
+    rows = {10: "INDOMARET", 30: "TGL 01/02/2026", 50: "KOPI 25.000", 90: "TOTAL 25.000"}
+    boxes = [[0, 100, y - 5, y + 5] for y in rows]
+
+    def recognize(image, horizontal_list, free_list):
+        return [([[b[0], b[2]], [b[1], b[2]], [b[1], b[3]], [b[0], b[3]]], rows[b[2] + 5], 0.9) for b in horizontal_list]
+
+    ocr = OCRProcessor(preprocessor=ReceiptPreprocessor(steps=()))
+    ocr._reader = MagicMock()
+    ocr._reader.detect.return_value = ([boxes], [[]])
+    ocr._reader.recognize.side_effect = recognize
+    pixels = np.full((100, 100), 255, np.uint8)
+
+    result = ocr.process_receipt(pixels, staged=True)
+    assert (result["amount"], result["merchant"], result["partial"]) == (25000.0, None, True)
+    # Only the bottom half of the receipt was recognised
+    assert [b[2] + 5 for b in ocr._reader.recognize.call_args.kwargs["horizontal_list"]] == [50, 90]
+
+    # No total label at the bottom: the rest is recognised and the read completes as a full one
+    rows[90] = "TERIMA KASIH"
+    result = ocr.process_receipt(pixels, staged=True)
+    assert (result["amount"], result["merchant"], result["date"]) == (25000.0, "INDOMARET", "01/02/2026")
+    assert "partial" not in result and "recognize_rest" in result["timings"]
+
 # --- RULE ENGINE TESTS ---
 def test_rule_engine():
     rules = RuleEngine()
@@ -0,0 +1,91 @@
+import sys
+import os
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ocr_backends import CascadeBackend, OCRBackend, TesseractBackend, make_backend, tesseract_results
+from modules.ocr import OCRProcessor
+from modules.ocr_preprocess import ReceiptPreprocessor
+
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+def _word(line, left, width, conf, text, top=0):
+    return f"5\t1\t1\t1\t{line}\t1\t{left}\t{top}\t{width}\t20\t{conf}\t{text}"
+
+class FakeBackend(OCRBackend):
+    def __init__(self, results, fail=False):
+        self.results = results
+        self.fail = fail
+        self.calls = 0
+
+    def load(self):
+        if self.fail:
+            raise RuntimeError("not installed")
+
+    def readtext(self, image):
+        self.calls += 1
+        return self.results
+
+# --- OCR BACKEND TESTS ---
+def test_tesseract_tsv_lines_split_at_column_gaps():
+    tsv = "\n".join([
+        TSV_HEADER,
+        "4\t1\t1\t1\t1\t0\t0\t0\t400\t20\t-1\t",
+        _word(1, 10, 50, 96, "TOTAL"), _word(1, 70, 60, 90, "BAYAR"), _word(1, 300, 80, 93, "25.000"),
+        _word(2, 10, 60, 40, "KOPI", top=30), _word(2, 80, 0, -1, " ", top=30),
+    ])
+    results = tesseract_results(tsv)
+    assert [text for _, text, _ in results] == ["TOTAL BAYAR", "25.000", "KOPI"]
+    assert results[0][0] == [[10, 0], [130, 0], [130, 20], [10, 20]]
+    assert results[0][2] == pytest.approx(0.93)
+    assert results[2][2] == pytest.approx(0.40)
+
+def test_cascade_keeps_confident_fast_reads_and_falls_back_otherwise():
+    box = [[0, 0], [10, 0], [10, 10], [0, 10]]
+    fast = FakeBackend([(box, "TOTAL 25.000", 0.9)])
+    accurate = FakeBackend([(box, "TOTAL 26.000", 0.99)])
+    cascade = CascadeBackend(fast, accurate, min_confidence=0.8)
+    cascade.load()
+    assert cascade.readtext(None)[0][1] == "TOTAL 25.000"
+
+    fast.results = [(box, "T0TAL 2S.0O0", 0.5)]
+    assert cascade.readtext(None)[0][1] == "TOTAL 26.000"
+    fast.results = []
+    assert cascade.readtext(None)[0][1] == "TOTAL 26.000"
+    assert (cascade.reads, cascade.fallbacks, fast.calls) == (3, 2, 3)
+
+    # Without the fast backend every read goes to the accurate one
+    cascade = CascadeBackend(FakeBackend([], fail=True), accurate)
+    cascade.load()
+    assert cascade.readtext(None)[0][1] == "TOTAL 26.000"
+
+def test_backend_selection_and_missing_tesseract(monkeypatch):
+    assert make_backend("tesseract").name == "tesseract"
+    assert make_backend("cascade").name == "cascade"
+    with pytest.raises(ValueError):
+        make_backend("paddle")
+
+    monkeypatch.setattr("modules.ocr_backends.shutil.which", lambda name: None)
+    ocr = OCRProcessor(backend=TesseractBackend(path="/nonexistent/tesseract"))
+    assert ocr.reader is None
+    assert ocr.process_receipt(b"not read") is None
+
+def test_staged_reads_need_a_staged_backend():
+    import numpy as np
+    box = [[0, 0], [10, 0], [10, 10], [0, 10]]
+    backend = FakeBackend([(box, "INDOMARET", 0.9), (box, "TOTAL 25.000", 0.9)])
+    ocr = OCRProcessor(preprocessor=ReceiptPreprocessor(steps=()), backend=backend)
+    result = ocr.process_receipt(np.zeros((40, 60, 3), dtype=np.uint8), staged=True)
+    assert result["amount"] == 25000.0 and result["merchant"] == "INDOMARET"
+    assert "partial" not in result and backend.calls == 1
+
+def test_processor_unload_drops_the_model_until_the_next_read():
+    backend = FakeBackend([])
+    backend.unload = lambda: setattr(backend, "unloaded", True)
+    ocr = OCRProcessor(backend=backend)
+    assert ocr.reader is backend and ocr.loaded and ocr.load_ms is not None
+    ocr.unload()
+    assert not ocr.loaded and backend.unloaded
+    assert ocr.reader is backend
@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import asyncio
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ocr_pool import OCRPool, OCRQueueFull
+
+class FakeOCR:
+    """Picklable stand-in for OCRProcessor: "slow" receipts take 0.3s, "bad" ones fail."""
+    def __init__(self):
+        self.pid = os.getpid()
+
+    def process_receipt(self, image, staged=False):
+        if image.startswith("bad"):
+            raise ValueError("unreadable receipt")
+        time.sleep(0.3 if image.startswith("slow") else 0.01)
+        return {"amount": 10000.0, "merchant": image, "pid": self.pid, "staged": staged,
+                "timings": {"crop": 5.0, "ocr": 300.0}}
+
+# --- OCR POOL TESTS ---
+def test_pool_queue_positions_and_backpressure():
+    pool = OCRPool(FakeOCR, workers=1, max_queue=2, job_timeout=30)
+
+    async def run():
+        # Warm-up: the worker process starts and builds its processor once
+        first = await pool.process("warm.jpg")
+        running = pool.submit("slow-1.jpg")
+        await asyncio.sleep(0.1)
+        assert running.position == 0 and pool.saturated
+        queued = [pool.submit("slow-2.jpg"), pool.submit("slow-3.jpg")]
+        assert [job.position for job in queued] == [1, 2]
+        with pytest.raises(OCRQueueFull):
+            pool.submit("slow-4.jpg")
+        results = [await job.result() for job in [running] + queued]
+        await pool.shutdown()
+        return first, results
+
+    first, results = asyncio.run(run())
+    assert [r["merchant"] for r in results] == ["slow-1.jpg", "slow-2.jpg", "slow-3.jpg"]
+    # Every job ran in the same long-lived worker, not in the test process
+    assert {r["pid"] for r in results} == {first["pid"]} != {os.getpid()}
+    metrics = pool.metrics()
+    assert (metrics["submitted"], metrics["completed"], metrics["rejected"]) == (4, 4, 1)
+    assert metrics["service_ms"]["p50"] > 0
+    assert metrics["steps_p50_ms"] == {"crop": 5.0, "ocr": 300.0}
+
+def test_pool_deadlines_and_errors():
+    pool = OCRPool(FakeOCR, workers=1, max_queue=5, job_timeout=30)
+
+    async def run():
+        await pool.process("warm.jpg")
+        with pytest.raises(ValueError):
+            await pool.process("bad.jpg")
+        slow = pool.submit("slow-1.jpg")
+        # Still queued behind slow-1 when its deadline passes: skipped, never run
+        expiring = pool.submit("slow-2.jpg", timeout=0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await expiring.result()
+        assert (await slow.result())["merchant"] == "slow-1.jpg"
+        # The worker is still usable afterwards, and gets the job's options
+        result = await pool.process("ok.jpg", staged=True)
+        await pool.shutdown()
+        return result
+
+    result = asyncio.run(run())
+    assert (result["merchant"], result["staged"]) == ("ok.jpg", True)
+    metrics = pool.metrics()
+    assert (metrics["failed"], metrics["timeouts"], metrics["completed"]) == (1, 1, 3)
+
+def test_pool_warm_up_and_idle_unload():
+    pool = OCRPool(FakeOCR, workers=1, max_queue=5, job_timeout=30, idle_unload=0.2)
+
+    async def run():
+        await pool.warm_up()
+        warm = pool.metrics()["model"]
+        await asyncio.sleep(0.5)
+        unloaded = pool.metrics()["model"]
+        # The next receipt brings the workers back
+        result = await pool.process("ok.jpg")
+        await pool.shutdown()
+        return warm, unloaded, result
+
+    warm, unloaded, result = asyncio.run(run())
+    assert warm["loaded"] and warm["loads"] == 1 and len(warm["workers"]) == 1
+    (worker,) = warm["workers"].values()
+    assert worker["load_ms"] >= 0 and not worker["preloaded"]
+    assert (unloaded["loaded"], unloaded["unloads"], unloaded["workers"]) == (False, 1, {})
+    assert result["merchant"] == "ok.jpg"
+    assert pool.metrics()["model"]["loads"] == 2
+    pool.unload()
+
+def test_pool_preload_forks_workers_with_the_model():
+    pool = OCRPool(FakeOCR, workers=2, max_queue=5, job_timeout=30, preload=True)
+
+    async def run():
+        await pool.warm_up()
+        results = await asyncio.gather(pool.process("a.jpg"), pool.process("b.jpg"))
+        await pool.shutdown()
+        return results
+
+    try:
+        results = asyncio.run(run())
+        model = pool.metrics()["model"]
+    finally:
+        pool.unload()
+    # The processor was built once, here, and every worker runs that same copy
+    assert {r["pid"] for r in results} == {os.getpid()}
+    assert model["preload_ms"] is not None
+    assert model["workers"] and all(w["preloaded"] for w in model["workers"].values())
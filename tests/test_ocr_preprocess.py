@@ -0,0 +1,55 @@
+import sys
+import os
+import random
+import pytest
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.make_receipts import generate_receipt, receipt_lines, render_paper
+from modules.ocr_preprocess import ReceiptPreprocessor, decode_image, estimate_skew, estimate_text_height
+
+def _receipt(orientation):
+    """The first synthetic receipt stored with the wanted EXIF orientation."""
+    rng = random.Random(1)
+    while True:
+        data, truth = generate_receipt(rng)
+        if truth["orientation"] == orientation:
+            return data
+
+# --- RECEIPT PREPROCESSING TESTS ---
+def test_full_pipeline_shrinks_receipt_photo():
+    data = _receipt(1)
+    raw = decode_image(data)
+    image, timings = ReceiptPreprocessor().run(data)
+    assert list(timings) == ["decode", "exif", "grayscale", "crop", "deskew", "downscale"]
+    assert image.ndim == 2
+    # Cropped to the paper and shrunk to ~20px text lines
+    assert image.shape[0] * image.shape[1] < raw.shape[0] * raw.shape[1] / 2
+    assert estimate_text_height(image) <= 24
+
+def test_exif_step_turns_sideways_photo_upright():
+    data = _receipt(6)
+    stored = decode_image(data)
+    assert stored.shape[1] > stored.shape[0]
+    upright, _ = ReceiptPreprocessor(steps=("exif",)).run(data)
+    assert upright.shape[0] > upright.shape[1]
+
+def test_disabled_steps_are_skipped():
+    data = _receipt(1)
+    image, timings = ReceiptPreprocessor(steps=("grayscale",)).run(data)
+    assert list(timings) == ["decode", "grayscale"]
+    assert image.shape == decode_image(data).shape[:2]
+    pixels = np.full((40, 60, 3), 255, np.uint8)
+    assert ReceiptPreprocessor(steps=()).run(pixels) == (pixels, {})
+    with pytest.raises(ValueError):
+        ReceiptPreprocessor(steps=("sharpen",))
+
+def test_skew_estimate():
+    from PIL import Image
+    lines, _ = receipt_lines(random.Random(3))
+    paper = render_paper(lines, font_size=24)
+    for tilt in (-5, 0, 3):
+        tilted = np.array(paper.rotate(tilt, resample=Image.BICUBIC, expand=True, fillcolor=250))
+        assert estimate_skew(tilted) == pytest.approx(-tilt, abs=0.5)
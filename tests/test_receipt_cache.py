@@ -0,0 +1,67 @@
+import sys
+import os
+import cv2
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.make_receipts import generate
+from modules.receipt_cache import ReceiptCache, hash_distance, receipt_hash
+
+def _reencoded(data, quality=60, scale=0.8):
+    """The photo as Telegram might deliver it again: smaller and recompressed."""
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+# --- RECEIPT CACHE TESTS ---
+def test_hash_matches_copies_and_tells_receipts_apart():
+    (first, _), (second, _) = generate(2, seed=11)
+    cache = ReceiptCache()
+    assert hash_distance(receipt_hash(first), receipt_hash(_reencoded(first))) <= cache.max_distance
+    assert hash_distance(receipt_hash(first), receipt_hash(second)) > cache.max_distance
+    image = cv2.imdecode(np.frombuffer(first, np.uint8), cv2.IMREAD_COLOR)
+    assert hash_distance(receipt_hash(first), receipt_hash(image)) <= cache.max_distance
+    assert receipt_hash(b"not a photo") is None
+    assert cache.hash(object()) is None
+
+def test_reads_are_reused_only_for_the_same_photo():
+    cache = ReceiptCache()
+    result = {"amount": 25000.0, "merchant": "INDOMARET", "date": None}
+    assert cache.lookup("AQADfile1") is None
+    cache.store("AQADfile1", result)
+    assert cache.lookup("AQADfile1") == result
+    # A different photo is read, however alike the two look
+    assert cache.lookup("AQADfile2") is None
+    assert cache.lookup(None) is None
+    # A staged read has no merchant or date yet: a later full read must not get it
+    cache.store("AQADfile3", {"amount": 25000.0, "merchant": None, "date": None, "partial": True})
+    assert cache.lookup("AQADfile3") is None
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["entries"]) == (1, 3, 1)
+
+def test_duplicate_warning_needs_a_near_hash_and_the_same_amount():
+    cache = ReceiptCache(max_distance=4)
+    cache.mark_saved(1, 0b1010, 25000.0)
+    assert cache.duplicate(1, 0b1011, 25000.0)["amount"] == 25000.0
+    # Different receipts framed alike hash alike: their totals tell them apart
+    assert cache.duplicate(1, 0b1010, 26000.0) is None
+    assert cache.duplicate(1, 0b11111111111, 25000.0) is None
+    # Another user's saves are not theirs
+    assert cache.duplicate(2, 0b1010, 25000.0) is None
+    assert cache.duplicate(1, None, 25000.0) is None
+    assert cache.metrics()["duplicates"] == 1
+
+def test_caches_are_bounded_lrus():
+    cache = ReceiptCache(max_entries=2, max_user_entries=2, max_distance=0, max_users=2)
+    for value in (1, 2, 3):
+        cache.store(value, {"amount": value})
+        cache.mark_saved(7, value, float(value))
+    assert list(cache.results) == [2, 3] and list(cache.users[7]) == [2, 3]
+    cache.lookup(2)
+    cache.store(4, {"amount": 4})
+    # 2 was read last, so 3 made way
+    assert list(cache.results) == [2, 4]
+    cache.mark_saved(8, 5, 5.0); cache.mark_saved(9, 6, 6.0)
+    assert list(cache.users) == [8, 9]
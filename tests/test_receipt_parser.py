@@ -0,0 +1,72 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.make_receipts import AMOUNT_FORMATS, format_amount, simulated_results
+from modules.receipt_parser import clean_amount, group_rows, parse_receipt
+
+def _box(x0, x1, y, text):
+    """A readtext result for text spanning x0..x1 on the line at y (20px tall)."""
+    return ([[x0, y], [x1, y], [x1, y + 20], [x0, y + 20]], text, 0.9)
+
+# --- RECEIPT PARSER TESTS ---
+def test_rows_pair_labels_with_right_aligned_amounts():
+    # The amount boxes sit a little lower (a slight tilt): readtext lists them after the next label
+    results = [
+        _box(150, 250, 0, "KOPI KENANGAN"), _box(100, 300, 30, "TELP 081234567890"),
+        _box(10, 180, 60, "TGL 05/03/2026"),
+        _box(10, 150, 90, "ES KOPI SUSU"), _box(10, 120, 120, "2 x 18.000"), _box(300, 380, 124, "36.000"),
+        _box(10, 200, 150, "ROTI BAKAR 3x5.500"), _box(300, 380, 154, "16.500"),
+        _box(10, 120, 180, "SUBTOTAL"), _box(10, 80, 210, "TOTAL"), _box(300, 380, 184, "52.500"),
+        _box(300, 380, 214, "52.500"), _box(10, 80, 240, "TUNAI"), _box(300, 390, 244, "100.000"),
+    ]
+    rows = group_rows(sorted(results, key=lambda r: r[0][0][1]))
+    assert [(row.label, row.amount) for row in rows if row.amount] == [
+        ("2 x 18.000", 36000.0), ("ROTI BAKAR 3x5.500", 16500.0), ("SUBTOTAL", 52500.0), ("TOTAL", 52500.0),
+        ("TUNAI", 100000.0)]
+    receipt = parse_receipt(results)
+    assert (receipt.merchant, receipt.date, receipt.total, receipt.total_label) == ("KOPI KENANGAN", "05/03/2026", 52500.0, "TOTAL")
+    assert [(i["name"], i["qty"], i["price"], i["amount"]) for i in receipt.items] == [
+        ("ES KOPI SUSU", 2, 18000.0, 36000.0), ("ROTI BAKAR", 3, 5500.0, 16500.0)]
+
+def test_total_without_label_skips_phone_npwp_and_payment():
+    results = [
+        _box(150, 250, 0, "WARUNG BAHARI"), _box(100, 300, 30, "TELP 081234567890"),
+        _box(60, 340, 60, "NPWP 01.234.567.8-901.000"),
+        _box(10, 150, 90, "NASI AYAM"), _box(300, 380, 90, "25.000"),
+        _box(10, 150, 120, "ES TEH"), _box(300, 380, 120, "5.000"),
+        _box(10, 150, 150, "TOTAI"), _box(300, 380, 150, "30.000"),
+        _box(10, 150, 180, "TUNAI"), _box(300, 380, 180, "50.000"),
+    ]
+    receipt = parse_receipt(results)
+    # The misread TOTAI label is not a total label: the largest amount that is not paid cash wins
+    assert (receipt.total, receipt.total_label) == (30000.0, None)
+    assert [i["name"] for i in receipt.items] == ["NASI AYAM", "ES TEH", "TOTAI"]
+
+def test_results_without_boxes_and_ocr_digit_lookalikes():
+    receipt = parse_receipt([([], "SOLARIA", 0.9), ([], "TGL 7-3-26", 0.9), ([], "T0TAL Rp 1O5.500", 0.9)])
+    assert (receipt.merchant, receipt.date, receipt.total) == ("SOLARIA", "07/03/2026", 105500.0)
+    # Date glued to its label and to the time
+    assert parse_receipt([([], "TGL10/04/202620:12", 0.9)]).date == "10/04/2026"
+    assert parse_receipt([]).to_dict() == {"amount": 0.0, "merchant": "Transaksi", "date": None, "items": []}
+
+def test_simulated_receipts_parse_exactly():
+    for results, truth in simulated_results(50, seed=7, char_noise=0, tilt=1.0):
+        receipt = parse_receipt(results)
+        assert (receipt.total, receipt.date, receipt.merchant) == (truth["amount"], truth["date"], truth["merchant"])
+        assert [(i["qty"], i["price"]) for i in receipt.items] == [(i["qty"], i["price"]) for i in truth["items"]]
+
+def test_clean_amount_reads_every_printed_format():
+    values = [0, 500, 1000, 25500, 100000, 1250000, 999999999]
+    for style in AMOUNT_FORMATS:
+        cents = [1250000.5, 100000.25] if style.endswith(("sen", "cents")) else []
+        for value in values + cents:
+            text = format_amount(value, style)
+            for printed in (text, "Rp " + text, "Rp." + text, "Rp. " + text, "IDR " + text):
+                assert clean_amount(printed) == value, printed
+            if "," not in text:
+                assert clean_amount(text + ",-") == value
+    assert format_amount(1250000, "dots-sen") == "1.250.000,00"
+    assert clean_amount("25.000.") == 25000.0
@@ -0,0 +1,73 @@
+import re
+import time
+import asyncio
+import logging
+from contextlib import aclosing, nullcontext, suppress
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from config import STREAM_EDIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = "⏳ Lagi mikir..."
+# Shown after the text while more is coming
+CURSOR = " ▌"
+_MARKDOWN_RE = re.compile(r'[*_`]')
+
+
+async def stream_reply(target, chunks, header="", parse_mode='Markdown', interval=STREAM_EDIT_INTERVAL):
+    """
+    Replies to `target` with a placeholder right away, then edits that message
+    as text arrives from the async iterator `chunks`, at most once per
+    `interval` seconds so a chat stays within Telegram's edit rate limit.
+    Intermediate edits are plain text (a half-streamed answer can have
+    unbalanced Markdown); the final edit uses parse_mode and falls back to
+    plain text if Telegram rejects it. Returns the full text.
+    If cancelled before any text arrived, the placeholder is deleted.
+    """
+    message = await target.reply_text(_plain(header) + PLACEHOLDER)
+    text = ""
+    next_edit = 0.0  # the first piece is shown as soon as it arrives
+    try:
+        async with aclosing(chunks) if hasattr(chunks, "aclose") else nullcontext(chunks) as pieces:
+            async for piece in pieces:
+                text += piece
+                if time.monotonic() >= next_edit:
+                    next_edit = time.monotonic() + interval + await _edit(message, _plain(header + text) + CURSOR)
+    except asyncio.CancelledError:
+        if not text:
+            with suppress(TelegramError):
+                await message.delete()
+        raise
+
+    final = header + text
+    try:
+        await _edit(message, final, parse_mode=parse_mode, wait=True)
+    except BadRequest as e:
+        logger.warning(f"Final streamed edit rejected ({e}), sending plain text")
+        await _edit(message, _plain(final), wait=True)
+    return text
+
+
+async def _edit(message, text, parse_mode=None, wait=False):
+    """
+    One edit_text call. Returns the extra delay Telegram asked for (RetryAfter)
+    so the caller can push back its next edit; with wait=True the edit is
+    retried once after that delay instead. "Message is not modified" is ignored.
+    """
+    try:
+        await message.edit_text(text, parse_mode=parse_mode)
+    except RetryAfter as e:
+        delay = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+        if not wait:
+            return delay
+        await asyncio.sleep(delay)
+        await message.edit_text(text, parse_mode=parse_mode)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+    return 0
+
+
+def _plain(text):
+    return _MARKDOWN_RE.sub("", text)
+
@@ -0,0 +1,46 @@
+import asyncio
+import weakref
+
+# user_data key holding the user's in-flight LLM request
+LLM_TASK_KEY = 'llm_task'
+
+# Requests cancelled because a newer one from the same user replaced them
+_superseded = weakref.WeakSet()
+
+
+class Superseded(asyncio.CancelledError):
+    """Raised by run_user_task in the handler whose request a newer request from the same user cancelled."""
+
+
+async def run_user_task(context, coro, key=LLM_TASK_KEY):
+    """
+    Runs coro as the user's current long-running request. A newer request from
+    the same user cancels the one it supersedes (the user has moved on), and
+    cancelling the handler cancels the request, down to the open HTTP call.
+    Raises Superseded (an asyncio.CancelledError) in the superseded handler.
+    """
+    previous = context.user_data.get(key)
+    if cancel_user_task(context, key):
+        _superseded.add(previous)
+    task = asyncio.ensure_future(coro)
+    context.user_data[key] = task
+    try:
+        return await task
+    except asyncio.CancelledError:
+        # Tracked explicitly: Task.cancelling() only exists from Python 3.11
+        if task in _superseded:
+            raise Superseded() from None
+        raise
+    finally:
+        if context.user_data.get(key) is task:
+            context.user_data.pop(key, None)
+
+
+def cancel_user_task(context, key=LLM_TASK_KEY):
+    """Cancels the user's pending request, if any. Returns True if one was cancelled."""
+    task = context.user_data.get(key)
+    if task is not None and not task.done():
+        task.cancel()
+        return True
+    return False
+